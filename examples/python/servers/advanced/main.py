@@ -1,6 +1,6 @@
 import os
-import asyncio
 import logging
+from contextlib import asynccontextmanager
 from typing import Any, Dict
 
 from dotenv import load_dotenv
@@ -11,6 +11,7 @@ from x402.exact import decode_payment
 from x402.facilitator import FacilitatorClient, FacilitatorConfig
 from x402.encoding import safe_base64_encode
 from x402.common import find_matching_payment_requirements
+from x402.settlement import DeferredSettlement
 from x402.types import (
     PaymentPayload,
     PaymentRequirements,
@@ -41,12 +42,22 @@ if not PAY_TO_ADDRESS:
     raise ValueError("Missing required environment variable: PAY_TO_ADDRESS")
 
 
-app = FastAPI(title="x402 Advanced Server Example")
-
 # Initialize facilitator client
 facilitator_config: FacilitatorConfig = {"url": FACILITATOR_URL}
 facilitator = FacilitatorClient(facilitator_config)
 
+# Payments accepted by /delayed-settlement are settled from a durable journal
+deferred_settlement = DeferredSettlement(facilitator, "settlements.db")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with deferred_settlement, facilitator:
+        yield
+
+
+app = FastAPI(title="x402 Advanced Server Example", lifespan=lifespan)
+
 
 class PaymentRequiredException(Exception):
     """Custom exception for payment required responses"""
@@ -203,7 +214,7 @@ async def delayed_settlement(request: Request) -> Dict[str, Any]:
     """
     Demonstrates asynchronous payment processing.
     Returns the weather data immediately without waiting for payment settlement.
-    Processes payment asynchronously in the background.
+    The payment is journaled and settled in the background, with retries.
     """
     resource = str(request.url)
     payment_requirements = [
@@ -225,32 +236,20 @@ async def delayed_settlement(request: Request) -> Dict[str, Any]:
         }
     }
 
-    # Process payment asynchronously in the background
-    async def process_payment_async():
-        try:
-            x_payment = request.headers.get("X-PAYMENT")
-            if not x_payment:
-                logger.error("X-PAYMENT header missing in async processing")
-                return
-
-            decoded_payment_dict = decode_payment(x_payment)
-            decoded_payment = PaymentPayload(**decoded_payment_dict)
-
-            settle_response = await facilitator.settle(
-                decoded_payment, payment_requirements[0]
-            )
-            response_header = settle_response_header(settle_response)
-
-            # In a real application, you would store this response header
-            # and associate it with the payment for later verification
-            logger.info(f"Payment settled: {response_header}")
-        except Exception as e:
-            logger.error(f"Payment settlement failed: {e}")
-            # In a real application, you would handle the failed payment
-            # by marking it for retry or notifying the user
-
-    # Start background task
-    asyncio.create_task(process_payment_async())
+    # Journal the payment; background workers settle it with retries
+    x_payment = request.headers.get("X-PAYMENT")
+    if not x_payment:
+        raise ValueError("X-PAYMENT header is required")
+
+    decoded_payment = PaymentPayload(**decode_payment(x_payment))
+    if not await deferred_settlement.enqueue(decoded_payment, payment_requirements[0]):
+        raise PaymentRequiredException(
+            x402PaymentRequiredResponse(
+                x402_version=x402_VERSION,
+                error="Payment already used",
+                accepts=payment_requirements,
+            ).model_dump(by_alias=True)
+        )
 
     return response_data
 
@@ -0,0 +1,78 @@
+"""Compare decoding X-PAYMENT headers via json.loads and PaymentPayload(**dict)
+with `decode_payment_header`.
+
+Usage:
+    python benchmarks/bench_decode.py [--headers 50000]
+"""
+
+import argparse
+import json
+import secrets
+import time
+
+from eth_account import Account
+
+from x402.clients.base import x402Client
+from x402.encoding import decode_payment_header, safe_base64_decode
+from x402.types import PaymentPayload, PaymentRequirements
+
+
+def make_headers(count: int, distinct: int) -> list[str]:
+    """Signed exact payment headers from a few accounts, as clients send them."""
+    requirements = PaymentRequirements(
+        scheme="exact",
+        network="base-sepolia",
+        asset="0x036CbD53842c5426634e7929541eC2318f3dCF7e",
+        pay_to="0x209693Bc6afc0C5328bA36FaF03C514EF312287C",
+        max_amount_required="10000",
+        resource="https://example.com/weather",
+        description="",
+        mime_type="",
+        max_timeout_seconds=60,
+        extra={"name": "USDC", "version": "2"},
+    )
+    pool = []
+    for _ in range(distinct):
+        client = x402Client(Account.from_key(secrets.token_hex(32)))
+        pool.append(client.create_payment_header(requirements))
+    return [pool[index % distinct] for index in range(count)]
+
+
+def legacy_decode(header: str) -> PaymentPayload:
+    """Per-request decoding as done before `decode_payment_header`."""
+    return PaymentPayload(**json.loads(safe_base64_decode(header)))
+
+
+def bench(name: str, fn, headers: list[str]) -> float:
+    start = time.perf_counter()
+    for header in headers:
+        fn(header)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<28} {len(headers) / elapsed:>12,.0f} payloads/s"
+        f"  {elapsed / len(headers) * 1e6:>9.2f} us/payload"
+    )
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--headers", type=int, default=50000)
+    parser.add_argument("--distinct-headers", type=int, default=100)
+    args = parser.parse_args()
+
+    headers = make_headers(args.headers, args.distinct_headers)
+    print(f"{args.headers} headers of {len(headers[0])} bytes")
+
+    legacy = bench("json.loads + PaymentPayload", legacy_decode, headers)
+    fast = bench("decode_payment_header", decode_payment_header, headers)
+    print(f"{'speedup':<28} {legacy / fast:>12.2f}x")
+
+    sample = headers[: args.distinct_headers]
+    assert [decode_payment_header(h) for h in sample] == [
+        legacy_decode(h) for h in sample
+    ]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Compare `path_is_match` over a list of routes with a compiled `PathMatcher`.
+
+Usage:
+    python benchmarks/bench_path.py [--routes 5000] [--requests 20000]
+"""
+
+import argparse
+import fnmatch
+import random
+import re
+import time
+
+from x402.path import PathMatcher
+
+
+def make_patterns(count: int) -> list[str]:
+    """A mix of exact paths, prefix globs, other globs and regexes, like a large API."""
+    patterns = []
+    for index in range(count):
+        kind = index % 4
+        if kind == 0:
+            patterns.append(f"/v1/resource{index}")
+        elif kind == 1:
+            patterns.append(f"/v1/collection{index}/*")
+        elif kind == 2:
+            patterns.append(f"/v1/items{index}/*/detail")
+        else:
+            patterns.append(f"regex:^/v1/users{index}/\\d+$")
+    return patterns
+
+
+def make_paths(patterns: list[str], count: int, distinct: int) -> list[str]:
+    """Request paths hitting random routes, plus some that match no route."""
+    rng = random.Random(402)
+    pool = []
+    for _ in range(distinct):
+        pattern = rng.choice(patterns)
+        if rng.random() < 0.1:
+            pool.append(f"/unpriced/{rng.randrange(10**6)}")
+        elif pattern.startswith("regex:"):
+            pool.append(pattern[7:].replace("\\d+$", str(rng.randrange(1000))))
+        else:
+            pool.append(pattern.replace("*", str(rng.randrange(1000))))
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def linear_match(patterns: list[str], request_path: str):
+    """Per-request matching as done before PathMatcher: each pattern in turn."""
+    for index, pattern in enumerate(patterns):
+        if pattern.startswith("regex:"):
+            matched = bool(re.match(pattern[6:], request_path))
+        elif "*" in pattern or "?" in pattern:
+            matched = fnmatch.fnmatch(request_path, pattern)
+        else:
+            matched = pattern == request_path
+        if matched:
+            return index
+    return None
+
+
+def bench(name: str, fn, paths: list[str]) -> float:
+    start = time.perf_counter()
+    for path in paths:
+        fn(path)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<28} {len(paths) / elapsed:>12,.0f} lookups/s"
+        f"  {elapsed / len(paths) * 1e6:>9.2f} us/lookup"
+    )
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routes", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--distinct-paths", type=int, default=2000)
+    args = parser.parse_args()
+
+    patterns = make_patterns(args.routes)
+    paths = make_paths(patterns, args.requests, args.distinct_paths)
+    print(
+        f"{args.routes} routes, {args.requests} requests over {args.distinct_paths} paths"
+    )
+
+    # The linear scan is slow with many routes, so time it on fewer requests
+    bench(
+        "linear path_is_match",
+        lambda path: linear_match(patterns, path),
+        paths[: max(20, args.requests // 1000)],
+    )
+
+    start = time.perf_counter()
+    matcher: PathMatcher[int] = PathMatcher(max_cached_paths=0)
+    for index, pattern in enumerate(patterns):
+        matcher.add(pattern, index)
+    matcher.match("/")
+    print(
+        f"{'PathMatcher compile':<28} {(time.perf_counter() - start) * 1e3:>12,.1f} ms"
+    )
+
+    bench("PathMatcher (no cache)", matcher.match, paths)
+
+    cached: PathMatcher[int] = PathMatcher()
+    for index, pattern in enumerate(patterns):
+        cached.add(pattern, index)
+    cached.match("/")
+    bench("PathMatcher (LRU cache)", cached.match, paths)
+
+    sample = paths[:20]
+    assert [matcher.match(p) for p in sample] == [
+        linear_match(patterns, p) for p in sample
+    ]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Compare hashing TransferWithAuthorization typed data with eth-account's generic
+EIP-712 encoder and with `transfer_with_authorization_hash`, and time signing and
+locally verifying whole payments.
+
+Usage:
+    python benchmarks/bench_sign.py [--payments 5000]
+"""
+
+import argparse
+import secrets
+import time
+
+from eth_account import Account
+from eth_account.messages import _hash_eip191_message, encode_typed_data
+
+from x402.clients.base import x402Client
+from x402.encoding import decode_payment_header
+from x402.exact import (
+    transfer_with_authorization_hash,
+    transfer_with_authorization_typed_data,
+    verify_payment_locally,
+)
+from x402.types import PaymentRequirements
+
+REQUIREMENTS = PaymentRequirements(
+    scheme="exact",
+    network="base-sepolia",
+    asset="0x036CbD53842c5426634e7929541eC2318f3dCF7e",
+    pay_to="0x209693Bc6afc0C5328bA36FaF03C514EF312287C",
+    max_amount_required="10000",
+    resource="https://example.com/weather",
+    description="",
+    mime_type="",
+    max_timeout_seconds=60,
+    extra={"name": "USDC", "version": "2"},
+)
+
+
+def make_authorizations(count: int) -> list[dict]:
+    sender = Account.create().address
+    return [
+        {
+            "from": sender,
+            "to": REQUIREMENTS.pay_to,
+            "value": REQUIREMENTS.max_amount_required,
+            "validAfter": "0",
+            "validBefore": str(int(time.time()) + 60),
+            "nonce": secrets.token_bytes(32),
+        }
+        for _ in range(count)
+    ]
+
+
+def typed_data_hash(authorization: dict) -> bytes:
+    """Hashing as done before `transfer_with_authorization_hash`."""
+    typed_data = transfer_with_authorization_typed_data(REQUIREMENTS, authorization)
+    return _hash_eip191_message(
+        encode_typed_data(
+            domain_data=typed_data["domain"],
+            message_types=typed_data["types"],
+            message_data=typed_data["message"],
+        )
+    )
+
+
+def bench(name: str, fn, items: list) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<32} {len(items) / elapsed:>12,.0f} payments/s"
+        f"  {elapsed / len(items) * 1e6:>9.2f} us/payment"
+    )
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=5000)
+    parser.add_argument("--signatures", type=int, default=200)
+    args = parser.parse_args()
+
+    authorizations = make_authorizations(args.payments)
+    generic = bench("encode_typed_data hash", typed_data_hash, authorizations)
+    fast = bench(
+        "transfer_with_authorization_hash",
+        lambda auth: transfer_with_authorization_hash(REQUIREMENTS, auth),
+        authorizations,
+    )
+    print(f"{'hash speedup':<32} {generic / fast:>12.2f}x")
+
+    # Whole headers, including the ECDSA signature of the installed eth-keys backend
+    client = x402Client(Account.create())
+    bench(
+        "create_payment_header",
+        lambda _: client.create_payment_header(REQUIREMENTS),
+        range(args.signatures),
+    )
+    payments = [
+        decode_payment_header(client.create_payment_header(REQUIREMENTS))
+        for _ in range(args.signatures)
+    ]
+    bench(
+        "verify_payment_locally",
+        lambda payment: verify_payment_locally(payment, REQUIREMENTS),
+        payments,
+    )
+    assert all(verify_payment_locally(p, REQUIREMENTS) is None for p in payments)
+
+    assert all(
+        transfer_with_authorization_hash(REQUIREMENTS, auth) == typed_data_hash(auth)
+        for auth in authorizations[:20]
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class _PendingBatch(Generic[T, R]):
+    def __init__(self):
+        self.items: list[T] = []
+        self.futures: list[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class Batcher(Generic[T, R]):
+    """Collect concurrently submitted items and process them in batches.
+
+    A batch is flushed once it holds `max_size` items or `max_delay` seconds after
+    its first item was submitted, whichever comes first. `flush` receives the items
+    of one batch and must return one result per item, in the same order.
+
+    Args:
+        flush: Coroutine function processing a batch of items
+        max_size: Maximum number of items in a batch
+        max_delay: Maximum seconds an item waits for its batch to fill up
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[list[T]], Awaitable[list[R]]],
+        max_size: int = 50,
+        max_delay: float = 0.01,
+    ):
+        self._flush = flush
+        self.max_size = max_size
+        self.max_delay = max_delay
+        # Futures cannot be shared across event loops, so batches are per loop
+        self._batches: dict[asyncio.AbstractEventLoop, _PendingBatch[T, R]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, item: T) -> R:
+        """Add an item to the current batch and wait for its result."""
+        loop = asyncio.get_running_loop()
+        batch = self._batches.get(loop)
+        if batch is None:
+            batch = self._batches[loop] = _PendingBatch()
+            batch.timer = loop.call_later(self.max_delay, self._dispatch, loop)
+
+        future = loop.create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+
+        if len(batch.items) >= self.max_size:
+            self._dispatch(loop)
+
+        return await future
+
+    def _dispatch(self, loop: asyncio.AbstractEventLoop) -> None:
+        batch = self._batches.pop(loop, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+
+        task = loop.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: _PendingBatch[T, R]) -> None:
+        try:
+            results = await self._flush(batch.items)
+            if len(results) != len(batch.items):
+                raise ValueError(
+                    f"Batch returned {len(results)} results for {len(batch.items)} items"
+                )
+        except BaseException as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for future, result in zip(batch.futures, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,191 @@
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from x402.singleflight import SingleFlight
+from x402.types import PaymentPayload, PaymentRequirements, VerifyResponse
+
+
+def payment_digest(
+    payment: PaymentPayload, payment_requirements: PaymentRequirements
+) -> str:
+    """Compute a canonical hash of a payment and the requirements it is checked against.
+
+    Args:
+        payment: The decoded payment payload
+        payment_requirements: The payment requirements selected for the payment
+
+    Returns:
+        Hex encoded SHA-256 digest of the canonical JSON encoding of both models
+    """
+    canonical = json.dumps(
+        {
+            "paymentPayload": payment.model_dump(by_alias=True),
+            "paymentRequirements": payment_requirements.model_dump(
+                by_alias=True, exclude_none=True
+            ),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class VerificationCache:
+    """Bounded LRU cache of successful verify responses with per-entry expiry.
+
+    Entries expire after `ttl` seconds, and never later than the `validBefore`
+    timestamp of the authorization they were verified for.
+
+    Args:
+        max_size: Maximum number of cached responses
+        ttl: Maximum lifetime of a cached response in seconds
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, VerifyResponse]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[VerifyResponse]:
+        """Return the cached response for `key`, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, response = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return response
+
+    def put(self, key: str, response: VerifyResponse, valid_before: int) -> None:
+        """Cache a verify response until `ttl` elapses or `valid_before` is reached."""
+        expires_at = min(time.time() + self.ttl, valid_before)
+        if expires_at <= time.time():
+            return
+
+        with self._lock:
+            self._entries[key] = (expires_at, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        """Drop the cached response for `key`, if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+def jwt_expiry(headers: dict[str, str]) -> Optional[float]:
+    """Read the expiry of a bearer JWT sent in an Authorization header.
+
+    The token signature is not checked, its `exp` claim is only used as a hint of
+    how long the headers stay usable.
+
+    Args:
+        headers: Header set that may contain an `Authorization: Bearer <jwt>` header
+
+    Returns:
+        The `exp` claim as a Unix timestamp, or None if there is no readable JWT
+    """
+    authorization = next(
+        (v for k, v in headers.items() if k.lower() == "authorization"), ""
+    )
+    scheme, _, token = authorization.partition(" ")
+    parts = token.strip().split(".")
+    if scheme.lower() != "bearer" or len(parts) != 3:
+        return None
+
+    try:
+        claims = json.loads(
+            base64.urlsafe_b64decode(parts[1] + "=" * (-len(parts[1]) % 4))
+        )
+        return float(claims["exp"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class HeaderCache:
+    """Cache of the per-operation header sets returned by a `create_headers` function.
+
+    The headers of each operation are reused until they expire: at the `exp` claim of
+    a bearer JWT in their Authorization header, or `ttl` seconds after creation
+    otherwise. Within `refresh_ahead` seconds of expiry the cached headers are still
+    returned while new ones are created in the background. Concurrent refreshes share
+    a single `create_headers` call.
+
+    Args:
+        create_headers: Coroutine function returning header sets keyed by operation
+        ttl: Lifetime in seconds of headers without a JWT expiry
+        refresh_ahead: Seconds before expiry at which headers are refreshed
+    """
+
+    def __init__(
+        self,
+        create_headers: Callable[[], Awaitable[dict[str, dict[str, str]]]],
+        ttl: float = 60.0,
+        refresh_ahead: float = 10.0,
+    ):
+        self._create_headers = create_headers
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self._entries: dict[str, tuple[float, dict[str, str]]] = {}
+        self._refreshes = SingleFlight()
+        self._background: Optional[asyncio.Task] = None
+
+    async def get(self, operation: str) -> dict[str, str]:
+        """Return the headers for `operation`, creating new ones if they expired."""
+        entry = self._entries.get(operation)
+        now = time.time()
+
+        if entry is None or entry[0] <= now:
+            await self._refreshes.do("refresh", self._refresh)
+            # Operations create_headers has no headers for are cached as empty
+            entry = self._entries.setdefault(operation, (now + self.ttl, {}))
+        elif entry[0] - self.refresh_ahead <= now:
+            self._refresh_in_background()
+
+        return entry[1]
+
+    def invalidate(self) -> None:
+        """Drop all cached headers, e.g. after the facilitator rejected them."""
+        self._entries = {}
+
+    def _refresh_in_background(self) -> None:
+        if self._background is not None and not self._background.done():
+            return
+
+        self._background = asyncio.ensure_future(
+            self._refreshes.do("refresh", self._refresh)
+        )
+        # A failed refresh is retried by the next call once the headers expire
+        self._background.add_done_callback(
+            lambda task: task.cancelled() or task.exception()
+        )
+
+    async def _refresh(self) -> None:
+        headers = await self._create_headers()
+        now = time.time()
+        entries = {
+            operation: (
+                jwt_expiry(operation_headers) or now + self.ttl,
+                operation_headers,
+            )
+            for operation, operation_headers in headers.items()
+        }
+        for operation in self._entries.keys() - entries.keys():
+            entries[operation] = (now + self.ttl, {})
+        self._entries = entries
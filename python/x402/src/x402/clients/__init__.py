@@ -1,7 +1,13 @@
-from x402.clients.base import x402Client, decode_x_payment_response
+from x402.clients.base import (
+    PaymentRequirementsCache,
+    x402Client,
+    decode_x_payment_response,
+)
+from x402.clients.pool import PaymentHeaderPool
 from x402.clients.httpx import (
     x402_payment_hooks,
     x402HttpxClient,
+    x402HttpxTransport,
 )
 from x402.clients.requests import (
     x402HTTPAdapter,
@@ -12,8 +18,11 @@ from x402.clients.requests import (
 __all__ = [
     "x402Client",
     "decode_x_payment_response",
+    "PaymentHeaderPool",
+    "PaymentRequirementsCache",
     "x402_payment_hooks",
     "x402HttpxClient",
+    "x402HttpxTransport",
     "x402HTTPAdapter",
     "x402_http_adapter",
     "x402_requests",
@@ -1,11 +1,15 @@
+import threading
 import time
-from typing import Optional, Callable, Dict, Any, List
+from collections import OrderedDict
+from typing import Optional, Callable, Dict, Any, List, Tuple
+from urllib.parse import urlsplit
 from eth_account import Account
 from x402.exact import sign_payment_header
 from x402.types import (
     PaymentRequirements,
     UnsupportedSchemeException,
 )
+from x402.clients.pool import PaymentHeaderPool
 from x402.common import x402_VERSION
 import secrets
 from x402.encoding import safe_base64_decode
@@ -60,6 +64,73 @@ class PaymentAlreadyAttemptedError(PaymentError):
     pass
 
 
+class PaymentRequirementsCache:
+    """Payment requirements last received per endpoint, to pay before being asked.
+
+    Clients with a cache remember the `accepts` list of each 402 response by
+    method and URL, without the query string. Later requests to the endpoint
+    carry a payment on their first attempt, saving the round trip to get the 402.
+    If the server still answers 402, the entry is replaced by the new
+    requirements and the request is paid again.
+
+    Args:
+        ttl: Seconds the requirements of an endpoint are reused for
+        max_entries: Maximum number of endpoints to remember
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[
+            Tuple[str, str], Tuple[float, List[PaymentRequirements], int]
+        ] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(method: str, url: str) -> Tuple[str, str]:
+        parts = urlsplit(str(url))
+        return method.upper(), f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+    def get(
+        self, method: str, url: str
+    ) -> Optional[Tuple[List[PaymentRequirements], int]]:
+        """Return the accepted requirements and x402 version of an endpoint, if known."""
+        key = self._key(method, url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, accepts, x402_version = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return accepts, x402_version
+
+    def set(
+        self,
+        method: str,
+        url: str,
+        accepts: List[PaymentRequirements],
+        x402_version: int,
+    ) -> None:
+        """Remember the requirements a 402 response for an endpoint accepts."""
+        key = self._key(method, url)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, accepts, x402_version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, method: str, url: str) -> None:
+        """Forget the requirements of an endpoint."""
+        with self._lock:
+            self._entries.pop(self._key(method, url), None)
+
+
 class x402Client:
     """Base client for handling x402 payments."""
 
@@ -68,6 +139,8 @@ class x402Client:
         account: Account,
         max_value: Optional[int] = None,
         payment_requirements_selector: Optional[PaymentSelectorCallable] = None,
+        header_pool: Optional[PaymentHeaderPool] = None,
+        requirements_cache: Optional[PaymentRequirementsCache] = None,
     ):
         """Initialize the x402 client.
 
@@ -75,12 +148,17 @@ class x402Client:
             account: eth_account.Account instance for signing payments
             max_value: Optional maximum allowed payment amount in base units
             payment_requirements_selector: Optional custom selector for payment requirements
+            header_pool: Optional pool of payment headers signed ahead of time
+            requirements_cache: Optional cache of payment requirements per endpoint,
+                to pay requests to known endpoints on their first attempt
         """
         self.account = account
         self.max_value = max_value
         self._payment_requirements_selector = (
             payment_requirements_selector or self.default_payment_requirements_selector
         )
+        self.header_pool = header_pool
+        self.requirements_cache = requirements_cache
 
     @staticmethod
     def default_payment_requirements_selector(
@@ -160,6 +238,8 @@ class x402Client:
     ) -> str:
         """Create a payment header for the given requirements.
 
+        With a header pool, a header signed ahead of time is used when one is ready.
+
         Args:
             payment_requirements: Selected payment requirements
             x402_version: x402 protocol version
@@ -167,6 +247,84 @@ class x402Client:
         Returns:
             Signed payment header
         """
+        if self.header_pool is not None:
+            header = self.header_pool.take(
+                self.account.address,
+                self._sign_payment_header,
+                payment_requirements,
+                x402_version,
+            )
+            if header is not None:
+                return header
+
+        return self._sign_payment_header(payment_requirements, x402_version)
+
+    def preemptive_payment_header(self, method: str, url: str) -> Optional[str]:
+        """Create a payment header for a request to an endpoint with cached requirements.
+
+        Args:
+            method: HTTP method of the request
+            url: URL of the request
+
+        Returns:
+            Signed payment header, or None if the endpoint's requirements are not
+            cached or none of them can be paid
+        """
+        if self.requirements_cache is None:
+            return None
+        cached = self.requirements_cache.get(method, url)
+        if cached is None:
+            return None
+
+        accepts, x402_version = cached
+        try:
+            selected_requirements = self.select_payment_requirements(accepts)
+        except (PaymentError, UnsupportedSchemeException):
+            return None
+        return self.create_payment_header(selected_requirements, x402_version)
+
+    def remember_payment_requirements(
+        self,
+        method: str,
+        url: str,
+        accepts: List[PaymentRequirements],
+        x402_version: int,
+    ) -> None:
+        """Cache the requirements of a 402 response for later requests to the endpoint."""
+        if self.requirements_cache is not None:
+            self.requirements_cache.set(method, url, accepts, x402_version)
+
+    def forget_payment_requirements(self, method: str, url: str) -> None:
+        """Drop the cached requirements of an endpoint that rejected a payment."""
+        if self.requirements_cache is not None:
+            self.requirements_cache.invalidate(method, url)
+
+    def presign(
+        self,
+        payment_requirements: PaymentRequirements,
+        x402_version: int = x402_VERSION,
+    ) -> None:
+        """Sign payment headers for requirements ahead of time, in the header pool.
+
+        Args:
+            payment_requirements: Payment requirements the client expects to pay
+            x402_version: x402 protocol version
+
+        Raises:
+            ValueError: If the client has no header pool
+        """
+        if self.header_pool is None:
+            raise ValueError("Pre-signing requires a header_pool")
+        self.header_pool.add(
+            self.account.address,
+            self._sign_payment_header,
+            payment_requirements,
+            x402_version,
+        )
+
+    def _sign_payment_header(
+        self, payment_requirements: PaymentRequirements, x402_version: int
+    ) -> str:
         unsigned_header = {
             "x402Version": x402_version,
             "scheme": payment_requirements.scheme,
@@ -1,12 +1,20 @@
 from typing import Optional, Dict, List
-from httpx import Request, Response, AsyncClient
+from httpx import (
+    AsyncBaseTransport,
+    AsyncClient,
+    AsyncHTTPTransport,
+    Request,
+    Response,
+)
 from eth_account import Account
 from x402.clients.base import (
     x402Client,
     MissingRequestConfigError,
     PaymentError,
+    PaymentRequirementsCache,
     PaymentSelectorCallable,
 )
+from x402.clients.pool import PaymentHeaderPool
 from x402.types import x402PaymentRequiredResponse
 
 
@@ -17,7 +25,17 @@ class HttpxHooks:
 
     async def on_request(self, request: Request):
         """Handle request before it is sent."""
-        pass
+        # Pay requests to endpoints with cached requirements on the first attempt
+        if "X-Payment" in request.headers:
+            return
+
+        payment_header = self.client.preemptive_payment_header(
+            request.method, str(request.url)
+        )
+        if payment_header is not None:
+            request.headers["X-Payment"] = payment_header
+            request.headers["Access-Control-Expose-Headers"] = "X-Payment-Response"
+            request.extensions["x402_preemptive_payment"] = True
 
     async def on_response(self, response: Response) -> Response:
         """Handle response after it is received."""
@@ -34,26 +52,20 @@ class HttpxHooks:
             if not response.request:
                 raise MissingRequestConfigError("Missing request configuration")
 
+            request = response.request
+
             # Read the response content before parsing
             await response.aread()
 
-            data = response.json()
-
-            payment_response = x402PaymentRequiredResponse(**data)
-
-            # Select payment requirements
-            selected_requirements = self.client.select_payment_requirements(
-                payment_response.accepts
-            )
-
-            # Create payment header
-            payment_header = self.client.create_payment_header(
-                selected_requirements, payment_response.x402_version
+            payment_header = _payment_header_for_402(
+                self.client,
+                request,
+                response,
+                bool(request.extensions.get("x402_preemptive_payment")),
             )
 
             # Mark as retry and add payment header
             self._is_retry = True
-            request = response.request
 
             request.headers["X-Payment"] = payment_header
             request.headers["Access-Control-Expose-Headers"] = "X-Payment-Response"
@@ -61,6 +73,7 @@ class HttpxHooks:
             # Retry the request
             async with AsyncClient() as client:
                 retry_response = await client.send(request)
+                self._is_retry = False
 
                 # Copy the retry response data to the original response
                 response.status_code = retry_response.status_code
@@ -76,10 +89,110 @@ class HttpxHooks:
             raise PaymentError(f"Failed to handle payment: {str(e)}") from e
 
 
+class x402HttpxTransport(AsyncBaseTransport):
+    """Async transport that pays 402 responses, wrapping another transport.
+
+    A 402 response is paid and the request is sent again through the wrapped
+    transport, so the retry uses the same connection pool and the base URL,
+    headers, proxies and timeouts the client applied to the request. All payment
+    state is local to a request, so any number of concurrent requests can share
+    the transport.
+
+    Request bodies are read into memory before sending, so that they can be sent
+    again with the payment.
+
+    Usage:
+        transport = x402HttpxTransport(x402Client(account), httpx.AsyncHTTPTransport())
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.get("https://api.example.com/paid")
+
+    Args:
+        client: x402Client paying the requests
+        transport: Transport sending the requests, a new `AsyncHTTPTransport` by default
+    """
+
+    def __init__(
+        self, client: x402Client, transport: Optional[AsyncBaseTransport] = None
+    ):
+        self.client = client
+        self.transport = transport if transport is not None else AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: Request) -> Response:
+        # Buffer the body so that the request can be sent again
+        await request.aread()
+
+        # Pay requests to endpoints with cached requirements on the first attempt
+        preemptive = False
+        if "X-Payment" not in request.headers:
+            payment_header = self.client.preemptive_payment_header(
+                request.method, str(request.url)
+            )
+            if payment_header is not None:
+                _add_payment_header(request, payment_header)
+                preemptive = True
+
+        response = await self.transport.handle_async_request(request)
+        if response.status_code != 402:
+            return response
+
+        try:
+            await response.aread()
+            payment_header = _payment_header_for_402(
+                self.client, request, response, preemptive
+            )
+        except PaymentError:
+            raise
+        except Exception as e:
+            raise PaymentError(f"Failed to handle payment: {str(e)}") from e
+        finally:
+            await response.aclose()
+
+        # Retry once with the payment, whatever the response
+        _add_payment_header(request, payment_header)
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def _add_payment_header(request: Request, payment_header: str) -> None:
+    request.headers["X-Payment"] = payment_header
+    request.headers["Access-Control-Expose-Headers"] = "X-Payment-Response"
+
+
+def _payment_header_for_402(
+    client: x402Client, request: Request, response: Response, preemptive: bool
+) -> str:
+    """Create the payment for a request from the 402 response it received."""
+    url = str(request.url)
+
+    # The cached requirements of the endpoint no longer apply
+    if preemptive:
+        client.forget_payment_requirements(request.method, url)
+
+    payment_response = x402PaymentRequiredResponse(**response.json())
+    client.remember_payment_requirements(
+        request.method,
+        url,
+        payment_response.accepts,
+        payment_response.x402_version,
+    )
+
+    # Select payment requirements
+    selected_requirements = client.select_payment_requirements(payment_response.accepts)
+
+    # Create payment header
+    return client.create_payment_header(
+        selected_requirements, payment_response.x402_version
+    )
+
+
 def x402_payment_hooks(
     account: Account,
     max_value: Optional[int] = None,
     payment_requirements_selector: Optional[PaymentSelectorCallable] = None,
+    header_pool: Optional[PaymentHeaderPool] = None,
+    requirements_cache: Optional[PaymentRequirementsCache] = None,
 ) -> Dict[str, List]:
     """Create httpx event hooks dictionary for handling 402 Payment Required responses.
 
@@ -89,6 +202,9 @@ def x402_payment_hooks(
         payment_requirements_selector: Optional custom selector for payment requirements.
             Should be a callable that takes (accepts, network_filter, scheme_filter, max_value)
             and returns a PaymentRequirements object.
+        header_pool: Optional pool of payment headers signed ahead of time
+        requirements_cache: Optional cache of payment requirements per endpoint,
+            to pay requests to known endpoints on their first attempt
 
     Returns:
         Dictionary of event hooks that can be directly assigned to client.event_hooks
@@ -98,6 +214,8 @@ def x402_payment_hooks(
         account,
         max_value=max_value,
         payment_requirements_selector=payment_requirements_selector,
+        header_pool=header_pool,
+        requirements_cache=requirements_cache,
     )
 
     # Create hooks
@@ -118,6 +236,8 @@ class x402HttpxClient(AsyncClient):
         account: Account,
         max_value: Optional[int] = None,
         payment_requirements_selector: Optional[PaymentSelectorCallable] = None,
+        header_pool: Optional[PaymentHeaderPool] = None,
+        requirements_cache: Optional[PaymentRequirementsCache] = None,
         **kwargs,
     ):
         """Initialize an AsyncClient with x402 payment handling.
@@ -128,9 +248,26 @@ class x402HttpxClient(AsyncClient):
             payment_requirements_selector: Optional custom selector for payment requirements.
                 Should be a callable that takes (accepts, network_filter, scheme_filter, max_value)
                 and returns a PaymentRequirements object.
+            header_pool: Optional pool of payment headers signed ahead of time
+            requirements_cache: Optional cache of payment requirements per endpoint,
+                to pay requests to known endpoints on their first attempt
             **kwargs: Additional arguments to pass to AsyncClient
         """
         super().__init__(**kwargs)
-        self.event_hooks = x402_payment_hooks(
-            account, max_value, payment_requirements_selector
+        client = x402Client(
+            account,
+            max_value=max_value,
+            payment_requirements_selector=payment_requirements_selector,
+            header_pool=header_pool,
+            requirements_cache=requirements_cache,
         )
+
+        # Pay through every transport the client routes requests to, so retries
+        # keep the pool, proxies and mounts of the original request
+        self._transport = x402HttpxTransport(client, self._transport)
+        self._mounts = {
+            pattern: None
+            if transport is None
+            else x402HttpxTransport(client, transport)
+            for pattern, transport in self._mounts.items()
+        }
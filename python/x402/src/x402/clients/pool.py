@@ -0,0 +1,231 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Optional, Tuple
+
+from x402.types import PaymentRequirements
+
+logger = logging.getLogger(__name__)
+
+# Signs a fresh payment header for payment requirements and an x402 version
+PaymentHeaderSigner = Callable[[PaymentRequirements, int], str]
+
+
+class _PoolSlot:
+    """Signed headers for one account and set of payment requirements."""
+
+    def __init__(
+        self,
+        sign: PaymentHeaderSigner,
+        payment_requirements: PaymentRequirements,
+        x402_version: int,
+    ):
+        self.sign = sign
+        self.payment_requirements = payment_requirements
+        self.x402_version = x402_version
+        # (valid_before, header), oldest first
+        self.headers: Deque[Tuple[float, str]] = deque()
+        self.last_used = time.time()
+
+
+class PaymentHeaderPool:
+    """Payment headers signed ahead of time, so a 402 can be paid without signing.
+
+    A background thread keeps up to `depth` signed headers ready for each known set
+    of payment requirements (which includes the resource URL). Every header has its
+    own nonce and validity window. Headers with less than `min_validity` seconds
+    left before `validBefore` are dropped and replaced.
+
+    Requirements become known when a client pays them for the first time, or ahead
+    of time through `x402Client.presign`. Requirements that are not paid for
+    `idle_timeout` seconds are forgotten, and at most `max_requirements` are kept.
+
+    Unused headers are authorizations that are never submitted and simply expire.
+
+    Usage:
+        pool = PaymentHeaderPool(depth=4)
+        client = x402HttpxClient(account, header_pool=pool)
+        ...
+        pool.close()
+
+    Args:
+        depth: Signed headers to keep ready per set of payment requirements
+        min_validity: Seconds a header must remain valid for when handed out
+        idle_timeout: Seconds after which unpaid requirements are forgotten
+        max_requirements: Maximum number of sets of payment requirements to keep
+        refill_interval: Seconds between checks for expiring headers
+    """
+
+    def __init__(
+        self,
+        depth: int = 4,
+        min_validity: float = 10.0,
+        idle_timeout: float = 300.0,
+        max_requirements: int = 64,
+        refill_interval: float = 1.0,
+    ):
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+
+        self.depth = depth
+        self.min_validity = min_validity
+        self.idle_timeout = idle_timeout
+        self.max_requirements = max_requirements
+        self.refill_interval = refill_interval
+        self._slots: OrderedDict[tuple, _PoolSlot] = OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def __len__(self) -> int:
+        """Number of signed headers ready."""
+        with self._lock:
+            return sum(len(slot.headers) for slot in self._slots.values())
+
+    def __enter__(self) -> "PaymentHeaderPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add(
+        self,
+        owner: str,
+        sign: PaymentHeaderSigner,
+        payment_requirements: PaymentRequirements,
+        x402_version: int,
+    ) -> None:
+        """Keep signed headers ready for a set of payment requirements.
+
+        Args:
+            owner: Address of the account signing the headers
+            sign: Signs a fresh header for the requirements and version
+            payment_requirements: The payment requirements to sign headers for
+            x402_version: x402 protocol version of the headers
+        """
+        self._slot(owner, sign, payment_requirements, x402_version)
+        self._wakeup.set()
+
+    def take(
+        self,
+        owner: str,
+        sign: PaymentHeaderSigner,
+        payment_requirements: PaymentRequirements,
+        x402_version: int,
+    ) -> Optional[str]:
+        """Take a signed header for payment requirements, if one is ready.
+
+        Requirements that are not known yet are added to the pool, so later
+        payments for them find a header ready.
+
+        Args:
+            owner: Address of the account signing the headers
+            sign: Signs a fresh header for the requirements and version
+            payment_requirements: The payment requirements to pay
+            x402_version: x402 protocol version of the header
+
+        Returns:
+            A signed header, or None if none is ready and the caller must sign one
+        """
+        slot = self._slot(owner, sign, payment_requirements, x402_version)
+        if slot is None:
+            return None
+
+        deadline = time.time() + self.min_validity
+        header = None
+        with self._lock:
+            slot.last_used = time.time()
+            while slot.headers:
+                valid_before, candidate = slot.headers.popleft()
+                if valid_before >= deadline:
+                    header = candidate
+                    break
+
+        self._wakeup.set()
+        return header
+
+    def close(self) -> None:
+        """Stop the background thread and drop all headers."""
+        with self._lock:
+            self._closed = True
+            self._slots.clear()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _slot(
+        self,
+        owner: str,
+        sign: PaymentHeaderSigner,
+        payment_requirements: PaymentRequirements,
+        x402_version: int,
+    ) -> Optional[_PoolSlot]:
+        # Headers that cannot stay valid for min_validity are not worth pooling
+        if payment_requirements.max_timeout_seconds <= self.min_validity:
+            return None
+
+        key = (owner.lower(), x402_version, payment_requirements.model_dump_json())
+        with self._lock:
+            if self._closed:
+                return None
+
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = _PoolSlot(sign, payment_requirements, x402_version)
+                self._slots[key] = slot
+                while len(self._slots) > self.max_requirements:
+                    self._slots.popitem(last=False)
+            else:
+                self._slots.move_to_end(key)
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="x402-header-pool", daemon=True
+                )
+                self._thread.start()
+            return slot
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                slots = self._expire(time.time())
+
+            for slot in slots:
+                self._refill(slot)
+
+            self._wakeup.wait(self.refill_interval)
+            self._wakeup.clear()
+
+    def _expire(self, now: float) -> list:
+        """Drop idle requirements and expiring headers, return the slots to refill."""
+        deadline = now + self.min_validity
+        for key, slot in list(self._slots.items()):
+            if now - slot.last_used > self.idle_timeout:
+                del self._slots[key]
+                continue
+            while slot.headers and slot.headers[0][0] < deadline:
+                slot.headers.popleft()
+        return [slot for slot in self._slots.values() if len(slot.headers) < self.depth]
+
+    def _refill(self, slot: _PoolSlot) -> None:
+        while True:
+            with self._lock:
+                if self._closed or len(slot.headers) >= self.depth:
+                    return
+
+            # The header's validBefore is at least this far from its signing time
+            valid_before = (
+                int(time.time()) + slot.payment_requirements.max_timeout_seconds
+            )
+            try:
+                header = slot.sign(slot.payment_requirements, slot.x402_version)
+            except Exception as e:
+                logger.error(f"Failed to pre-sign payment header: {str(e)}")
+                return
+
+            with self._lock:
+                slot.headers.append((valid_before, header))
@@ -6,8 +6,10 @@ from eth_account import Account
 from x402.clients.base import (
     x402Client,
     PaymentError,
+    PaymentRequirementsCache,
     PaymentSelectorCallable,
 )
+from x402.clients.pool import PaymentHeaderPool
 from x402.types import x402PaymentRequiredResponse
 import copy
 
@@ -40,18 +42,39 @@ class x402HTTPAdapter(HTTPAdapter):
             self._is_retry = False
             return super().send(request, **kwargs)
 
+        # Pay requests to endpoints with cached requirements on the first attempt
+        preemptive = False
+        if "X-Payment" not in request.headers:
+            payment_header = self.client.preemptive_payment_header(
+                request.method, request.url
+            )
+            if payment_header is not None:
+                request.headers["X-Payment"] = payment_header
+                request.headers["Access-Control-Expose-Headers"] = "X-Payment-Response"
+                preemptive = True
+
         response = super().send(request, **kwargs)
 
         if response.status_code != 402:
             return response
 
         try:
+            # The cached requirements of the endpoint no longer apply
+            if preemptive:
+                self.client.forget_payment_requirements(request.method, request.url)
+
             # Save the content before we parse it to avoid consuming it
             content = copy.deepcopy(response.content)
 
             # Parse the JSON content without using response.json() which consumes it
             data = json.loads(content.decode("utf-8"))
             payment_response = x402PaymentRequiredResponse(**data)
+            self.client.remember_payment_requirements(
+                request.method,
+                request.url,
+                payment_response.accepts,
+                payment_response.x402_version,
+            )
 
             # Select payment requirements
             selected_requirements = self.client.select_payment_requirements(
@@ -69,6 +92,7 @@ class x402HTTPAdapter(HTTPAdapter):
             request.headers["Access-Control-Expose-Headers"] = "X-Payment-Response"
 
             retry_response = super().send(request, **kwargs)
+            self._is_retry = False
 
             # Copy the retry response data to the original response
             response.status_code = retry_response.status_code
@@ -88,6 +112,8 @@ def x402_http_adapter(
     account: Account,
     max_value: Optional[int] = None,
     payment_requirements_selector: Optional[PaymentSelectorCallable] = None,
+    header_pool: Optional[PaymentHeaderPool] = None,
+    requirements_cache: Optional[PaymentRequirementsCache] = None,
     **kwargs,
 ) -> x402HTTPAdapter:
     """Create an HTTP adapter that handles 402 Payment Required responses.
@@ -98,6 +124,9 @@ def x402_http_adapter(
         payment_requirements_selector: Optional custom selector for payment requirements.
             Should be a callable that takes (accepts, network_filter, scheme_filter, max_value)
             and returns a PaymentRequirements object.
+        header_pool: Optional pool of payment headers signed ahead of time
+        requirements_cache: Optional cache of payment requirements per endpoint,
+            to pay requests to known endpoints on their first attempt
         **kwargs: Additional arguments to pass to HTTPAdapter
 
     Returns:
@@ -107,6 +136,8 @@ def x402_http_adapter(
         account,
         max_value=max_value,
         payment_requirements_selector=payment_requirements_selector,
+        header_pool=header_pool,
+        requirements_cache=requirements_cache,
     )
     return x402HTTPAdapter(client, **kwargs)
 
@@ -115,6 +146,8 @@ def x402_requests(
     account: Account,
     max_value: Optional[int] = None,
     payment_requirements_selector: Optional[PaymentSelectorCallable] = None,
+    header_pool: Optional[PaymentHeaderPool] = None,
+    requirements_cache: Optional[PaymentRequirementsCache] = None,
     **kwargs,
 ) -> requests.Session:
     """Create a requests session with x402 payment handling.
@@ -125,6 +158,9 @@ def x402_requests(
         payment_requirements_selector: Optional custom selector for payment requirements.
             Should be a callable that takes (accepts, network_filter, scheme_filter, max_value)
             and returns a PaymentRequirements object.
+        header_pool: Optional pool of payment headers signed ahead of time
+        requirements_cache: Optional cache of payment requirements per endpoint,
+            to pay requests to known endpoints on their first attempt
         **kwargs: Additional arguments to pass to HTTPAdapter
 
     Returns:
@@ -135,6 +171,8 @@ def x402_requests(
         account,
         max_value=max_value,
         payment_requirements_selector=payment_requirements_selector,
+        header_pool=header_pool,
+        requirements_cache=requirements_cache,
         **kwargs,
     )
 
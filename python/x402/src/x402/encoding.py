@@ -1,6 +1,12 @@
 import base64
+import binascii
 from typing import Union
 
+from x402.types import PaymentPayload
+
+# Signed exact payments encode to about 600 bytes
+MAX_PAYMENT_HEADER_SIZE = 8192
+
 
 def safe_base64_encode(data: Union[str, bytes]) -> str:
     """Safely encode string or bytes to base64 string.
@@ -26,3 +32,33 @@ def safe_base64_decode(data: str) -> str:
         Decoded utf-8 string
     """
     return base64.b64decode(data).decode("utf-8")
+
+
+def decode_payment_header(
+    header: Union[str, bytes], max_size: int = MAX_PAYMENT_HEADER_SIZE
+) -> PaymentPayload:
+    """Decode and validate an X-PAYMENT header.
+
+    The base64 bytes are validated as JSON in a single pass by pydantic, without
+    building an intermediate str and dict. Oversized headers are rejected before
+    any decoding.
+
+    Args:
+        header: Base64 encoded JSON payment payload
+        max_size: Maximum header length in bytes
+
+    Returns:
+        The validated payment payload
+
+    Raises:
+        ValueError: If the header is too large, not base64 or not a valid payload
+    """
+    if len(header) > max_size:
+        raise ValueError(f"Payment header is larger than {max_size} bytes")
+
+    try:
+        data = base64.b64decode(header)
+    except binascii.Error as e:
+        raise ValueError(f"Payment header is not valid base64: {e}") from e
+
+    return PaymentPayload.model_validate_json(data)
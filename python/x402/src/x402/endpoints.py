@@ -0,0 +1,104 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+
+class FacilitatorEndpoint:
+    """Latency and health state of a single facilitator endpoint.
+
+    The endpoint acts as a circuit breaker: after `failure_threshold` consecutive
+    failures it is ejected for `ejection_seconds`. Once that period has passed it is
+    half-open, so the next request probes it, and a further failure ejects it again
+    straight away while a success closes the circuit.
+
+    Args:
+        url: Base URL of the facilitator
+        latency_window: Number of recent request latencies kept to estimate the p95
+        failure_threshold: Consecutive failures before the endpoint is ejected
+        ejection_seconds: Seconds an ejected endpoint receives no traffic
+    """
+
+    def __init__(
+        self,
+        url: str,
+        latency_window: int = 100,
+        failure_threshold: int = 3,
+        ejection_seconds: float = 30.0,
+    ):
+        self.url = url
+        self.failure_threshold = failure_threshold
+        self.ejection_seconds = ejection_seconds
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self._latencies: deque[float] = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    def p95(self) -> float:
+        """95th percentile of recent latencies in seconds, 0 if nothing was measured yet."""
+        with self._lock:
+            if not self._latencies:
+                return 0.0
+            latencies = sorted(self._latencies)
+        return latencies[math.ceil(0.95 * len(latencies)) - 1]
+
+    def is_available(self, now: Optional[float] = None) -> bool:
+        """Whether the endpoint is not currently ejected."""
+        now = time.monotonic() if now is None else now
+        return now >= self.ejected_until
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+            self.consecutive_failures = 0
+            self.ejected_until = 0.0
+
+    def record_failure(self, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                self.ejected_until = now + self.ejection_seconds
+
+
+class EndpointPool:
+    """Facilitator endpoints ranked by health and observed p95 latency.
+
+    Args:
+        urls: Base URLs of the facilitators, in order of preference
+        latency_window: Number of recent request latencies kept per endpoint
+        failure_threshold: Consecutive failures before an endpoint is ejected
+        ejection_seconds: Seconds an ejected endpoint receives no traffic
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        latency_window: int = 100,
+        failure_threshold: int = 3,
+        ejection_seconds: float = 30.0,
+    ):
+        if not urls:
+            raise ValueError("At least one facilitator URL is required")
+
+        self.endpoints = [
+            FacilitatorEndpoint(
+                url, latency_window, failure_threshold, ejection_seconds
+            )
+            for url in urls
+        ]
+
+    def ranked(self, now: Optional[float] = None) -> List[FacilitatorEndpoint]:
+        """Endpoints to try, in order.
+
+        Available endpoints come first, fastest p95 first, with ties kept in the
+        configured order. Ejected endpoints follow as a last resort, soonest to
+        return first, so requests still have somewhere to go if all are ejected.
+        """
+        now = time.monotonic() if now is None else now
+        available = [e for e in self.endpoints if e.is_available(now)]
+        ejected = [e for e in self.endpoints if not e.is_available(now)]
+        return sorted(available, key=lambda e: e.p95()) + sorted(
+            ejected, key=lambda e: e.ejected_until
+        )
@@ -1,12 +1,15 @@
+import functools
 import time
 import secrets
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from typing_extensions import (
     TypedDict,
 )  # use `typing_extensions.TypedDict` instead of `typing.TypedDict` on Python < 3.12
 from eth_account import Account
+from eth_utils import keccak
 from x402.encoding import safe_base64_encode, safe_base64_decode
 from x402.types import (
+    PaymentPayload,
     PaymentRequirements,
 )
 from x402.chains import get_chain_id
@@ -51,6 +54,131 @@ class PaymentHeader(TypedDict):
     payload: dict[str, Any]
 
 
+TRANSFER_WITH_AUTHORIZATION_TYPES = {
+    "TransferWithAuthorization": [
+        {"name": "from", "type": "address"},
+        {"name": "to", "type": "address"},
+        {"name": "value", "type": "uint256"},
+        {"name": "validAfter", "type": "uint256"},
+        {"name": "validBefore", "type": "uint256"},
+        {"name": "nonce", "type": "bytes32"},
+    ]
+}
+
+
+EIP712_DOMAIN_TYPEHASH = keccak(
+    text="EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)"
+)
+
+TRANSFER_WITH_AUTHORIZATION_TYPEHASH = keccak(
+    text="TransferWithAuthorization(address from,address to,uint256 value,"
+    "uint256 validAfter,uint256 validBefore,bytes32 nonce)"
+)
+
+
+def _encode_address(address: str) -> bytes:
+    address_bytes = bytes.fromhex(address.removeprefix("0x"))
+    if len(address_bytes) != 20:
+        raise ValueError(f"Invalid address: {address}")
+    return address_bytes.rjust(32, b"\0")
+
+
+def _encode_uint256(value: Any) -> bytes:
+    return int(value).to_bytes(32, "big")
+
+
+@functools.lru_cache(maxsize=256)
+def domain_separator(network: str, asset: str, name: str, version: str) -> bytes:
+    """Compute the EIP-712 domain separator of a token, cached per domain.
+
+    Args:
+        network: Network of the token, gives the chainId
+        asset: Token contract address, the verifyingContract
+        name: EIP-712 name of the token
+        version: EIP-712 version of the token
+
+    Returns:
+        The 32-byte domain separator
+    """
+    return keccak(
+        EIP712_DOMAIN_TYPEHASH
+        + keccak(text=name)
+        + keccak(text=version)
+        + _encode_uint256(get_chain_id(network))
+        + _encode_address(asset)
+    )
+
+
+def transfer_with_authorization_hash(
+    payment_requirements: PaymentRequirements, authorization: Dict[str, Any]
+) -> bytes:
+    """Compute the EIP-712 signing hash of a TransferWithAuthorization.
+
+    Equal to hashing `transfer_with_authorization_typed_data`, but only the struct
+    hash is computed per authorization, from the ABI-encoded fields, and the
+    domain separator is cached per token.
+
+    Args:
+        payment_requirements: Requirements providing the token domain (extra name/version, network, asset)
+        authorization: Authorization fields keyed by their EIP-712 names, nonce as 32 bytes
+
+    Returns:
+        The 32-byte hash to sign
+    """
+    nonce = authorization["nonce"]
+    if len(nonce) != 32:
+        raise ValueError("Authorization nonce must be 32 bytes")
+
+    struct_hash = keccak(
+        TRANSFER_WITH_AUTHORIZATION_TYPEHASH
+        + _encode_address(authorization["from"])
+        + _encode_address(authorization["to"])
+        + _encode_uint256(authorization["value"])
+        + _encode_uint256(authorization["validAfter"])
+        + _encode_uint256(authorization["validBefore"])
+        + nonce
+    )
+    separator = domain_separator(
+        payment_requirements.network,
+        payment_requirements.asset,
+        payment_requirements.extra["name"],
+        payment_requirements.extra["version"],
+    )
+    return keccak(b"\x19\x01" + separator + struct_hash)
+
+
+def transfer_with_authorization_typed_data(
+    payment_requirements: PaymentRequirements, authorization: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Build the EIP-712 TransferWithAuthorization typed data for an authorization.
+
+    Args:
+        payment_requirements: Requirements providing the token domain (extra name/version, network, asset)
+        authorization: Authorization fields keyed by their EIP-712 names, nonce as bytes
+
+    Returns:
+        Typed data dict with types, primaryType, domain and message
+    """
+    return {
+        "types": TRANSFER_WITH_AUTHORIZATION_TYPES,
+        "primaryType": "TransferWithAuthorization",
+        "domain": {
+            "name": payment_requirements.extra["name"],
+            "version": payment_requirements.extra["version"],
+            "chainId": int(get_chain_id(payment_requirements.network)),
+            "verifyingContract": payment_requirements.asset,
+        },
+        "message": {
+            "from": authorization["from"],
+            "to": authorization["to"],
+            "value": int(authorization["value"]),
+            "validAfter": int(authorization["validAfter"]),
+            "validBefore": int(authorization["validBefore"]),
+            "nonce": authorization["nonce"],
+        },
+    }
+
+
 def sign_payment_header(
     account: Account, payment_requirements: PaymentRequirements, header: PaymentHeader
 ) -> str:
@@ -60,39 +188,11 @@ def sign_payment_header(
 
         nonce_bytes = bytes.fromhex(auth["nonce"])
 
-        typed_data = {
-            "types": {
-                "TransferWithAuthorization": [
-                    {"name": "from", "type": "address"},
-                    {"name": "to", "type": "address"},
-                    {"name": "value", "type": "uint256"},
-                    {"name": "validAfter", "type": "uint256"},
-                    {"name": "validBefore", "type": "uint256"},
-                    {"name": "nonce", "type": "bytes32"},
-                ]
-            },
-            "primaryType": "TransferWithAuthorization",
-            "domain": {
-                "name": payment_requirements.extra["name"],
-                "version": payment_requirements.extra["version"],
-                "chainId": int(get_chain_id(payment_requirements.network)),
-                "verifyingContract": payment_requirements.asset,
-            },
-            "message": {
-                "from": auth["from"],
-                "to": auth["to"],
-                "value": int(auth["value"]),
-                "validAfter": int(auth["validAfter"]),
-                "validBefore": int(auth["validBefore"]),
-                "nonce": nonce_bytes,
-            },
-        }
-
-        signed_message = account.sign_typed_data(
-            domain_data=typed_data["domain"],
-            message_types=typed_data["types"],
-            message_data=typed_data["message"],
+        # Sign the EIP-712 hash directly instead of encoding the typed data
+        message_hash = transfer_with_authorization_hash(
+            payment_requirements, {**auth, "nonce": nonce_bytes}
         )
+        signed_message = account.unsafe_sign_hash(message_hash)
         signature = signed_message.signature.hex()
         if not signature.startswith("0x"):
             signature = f"0x{signature}"
@@ -107,6 +207,93 @@ def sign_payment_header(
         raise
 
 
+# Seconds a payment must remain valid for so it can still be settled on chain
+VALID_BEFORE_BUFFER_SECONDS = 6
+
+
+def verify_payment_locally(
+    payment: PaymentPayload,
+    payment_requirements: PaymentRequirements,
+    now: Optional[int] = None,
+) -> Optional[str]:
+    """Run the checks on an exact payment that need no network access.
+
+    Checks the scheme and network, the recipient and amount against the requirements,
+    the validAfter/validBefore window, and that the TransferWithAuthorization signature
+    recovers to `authorization.from`. The asset is covered by the signature, since the
+    token contract is the EIP-712 verifying contract.
+
+    The signature check is skipped when the requirements carry no EIP-712 domain
+    (extra name/version) or the signature is not a 65-byte ECDSA signature, e.g. from
+    a smart contract wallet. The facilitator still performs the full verification.
+
+    Args:
+        payment: The decoded payment payload
+        payment_requirements: The payment requirements selected for the payment
+        now: Current unix timestamp, defaults to the system clock
+
+    Returns:
+        The invalid reason if the payment is certainly invalid, None otherwise
+    """
+    if payment.scheme != "exact" or payment_requirements.scheme != "exact":
+        return "invalid_scheme"
+    if payment.network != payment_requirements.network:
+        return "invalid_network"
+
+    auth = payment.payload.authorization
+    if now is None:
+        now = int(time.time())
+
+    try:
+        value = int(auth.value)
+        valid_after = int(auth.valid_after)
+        valid_before = int(auth.valid_before)
+        nonce = bytes.fromhex(auth.nonce.removeprefix("0x"))
+        signature = bytes.fromhex(payment.payload.signature.removeprefix("0x"))
+        _encode_address(auth.from_)
+        _encode_address(auth.to)
+    except ValueError:
+        return "invalid_payload"
+    if len(nonce) != 32:
+        return "invalid_payload"
+
+    if auth.to.lower() != payment_requirements.pay_to.lower():
+        return "invalid_exact_evm_payload_recipient_mismatch"
+    if value < int(payment_requirements.max_amount_required):
+        return "invalid_exact_evm_payload_authorization_value"
+    if valid_before < now + VALID_BEFORE_BUFFER_SECONDS:
+        return "invalid_exact_evm_payload_authorization_valid_before"
+    if valid_after > now:
+        return "invalid_exact_evm_payload_authorization_valid_after"
+
+    extra = payment_requirements.extra or {}
+    if len(signature) != 65 or "name" not in extra or "version" not in extra:
+        return None
+
+    # The payload is well formed at this point, so errors hashing the typed data
+    # come from the requirements and are raised rather than blamed on the payer
+    message_hash = transfer_with_authorization_hash(
+        payment_requirements,
+        {
+            "from": auth.from_,
+            "to": auth.to,
+            "value": value,
+            "validAfter": valid_after,
+            "validBefore": valid_before,
+            "nonce": nonce,
+        },
+    )
+    try:
+        signer = Account._recover_hash(message_hash, signature=signature)
+    except Exception:
+        return "invalid_exact_evm_payload_signature"
+
+    if signer.lower() != auth.from_.lower():
+        return "invalid_exact_evm_payload_signature"
+
+    return None
+
+
 def encode_payment(payment_payload: Dict[str, Any]) -> str:
     """Encode a payment payload into a base64 string, handling HexBytes and other non-serializable types."""
     from hexbytes import HexBytes
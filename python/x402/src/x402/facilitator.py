@@ -1,8 +1,19 @@
-from typing import Callable, Optional
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Coroutine, List, Optional, TypeVar, Union
 from typing_extensions import (
     TypedDict,
 )  # use `typing_extensions.TypedDict` instead of `typing.TypedDict` on Python < 3.12
 import httpx
+from x402.batching import Batcher
+from x402.cache import HeaderCache, VerificationCache, payment_digest
+from x402.endpoints import EndpointPool, FacilitatorEndpoint
+from x402.exact import verify_payment_locally
+from x402.singleflight import SingleFlight
 from x402.types import (
     PaymentPayload,
     PaymentRequirements,
@@ -12,85 +23,661 @@ from x402.types import (
     ListDiscoveryResourcesResponse,
 )
 
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
 
 class FacilitatorConfig(TypedDict, total=False):
     """Configuration for the X402 facilitator service.
 
     Attributes:
         url: The base URL for the facilitator service
+        urls: Base URLs of several interchangeable facilitators, used instead of `url`. Requests go to
+            the healthy endpoint with the lowest observed p95 latency and fail over to the others.
         create_headers: Optional function to create authentication headers
+        cache_headers: Whether to reuse the headers returned by `create_headers` until they expire,
+            instead of calling it for every request (defaults to False)
+        headers_ttl: Seconds cached headers are reused for when they carry no JWT `exp` claim
+            (defaults to 60.0)
+        headers_refresh_ahead: Seconds before expiry at which cached headers are refreshed in the
+            background (defaults to 10.0)
+        timeout: Timeout in seconds for facilitator requests (defaults to 5.0)
+        max_connections: Maximum number of concurrent connections in the pool (defaults to 100)
+        max_keepalive_connections: Maximum number of idle keep-alive connections (defaults to 20)
+        keepalive_expiry: Seconds an idle keep-alive connection is kept open (defaults to 5.0)
+        http2: Whether to negotiate HTTP/2 with the facilitator. Requires `httpx[http2]`.
+        verify_cache_size: Maximum number of cached successful verify responses, 0 disables the cache (defaults to 1024)
+        verify_cache_ttl: Maximum seconds a verify response is reused for the same payment (defaults to 30.0)
+        local_verification: Whether to reject payments failing signature, amount, recipient or
+            validity window checks before calling the facilitator (defaults to True)
+        batch_endpoints: Whether the facilitator accepts batched `/verify/batch` and `/settle/batch`
+            requests. Without them, batches are sent as concurrent single requests (defaults to False)
+        settle_batch_window: Seconds `settle` calls are collected for before being sent together
+            with `settle_many`, 0 disables batching (defaults to 0)
+        settle_batch_max_size: Maximum number of settlements sent in one batch (defaults to 50)
+        failure_threshold: Consecutive failures after which an endpoint is ejected (defaults to 3)
+        ejection_seconds: Seconds an ejected endpoint receives no traffic (defaults to 30.0)
+        hedge_after: Seconds after which an unanswered verify request is also sent to the next
+            endpoint, None disables hedging (defaults to None)
+        health_check_interval: Seconds between active health checks of every endpoint against
+            `/supported`, 0 disables them (defaults to 0)
     """
 
     url: str
+    urls: List[str]
     create_headers: Callable[[], dict[str, dict[str, str]]]
+    cache_headers: bool
+    headers_ttl: float
+    headers_refresh_ahead: float
+    timeout: float
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry: float
+    http2: bool
+    verify_cache_size: int
+    verify_cache_ttl: float
+    local_verification: bool
+    batch_endpoints: bool
+    settle_batch_window: float
+    settle_batch_max_size: int
+    failure_threshold: int
+    ejection_seconds: float
+    hedge_after: Optional[float]
+    health_check_interval: float
+
+
+# Errors raised before the request reached the facilitator, after which even a
+# settlement can safely be sent to another endpoint
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _failed_settlement(payment: PaymentPayload, error_reason: str) -> SettleResponse:
+    return SettleResponse(
+        success=False,
+        error_reason=error_reason,
+        network=payment.network,
+        payer=payment.payload.authorization.from_,
+    )
+
+
+def _payment_already_used(payment: PaymentPayload) -> SettleResponse:
+    """Failed settlement of a payment that is already being settled."""
+    return _failed_settlement(payment, "payment_already_used")
+
+
+def _batch_results(response: httpx.Response, count: int) -> Optional[List[Any]]:
+    """Per-payment results of a batch response, or None if the batch failed."""
+    if not response.is_success:
+        return None
+    try:
+        results = response.json()["results"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(results, list) or len(results) != count:
+        return None
+    return results
 
 
 class FacilitatorClient:
-    def __init__(self, config: Optional[FacilitatorConfig] = None):
+    """Client for the x402 facilitator service.
+
+    The client owns a pooled `httpx.AsyncClient` that is created on first use and
+    reused for every verify, settle and list call, so connections (and TLS sessions)
+    to the facilitator are kept alive between requests. Close it with `aclose()` or
+    use the client as an async context manager.
+
+    Configured with several `urls`, the client routes each request to the healthy
+    facilitator with the lowest observed p95 latency, ejects endpoints that keep
+    failing and fails over to the next one, so a single slow or broken facilitator
+    does not stall every paid route.
+
+    Args:
+        config: Facilitator configuration. Defaults to the public x402.org facilitator.
+        http_client: Optional caller-owned `httpx.AsyncClient` to send requests with.
+            It is never closed by the facilitator client.
+    """
+
+    def __init__(
+        self,
+        config: Optional[FacilitatorConfig] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
         if config is None:
             config = {"url": "https://x402.org/facilitator"}
 
-        # Validate URL format
-        url = config.get("url", "")
-        if not url.startswith(("http://", "https://")):
-            raise ValueError(f"Invalid URL {url}, must start with http:// or https://")
-        if url.endswith("/"):
-            url = url[:-1]
+        urls = []
+        for url in config.get("urls") or [config.get("url", "")]:
+            # Validate URL format
+            if not url.startswith(("http://", "https://")):
+                raise ValueError(
+                    f"Invalid URL {url}, must start with http:// or https://"
+                )
+            if url.endswith("/"):
+                url = url[:-1]
+            urls.append(url)
 
-        self.config = {"url": url, "create_headers": config.get("create_headers")}
+        if config.get("http2"):
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                raise ImportError(
+                    "http2 requires the 'h2' package, install it with `pip install httpx[http2]`"
+                )
 
-    async def verify(
-        self, payment: PaymentPayload, payment_requirements: PaymentRequirements
-    ) -> VerifyResponse:
-        """Verify a payment header is valid and a request should be processed"""
+        self.config = {"url": urls[0], "create_headers": config.get("create_headers")}
+        self._header_cache = (
+            HeaderCache(
+                config["create_headers"],
+                ttl=config.get("headers_ttl", 60.0),
+                refresh_ahead=config.get("headers_refresh_ahead", 10.0),
+            )
+            if config.get("create_headers") and config.get("cache_headers")
+            else None
+        )
+        self._endpoints = EndpointPool(
+            urls,
+            failure_threshold=config.get("failure_threshold", 3),
+            ejection_seconds=config.get("ejection_seconds", 30.0),
+        )
+        self._hedge_after = config.get("hedge_after")
+        self._health_check_interval = config.get("health_check_interval", 0)
+        self._health_check_task: Optional[asyncio.Task] = None
+        self._timeout = httpx.Timeout(config.get("timeout", 5.0))
+        self._limits = httpx.Limits(
+            max_connections=config.get("max_connections", 100),
+            max_keepalive_connections=config.get("max_keepalive_connections", 20),
+            keepalive_expiry=config.get("keepalive_expiry", 5.0),
+        )
+        self._http2 = bool(config.get("http2", False))
+
+        verify_cache_size = config.get("verify_cache_size", 1024)
+        self._verify_cache = (
+            VerificationCache(verify_cache_size, config.get("verify_cache_ttl", 30.0))
+            if verify_cache_size > 0
+            else None
+        )
+        self._in_flight = SingleFlight()
+        self._settling: set[str] = set()
+        self._local_verification = config.get("local_verification", True)
+        self._batch_endpoints = config.get("batch_endpoints", False)
+
+        settle_batch_window = config.get("settle_batch_window", 0)
+        self._settle_batcher = (
+            Batcher(
+                self.settle_many,
+                max_size=config.get("settle_batch_max_size", 50),
+                max_delay=settle_batch_window,
+            )
+            if settle_batch_window > 0
+            else None
+        )
+
+        self._owns_client = http_client is None
+        self._http_client = http_client
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client_pid: Optional[int] = None
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Return the pooled HTTP client, creating it on first use."""
+        if not self._owns_client:
+            return self._http_client
+
+        # Pooled connections are bound to the event loop and process that opened them
+        loop = asyncio.get_running_loop()
+        if self._http_client is not None and (
+            self._client_loop is not loop or self._client_pid != os.getpid()
+        ):
+            self._discard_http_client()
+
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=self._limits,
+                http2=self._http2,
+                follow_redirects=True,
+            )
+            self._client_loop, self._client_pid = loop, os.getpid()
+        return self._http_client
+
+    def _discard_http_client(self) -> None:
+        """Drop the pooled client of another event loop, closing it on that loop.
+
+        A client whose loop is no longer running cannot be closed from here; its
+        connections are released along with that loop. Neither can one inherited
+        from the parent of a forked process: its loop looks like it is running, but
+        the thread running it was not copied, and the connections belong to the parent.
+        """
+        client, loop = self._http_client, self._client_loop
+        forked = self._client_pid != os.getpid()
+        self._http_client, self._client_loop, self._client_pid = None, None, None
+        if client.is_closed or loop is None or forked or loop.is_closed():
+            return
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client and release its connections."""
+        if self._health_check_task is not None:
+            task, self._health_check_task = self._health_check_task, None
+            task.cancel()
+
+        if self._owns_client and self._http_client is not None:
+            client, self._http_client = self._http_client, None
+            self._client_loop, self._client_pid = None, None
+            await client.aclose()
+
+    async def __aenter__(self) -> "FacilitatorClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def _create_headers(self, operation: str) -> dict[str, str]:
         headers = {"Content-Type": "application/json"}
 
-        if self.config.get("create_headers"):
+        if self._header_cache is not None:
+            headers.update(await self._header_cache.get(operation))
+        elif self.config.get("create_headers"):
             custom_headers = await self.config["create_headers"]()
-            headers.update(custom_headers.get("verify", {}))
+            headers.update(custom_headers.get(operation, {}))
+
+        return headers
+
+    def _start_health_checks(self) -> None:
+        if self._health_check_interval <= 0:
+            return
+
+        loop = asyncio.get_running_loop()
+        task = self._health_check_task
+        if task is None or task.done() or task.get_loop() is not loop:
+            self._health_check_task = loop.create_task(self._run_health_checks())
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.config['url']}/verify",
+    async def _run_health_checks(self) -> None:
+        while True:
+            await asyncio.gather(
+                *(self._check_health(e) for e in self._endpoints.endpoints)
+            )
+            await asyncio.sleep(self._health_check_interval)
+
+    async def _check_health(self, endpoint: FacilitatorEndpoint) -> None:
+        try:
+            await self._send(endpoint, "GET", "/supported")
+        except httpx.HTTPError:
+            pass
+
+    async def _send(
+        self, endpoint: FacilitatorEndpoint, method: str, path: str, **kwargs: Any
+    ) -> httpx.Response:
+        """Send one request to an endpoint and record its outcome."""
+        start = time.monotonic()
+        try:
+            response = await self._get_http_client().request(
+                method, f"{endpoint.url}{path}", follow_redirects=True, **kwargs
+            )
+        except httpx.TransportError:
+            endpoint.record_failure()
+            raise
+
+        if response.status_code >= 500:
+            endpoint.record_failure()
+        else:
+            endpoint.record_success(time.monotonic() - start)
+        return response
+
+    async def _request(
+        self, operation: str, method: str, path: str, **kwargs: Any
+    ) -> httpx.Response:
+        """Send a request to the best facilitator endpoint, failing over to the others."""
+        self._start_health_checks()
+        endpoints = self._endpoints.ranked()
+
+        if operation == "verify" and self._hedge_after is not None:
+            response = await self._hedged_request(endpoints, method, path, **kwargs)
+        else:
+            response = await self._failover_request(
+                operation, endpoints, method, path, **kwargs
+            )
+
+        if response.status_code == 401 and self._header_cache is not None:
+            # Cached credentials were rejected, create new ones for the next request
+            self._header_cache.invalidate()
+        return response
+
+    async def _failover_request(
+        self,
+        operation: str,
+        endpoints: List[FacilitatorEndpoint],
+        method: str,
+        path: str,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Try the endpoints one after another until one gives a usable response.
+
+        Verify and list requests move on to the next endpoint after any transport
+        error or 5xx response. Settle requests only do so when the request could not
+        be sent at all, so an endpoint that may have settled is never bypassed.
+        """
+        for index, endpoint in enumerate(endpoints):
+            is_last = index == len(endpoints) - 1
+            try:
+                response = await self._send(endpoint, method, path, **kwargs)
+            except httpx.TransportError as e:
+                if is_last or (
+                    operation == "settle" and not isinstance(e, _NOT_SENT_ERRORS)
+                ):
+                    raise
+                continue
+
+            if response.status_code < 500 or is_last or operation == "settle":
+                return response
+
+    async def _hedged_request(
+        self,
+        endpoints: List[FacilitatorEndpoint],
+        method: str,
+        path: str,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Send a request to the next endpoint whenever the pending ones are slow or fail.
+
+        The first usable response wins and the requests still in flight are cancelled.
+        """
+        remaining = iter(endpoints)
+        pending: set[asyncio.Task] = set()
+
+        def hedge() -> None:
+            endpoint = next(remaining, None)
+            if endpoint is not None:
+                pending.add(
+                    asyncio.ensure_future(self._send(endpoint, method, path, **kwargs))
+                )
+
+        hedge()
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=self._hedge_after,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    hedge()
+                    continue
+
+                for task in done:
+                    if task.exception() is None and task.result().status_code < 500:
+                        return task.result()
+                    failed = task
+                    hedge()
+
+            # Every endpoint failed, surface the last error or 5xx response
+            return failed.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    def _payment_body(
+        payment: PaymentPayload, payment_requirements: PaymentRequirements
+    ) -> dict[str, Any]:
+        return {
+            "x402Version": payment.x402_version,
+            "paymentPayload": payment.model_dump(by_alias=True),
+            "paymentRequirements": payment_requirements.model_dump(
+                by_alias=True, exclude_none=True
+            ),
+        }
+
+    async def _post_payment(
+        self,
+        operation: str,
+        payment: PaymentPayload,
+        payment_requirements: PaymentRequirements,
+    ) -> dict[str, Any]:
+        headers = await self._create_headers(operation)
+
+        response = await self._request(
+            operation,
+            "POST",
+            f"/{operation}",
+            json=self._payment_body(payment, payment_requirements),
+            headers=headers,
+        )
+        return response.json()
+
+    async def _post_payments(
+        self,
+        operation: str,
+        items: List[tuple[PaymentPayload, PaymentRequirements]],
+    ) -> List[dict[str, Any]]:
+        """Send several payments to the facilitator, batched when it supports it.
+
+        A batch request that fails is retried as single verify requests. Failed
+        batch settlements are not sent again, since some of them may have gone
+        through; each payment gets a failed settle response instead.
+        """
+        if self._batch_endpoints:
+            headers = await self._create_headers(operation)
+            response = await self._request(
+                operation,
+                "POST",
+                f"/{operation}/batch",
                 json={
-                    "x402Version": payment.x402_version,
-                    "paymentPayload": payment.model_dump(by_alias=True),
-                    "paymentRequirements": payment_requirements.model_dump(
-                        by_alias=True, exclude_none=True
-                    ),
+                    "x402Version": items[0][0].x402_version,
+                    "items": [self._payment_body(p, r) for p, r in items],
                 },
                 headers=headers,
-                follow_redirects=True,
             )
 
-            data = response.json()
-            return VerifyResponse(**data)
+            if response.status_code in (404, 405):
+                # The facilitator has no batch endpoints, stop trying them
+                self._batch_endpoints = False
+            else:
+                results = _batch_results(response, len(items))
+                if results is not None:
+                    return results
+
+                logger.warning(
+                    f"Facilitator {operation} batch failed:"
+                    f" {response.status_code} {response.text}"
+                )
+                if operation == "settle":
+                    return [
+                        _failed_settlement(
+                            payment, "unexpected_settle_error"
+                        ).model_dump(by_alias=True)
+                        for payment, _ in items
+                    ]
+
+        return await asyncio.gather(
+            *(self._post_payment(operation, p, r) for p, r in items)
+        )
+
+    def _verify_locally(
+        self, payment: PaymentPayload, payment_requirements: PaymentRequirements
+    ) -> Optional[VerifyResponse]:
+        if not self._local_verification:
+            return None
+
+        invalid_reason = verify_payment_locally(payment, payment_requirements)
+        if invalid_reason is None:
+            return None
+
+        return VerifyResponse(
+            is_valid=False,
+            invalid_reason=invalid_reason,
+            payer=payment.payload.authorization.from_,
+        )
+
+    def _cache_verify_response(
+        self, key: str, payment: PaymentPayload, verify_response: VerifyResponse
+    ) -> None:
+        if not verify_response.is_valid or self._verify_cache is None:
+            return
+
+        try:
+            valid_before = int(payment.payload.authorization.valid_before)
+        except ValueError:
+            valid_before = 0
+        self._verify_cache.put(key, verify_response, valid_before)
+
+    async def verify(
+        self, payment: PaymentPayload, payment_requirements: PaymentRequirements
+    ) -> VerifyResponse:
+        """Verify a payment header is valid and a request should be processed
+
+        Successful responses are cached per payment digest, so retries of the same
+        payment header do not reach the facilitator until the payment is settled.
+        Concurrent calls for the same payment share a single facilitator request.
+        Payments that fail the local exact scheme checks are rejected without one.
+        """
+        local_response = self._verify_locally(payment, payment_requirements)
+        if local_response is not None:
+            return local_response
+
+        key = payment_digest(payment, payment_requirements)
+
+        if self._verify_cache is not None:
+            cached = self._verify_cache.get(key)
+            if cached is not None:
+                return cached
+
+        return await self._in_flight.do(
+            ("verify", key), lambda: self._verify(key, payment, payment_requirements)
+        )
+
+    async def _verify(
+        self,
+        key: str,
+        payment: PaymentPayload,
+        payment_requirements: PaymentRequirements,
+    ) -> VerifyResponse:
+        data = await self._post_payment("verify", payment, payment_requirements)
+        verify_response = VerifyResponse(**data)
+        self._cache_verify_response(key, payment, verify_response)
+        return verify_response
+
+    async def verify_many(
+        self, items: List[tuple[PaymentPayload, PaymentRequirements]]
+    ) -> List[VerifyResponse]:
+        """Verify several payments, sending the ones that need the facilitator together.
+
+        Args:
+            items: Pairs of payment and the payment requirements selected for it
+
+        Returns:
+            One VerifyResponse per item, in the same order
+        """
+        results: List[Optional[VerifyResponse]] = [None] * len(items)
+        pending: dict[str, list[int]] = {}
+
+        for index, (payment, payment_requirements) in enumerate(items):
+            results[index] = self._verify_locally(payment, payment_requirements)
+            if results[index] is not None:
+                continue
+
+            key = payment_digest(payment, payment_requirements)
+            if self._verify_cache is not None:
+                results[index] = self._verify_cache.get(key)
+            if results[index] is None:
+                pending.setdefault(key, []).append(index)
+
+        if pending:
+            indexes = list(pending.values())
+            responses = await self._post_payments(
+                "verify", [items[group[0]] for group in indexes]
+            )
+            for key, group, data in zip(pending, indexes, responses):
+                verify_response = VerifyResponse(**data)
+                self._cache_verify_response(key, items[group[0]][0], verify_response)
+                for index in group:
+                    results[index] = verify_response
+
+        return results
 
     async def settle(
         self, payment: PaymentPayload, payment_requirements: PaymentRequirements
     ) -> SettleResponse:
-        headers = {"Content-Type": "application/json"}
+        """Settle a verified payment.
 
-        if self.config.get("create_headers"):
-            custom_headers = await self.config["create_headers"]()
-            headers.update(custom_headers.get("settle", {}))
+        While a payment is being settled, further calls for it fail at once without
+        a facilitator request, so only one of several parallel requests carrying the
+        same payment header is paid for. With `settle_batch_window` set, settlements
+        are collected and sent together.
+        """
+        key = payment_digest(payment, payment_requirements)
+        if key in self._settling:
+            return _payment_already_used(payment)
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.config['url']}/settle",
-                json={
-                    "x402Version": payment.x402_version,
-                    "paymentPayload": payment.model_dump(by_alias=True),
-                    "paymentRequirements": payment_requirements.model_dump(
-                        by_alias=True, exclude_none=True
-                    ),
-                },
-                headers=headers,
-                follow_redirects=True,
-            )
-            data = response.json()
+        self._settling.add(key)
+        try:
+            return await self._settle(key, payment, payment_requirements)
+        finally:
+            self._settling.discard(key)
+
+    async def _settle(
+        self,
+        key: str,
+        payment: PaymentPayload,
+        payment_requirements: PaymentRequirements,
+    ) -> SettleResponse:
+        if self._settle_batcher is not None:
+            return await self._settle_batcher.submit((payment, payment_requirements))
+
+        if self._verify_cache is None:
+            data = await self._post_payment("settle", payment, payment_requirements)
             return SettleResponse(**data)
 
+        # A settled (or settling) authorization must be verified again before reuse
+        self._verify_cache.invalidate(key)
+        try:
+            data = await self._post_payment("settle", payment, payment_requirements)
+        finally:
+            self._verify_cache.invalidate(key)
+        return SettleResponse(**data)
+
+    async def settle_many(
+        self, items: List[tuple[PaymentPayload, PaymentRequirements]]
+    ) -> List[SettleResponse]:
+        """Settle several payments with as few facilitator requests as possible.
+
+        A payment that appears more than once in `items` is settled for its first
+        occurrence; the others fail as already used.
+
+        Args:
+            items: Pairs of payment and the payment requirements selected for it
+
+        Returns:
+            One SettleResponse per item, in the same order
+        """
+        results: List[Optional[SettleResponse]] = [None] * len(items)
+        pending: dict[str, int] = {}
+        for index, (payment, payment_requirements) in enumerate(items):
+            key = payment_digest(payment, payment_requirements)
+            if key in pending:
+                results[index] = _payment_already_used(payment)
+            else:
+                pending[key] = index
+
+        if self._verify_cache is not None:
+            for key in pending:
+                self._verify_cache.invalidate(key)
+
+        indexes = list(pending.values())
+        try:
+            responses = await self._post_payments(
+                "settle", [items[index] for index in indexes]
+            )
+        finally:
+            if self._verify_cache is not None:
+                for key in pending:
+                    self._verify_cache.invalidate(key)
+
+        for index, data in zip(indexes, responses):
+            results[index] = SettleResponse(**data)
+        return results
+
     async def list(
         self, request: Optional[ListDiscoveryResourcesRequest] = None
     ) -> ListDiscoveryResourcesResponse:
@@ -105,11 +692,7 @@ class FacilitatorClient:
         if request is None:
             request = ListDiscoveryResourcesRequest()
 
-        headers = {"Content-Type": "application/json"}
-
-        if self.config.get("create_headers"):
-            custom_headers = await self.config["create_headers"]()
-            headers.update(custom_headers.get("list", {}))
+        headers = await self._create_headers("list")
 
         # Build query parameters, excluding None values
         params = {
@@ -118,18 +701,140 @@ class FacilitatorClient:
             if v is not None
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.config['url']}/discovery/resources",
-                params=params,
-                headers=headers,
-                follow_redirects=True,
+        response = await self._request(
+            "list", "GET", "/discovery/resources", params=params, headers=headers
+        )
+
+        if response.status_code != 200:
+            raise ValueError(
+                f"Failed to list discovery resources: {response.status_code} {response.text}"
             )
 
-            if response.status_code != 200:
-                raise ValueError(
-                    f"Failed to list discovery resources: {response.status_code} {response.text}"
-                )
+        data = response.json()
+        return ListDiscoveryResourcesResponse(**data)
+
+
+def _gevent_patched() -> bool:
+    """Whether gevent has monkey-patched threading in this process."""
+    if "gevent" not in sys.modules:
+        return False
+    from gevent import monkey
+
+    return monkey.is_module_patched("threading")
+
+
+class _BackgroundLoop:
+    """An event loop running in a daemon thread, shared by the threads of a process.
+
+    The loop is started on first use and started again in a forked child process,
+    where the thread running the parent's loop does not exist.
+
+    Under gevent the loop runs in a native thread rather than a greenlet, and callers
+    wait for it from gevent's thread pool, so other greenlets keep running while a
+    call is in flight.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> asyncio.AbstractEventLoop:
+        pid = os.getpid()
+        with self._lock:
+            if self._loop is None or self._pid != pid or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                if _gevent_patched():
+                    # A patched threading.Thread is a greenlet, which would only
+                    # run the loop while the other greenlets are idle
+                    from gevent import monkey
+
+                    start_new_thread = monkey.get_original(
+                        "_thread", "start_new_thread"
+                    )
+                    start_new_thread(loop.run_forever, ())
+                else:
+                    thread = threading.Thread(
+                        target=loop.run_forever,
+                        name="x402-facilitator-loop",
+                        daemon=True,
+                    )
+                    thread.start()
+                self._loop, self._pid = loop, pid
+            return self._loop
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Run a coroutine on the loop and block until it completes."""
+        loop = self.get()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise RuntimeError("Cannot block on the facilitator loop from within it")
+
+        def wait() -> T:
+            return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+        if _gevent_patched():
+            from gevent import get_hub
+
+            return get_hub().threadpool.apply(wait)
+        return wait()
+
+
+_background_loop = _BackgroundLoop()
+
+
+class SyncFacilitatorClient:
+    """Blocking facilitator client for WSGI apps and other synchronous code.
+
+    Calls are run by the wrapped `FacilitatorClient` on one event loop per process,
+    running in a background thread, so its pooled connections, caches and batching
+    are shared by all worker threads instead of being rebuilt on a new event loop
+    for every call. Safe to use from several threads, or greenlets under gevent; a
+    worker blocks only on the result of its own call. After a fork the loop and the
+    pooled connections are recreated in the child.
+
+    Usage:
+        facilitator = SyncFacilitatorClient({"url": "https://x402.org/facilitator"})
+        verify_response = facilitator.verify(payment, payment_requirements)
+
+    Args:
+        facilitator: Facilitator client to wrap, or the configuration to create one
+    """
+
+    def __init__(
+        self, facilitator: Union[FacilitatorClient, FacilitatorConfig, None] = None
+    ):
+        self.facilitator = (
+            facilitator
+            if isinstance(facilitator, FacilitatorClient)
+            else FacilitatorClient(facilitator)
+        )
+
+    def verify(
+        self, payment: PaymentPayload, payment_requirements: PaymentRequirements
+    ) -> VerifyResponse:
+        """Verify a payment, see `FacilitatorClient.verify`."""
+        return _background_loop.run(
+            self.facilitator.verify(payment, payment_requirements)
+        )
+
+    def settle(
+        self, payment: PaymentPayload, payment_requirements: PaymentRequirements
+    ) -> SettleResponse:
+        """Settle a verified payment, see `FacilitatorClient.settle`."""
+        return _background_loop.run(
+            self.facilitator.settle(payment, payment_requirements)
+        )
+
+    def list(
+        self, request: Optional[ListDiscoveryResourcesRequest] = None
+    ) -> ListDiscoveryResourcesResponse:
+        """List discovery resources, see `FacilitatorClient.list`."""
+        return _background_loop.run(self.facilitator.list(request))
 
-            data = response.json()
-            return ListDiscoveryResourcesResponse(**data)
+    def close(self) -> None:
+        """Close the pooled connections of the wrapped client."""
+        _background_loop.run(self.facilitator.aclose())
@@ -1,35 +1,41 @@
+import asyncio
 import base64
-import json
+import contextlib
 import logging
-from typing import Any, Callable, Optional, get_args, cast
+from contextlib import asynccontextmanager
+from typing import Any, Callable, NamedTuple, Optional, Union
 
-from fastapi import Request
-from fastapi.responses import JSONResponse, HTMLResponse
-from pydantic import validate_call
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, Response
+from pydantic import ConfigDict, validate_call
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from x402.common import (
-    process_price_to_atomic_amount,
-    x402_VERSION,
-    find_matching_payment_requirements,
-)
-from x402.encoding import safe_base64_decode
+from x402.common import find_matching_payment_requirements
+from x402.encoding import decode_payment_header
 from x402.facilitator import FacilitatorClient, FacilitatorConfig
-from x402.path import path_is_match
-from x402.paywall import is_browser_request, get_paywall_html
+from x402.paywall import (
+    PAYWALL_ASSET_PATH,
+    get_paywall_html,
+    is_browser_request,
+    paywall_asset_response,
+)
+from x402.replay import ReplayGuard
+from x402.router import PaymentRoute, PaymentRouter
+from x402.session import SESSION_HEADER, PaymentSessions, SessionClaims
+from x402.settlement import DeferredSettlement
 from x402.types import (
     PaymentPayload,
     PaymentRequirements,
     Price,
-    x402PaymentRequiredResponse,
+    VerifyResponse,
     PaywallConfig,
-    SupportedNetworks,
     HTTPInputSchema,
 )
 
 logger = logging.getLogger(__name__)
 
 
-@validate_call
+@validate_call(config=ConfigDict(arbitrary_types_allowed=True))
 def require_payment(
     price: Price,
     pay_to_address: str,
@@ -41,10 +47,15 @@ def require_payment(
     output_schema: Optional[Any] = None,
     discoverable: Optional[bool] = True,
     facilitator_config: Optional[FacilitatorConfig] = None,
+    facilitator: Optional[FacilitatorClient] = None,
     network: str = "base-sepolia",
     resource: Optional[str] = None,
     paywall_config: Optional[PaywallConfig] = None,
     custom_paywall_html: Optional[str] = None,
+    deferred_settlement: Optional[DeferredSettlement] = None,
+    speculative: bool = False,
+    replay_guard: Optional[ReplayGuard] = None,
+    sessions: Optional[PaymentSessions] = None,
 ):
     """Generate a FastAPI middleware that gates payments for an endpoint.
 
@@ -62,158 +73,652 @@ def require_payment(
         discoverable (bool, optional): Whether the route is discoverable. Defaults to True.
         facilitator_config (Optional[Dict[str, Any]], optional): Configuration for the payment facilitator.
             If not provided, defaults to the public x402.org facilitator.
+        facilitator (Optional[FacilitatorClient], optional): Shared facilitator client to use instead of
+            creating one from facilitator_config. Close it on shutdown, e.g. with `facilitator_lifespan`.
         network (str, optional): Ethereum network ID. Defaults to "base-sepolia" (Base Sepolia testnet).
         resource (Optional[str], optional): Resource URL. Defaults to None (uses request URL).
         paywall_config (Optional[PaywallConfig], optional): Configuration for paywall UI customization.
             Includes options like cdp_client_key, app_name, app_logo, session_token_endpoint.
         custom_paywall_html (Optional[str], optional): Custom HTML to display for paywall instead of default.
+        deferred_settlement (Optional[DeferredSettlement], optional): Journal payments for background settlement
+            instead of settling before the response is returned. Responses then carry no X-PAYMENT-RESPONSE header.
+        speculative (bool, optional): Run the endpoint while the payment is being verified instead of after it.
+            The response is only returned if the payment is valid, otherwise it is discarded. Only use this for
+            idempotent, read-only endpoints; `request.state.verify_response` may not be set yet while they run.
+            Defaults to False.
+        replay_guard (Optional[ReplayGuard], optional): Reject payments whose authorization is already used by
+            another request without calling the facilitator. Defaults to None.
+        sessions (Optional[PaymentSessions], optional): Answer settled payments with a prepaid session token
+            in the X-PAYMENT-SESSION header, which later requests present instead of a payment. Defaults to None.
 
     Returns:
         Callable: FastAPI middleware function that checks for valid payment before processing requests
     """
 
-    # Validate network is supported
-    supported_networks = get_args(SupportedNetworks)
-    if network not in supported_networks:
-        raise ValueError(
-            f"Unsupported network: {network}. Must be one of: {supported_networks}"
-        )
+    router = PaymentRouter()
+    route = router.add(
+        price=price,
+        pay_to_address=pay_to_address,
+        path=path,
+        description=description,
+        mime_type=mime_type,
+        max_deadline_seconds=max_deadline_seconds,
+        input_schema=input_schema,
+        output_schema=output_schema,
+        discoverable=discoverable,
+        facilitator_config=facilitator_config,
+        facilitator=facilitator,
+        network=network,
+        resource=resource,
+        paywall_config=paywall_config,
+        custom_paywall_html=custom_paywall_html,
+        deferred_settlement=deferred_settlement,
+        speculative=speculative,
+        replay_guard=replay_guard,
+        sessions=sessions,
+    )
 
-    try:
-        max_amount_required, asset_address, eip712_domain = (
-            process_price_to_atomic_amount(price, network)
-        )
-    except Exception as e:
-        raise ValueError(f"Invalid price: {price}. Error: {e}")
+    middleware = payment_middleware(router)
+    middleware.facilitator = route.facilitator
+    return middleware
+
+
+def payment_middleware(router: PaymentRouter):
+    """Generate a FastAPI middleware that gates payments for all routes of a router.
+
+    A single middleware serves every priced route, so requests pay for one route
+    lookup instead of passing through one middleware per `require_payment` call.
 
-    facilitator = FacilitatorClient(facilitator_config)
+    Usage:
+        router = PaymentRouter()
+        router.add(path="/weather", price="$0.001", pay_to_address="0x...")
+        router.add(path="/premium/*", price="$0.01", pay_to_address="0x...")
+        app.middleware("http")(payment_middleware(router))
+
+    Args:
+        router (PaymentRouter): Table of priced routes
+
+    Returns:
+        Callable: FastAPI middleware function that checks for valid payment before processing requests
+    """
 
     async def middleware(request: Request, call_next: Callable):
-        # Skip if the path is not the same as the path in the middleware
-        if not path_is_match(path, request.url.path):
+        asset = await _paywall_asset(request)
+        if asset is not None:
+            return asset
+
+        # Skip if no priced route matches the request path
+        route = router.match(request.url.path)
+        if route is None:
+            return await call_next(request)
+
+        # Requests in a prepaid session skip payment verification and settlement
+        session = _redeem_session(route, request)
+        if isinstance(session, Response):
+            return session
+        if session is not None:
             return await call_next(request)
 
-        # Get resource URL if not explicitly provided
-        resource_url = resource or str(request.url)
-
-        # Construct payment details
-        payment_requirements = [
-            PaymentRequirements(
-                scheme="exact",
-                network=cast(SupportedNetworks, network),
-                asset=asset_address,
-                max_amount_required=max_amount_required,
-                resource=resource_url,
-                description=description,
-                mime_type=mime_type,
-                pay_to=pay_to_address,
-                max_timeout_seconds=max_deadline_seconds,
-                # TODO: Rename output_schema to request_structure
-                output_schema={
-                    "input": {
-                        "type": "http",
-                        "method": request.method.upper(),
-                        "discoverable": discoverable
-                        if discoverable is not None
-                        else True,
-                        **(input_schema.model_dump() if input_schema else {}),
-                    },
-                    "output": output_schema,
-                },
-                extra=eip712_domain,
+        selected = await _select_payment(route, request)
+        if isinstance(selected, Response):
+            return selected
+
+        if route.speculative:
+            # Run the endpoint while the payment is verified. Its response is
+            # discarded if the payment turns out to be invalid.
+            handler = asyncio.ensure_future(call_next(request))
+            try:
+                verified = await _verify_payment(route, request, *selected)
+            except BaseException:
+                handler.cancel()
+                raise
+            if isinstance(verified, Response):
+                handler.cancel()
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await handler
+                return verified
+        else:
+            verified = await _verify_payment(route, request, *selected)
+            if isinstance(verified, Response):
+                return verified
+
+            # Process the request
+            handler = call_next(request)
+
+        try:
+            response = await handler
+        except Exception:
+            _release_payment(route, *selected)
+            raise
+
+        # Early return without settling if the response is not a 2xx
+        if response.status_code < 200 or response.status_code >= 300:
+            _release_payment(route, *selected)
+            return response
+
+        payment_response, error, paid = await _settle_request(route, verified)
+        if error is not None:
+            return _payment_required_response(route, request, error)
+        if payment_response is not None:
+            response.headers["X-PAYMENT-RESPONSE"] = payment_response
+        if paid and route.sessions is not None:
+            response.headers[SESSION_HEADER] = route.sessions.issue(
+                verified.payment_requirements
             )
-        ]
-
-        def x402_response(error: str):
-            """Create a 402 response with payment requirements."""
-            request_headers = dict(request.headers)
-            status_code = 402
-
-            if is_browser_request(request_headers):
-                html_content = custom_paywall_html or get_paywall_html(
-                    error, payment_requirements, paywall_config
-                )
-                headers = {"Content-Type": "text/html; charset=utf-8"}
-
-                return HTMLResponse(
-                    content=html_content,
-                    status_code=status_code,
-                    headers=headers,
-                )
-            else:
-                response_data = x402PaymentRequiredResponse(
-                    x402_version=x402_VERSION,
-                    accepts=payment_requirements,
-                    error=error,
-                ).model_dump(by_alias=True)
-                headers = {"Content-Type": "application/json"}
-
-                return JSONResponse(
-                    content=response_data,
-                    status_code=status_code,
-                    headers=headers,
-                )
-
-        # Check for payment header
-        payment_header = request.headers.get("X-PAYMENT", "")
-
-        if payment_header == "":
-            return x402_response("No X-PAYMENT header provided")
-
-        # Decode payment header
+
+        return response
+
+    middleware.router = router
+    return middleware
+
+
+class PaymentMiddleware:
+    """Pure ASGI middleware that gates payments for all routes of a router.
+
+    Unlike the `app.middleware("http")` functions, it does not run the app in a
+    separate task or buffer the response body: `send` is wrapped so that the payment
+    is settled when the app starts its response and `X-PAYMENT-RESPONSE` is added to
+    the response headers, leaving `StreamingResponse` and server-sent events intact.
+
+    With `settle_after_stream`, the response starts right away and the payment is
+    settled once the app has sent the whole body. The settlement header is then sent
+    as an HTTP trailer when the server supports the `http.response.trailers`
+    extension; a failed settlement can no longer turn the response into a 402.
+
+    For routes registered with `speculative=True`, the app runs while the payment is
+    verified. Its response is held back until the payment is valid; if it is not, the
+    app is cancelled and a 402 is sent instead.
+
+    Usage:
+        router = PaymentRouter()
+        router.add(path="/stream", price="$0.01", pay_to_address="0x...")
+        app.add_middleware(PaymentMiddleware, router=router)
+
+    Args:
+        app: The ASGI app to protect
+        router: Table of priced routes
+        settle_after_stream: Settle once the response body is complete instead of
+            before the response starts
+    """
+
+    def __init__(
+        self, app: ASGIApp, router: PaymentRouter, settle_after_stream: bool = False
+    ):
+        self.app = app
+        self.router = router
+        self.settle_after_stream = settle_after_stream
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
+        asset = await _paywall_asset(request)
+        if asset is not None:
+            await asset(scope, receive, send)
+            return
+
+        # Skip if no priced route matches the request path
+        route = self.router.match(scope["path"])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Requests in a prepaid session skip payment verification and settlement
+        session = _redeem_session(route, request)
+        if isinstance(session, Response):
+            await session(scope, receive, send)
+            return
+        if session is not None:
+            await self.app(scope, receive, send)
+            return
+
+        selected = await _select_payment(route, request)
+        if isinstance(selected, Response):
+            await selected(scope, receive, send)
+            return
+
+        if route.speculative:
+            await self._run_speculatively(route, request, selected, receive, send)
+            return
+
+        verified = await _verify_payment(route, request, *selected)
+        if isinstance(verified, Response):
+            await verified(scope, receive, send)
+            return
+
         try:
-            payment_dict = json.loads(safe_base64_decode(payment_header))
-            payment = PaymentPayload(**payment_dict)
-        except Exception as e:
-            logger.warning(
-                f"Invalid payment header format from {request.client.host if request.client else 'unknown'}: {str(e)}"
+            await self.app(
+                scope, receive, self._settling_send(route, verified, request, send)
             )
-            return x402_response("Invalid payment header format")
+        except Exception:
+            _release_payment(route, *selected)
+            raise
+
+    async def _run_speculatively(
+        self,
+        route: PaymentRoute,
+        request: Request,
+        selected: tuple[PaymentPayload, PaymentRequirements],
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        """Run the app while the payment is verified, holding its response until then."""
+        scope = request.scope
+        verified_send: Optional[Send] = None
+        verified_event = asyncio.Event()
+
+        async def held_send(message: Message) -> None:
+            await verified_event.wait()
+            await verified_send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, receive, held_send))
+        try:
+            verified = await _verify_payment(route, request, *selected)
+        except BaseException:
+            handler.cancel()
+            raise
 
-        # Find matching payment requirements
-        selected_payment_requirements = find_matching_payment_requirements(
-            payment_requirements, payment
+        if isinstance(verified, Response):
+            # Discard whatever the app has produced so far
+            handler.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await handler
+            await verified(scope, receive, send)
+            return
+
+        verified_send = self._settling_send(route, verified, request, send)
+        verified_event.set()
+        try:
+            await handler
+        except Exception:
+            _release_payment(route, *selected)
+            raise
+
+    def _settling_send(
+        self,
+        route: PaymentRoute,
+        verified: "_VerifiedPayment",
+        request: Request,
+        send: Send,
+    ) -> Send:
+        if self.settle_after_stream:
+            return self._settle_after_body(route, verified, request.scope, send)
+        return self._settle_before_start(
+            route, verified, request, request.scope, request.receive, send
         )
 
-        if not selected_payment_requirements:
-            return x402_response("No matching payment requirements found")
+    def _settle_before_start(
+        self,
+        route: PaymentRoute,
+        verified: "_VerifiedPayment",
+        request: Request,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+    ) -> Send:
+        replaced = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal replaced
+            if replaced:
+                # The app's own response was replaced by a 402, drop the rest of it
+                return
+
+            if message["type"] == "http.response.start":
+                if not 200 <= message["status"] < 300:
+                    _release_payment(
+                        route, verified.payment, verified.payment_requirements
+                    )
+                    await send(message)
+                    return
+
+                payment_response, error, paid = await _settle_request(route, verified)
+                if error is not None:
+                    replaced = True
+                    response = _payment_required_response(route, request, error)
+                    await response(scope, receive, send)
+                    return
+                if payment_response is not None:
+                    message = _with_header(
+                        message, "X-PAYMENT-RESPONSE", payment_response
+                    )
+                if paid and route.sessions is not None:
+                    message = _with_header(
+                        message,
+                        SESSION_HEADER,
+                        route.sessions.issue(verified.payment_requirements),
+                    )
+
+            await send(message)
+
+        return send_wrapper
+
+    def _settle_after_body(
+        self,
+        route: PaymentRoute,
+        verified: "_VerifiedPayment",
+        scope: Scope,
+        send: Send,
+    ) -> Send:
+        trailers = "http.response.trailers" in scope.get("extensions", {})
+        successful = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal successful
+            if message["type"] == "http.response.start":
+                successful = 200 <= message["status"] < 300
+                if not successful:
+                    _release_payment(
+                        route, verified.payment, verified.payment_requirements
+                    )
+                elif trailers:
+                    message = {**message, "trailers": True}
+                await send(message)
+                return
+
+            await send(message)
+            if (
+                successful
+                and message["type"] == "http.response.body"
+                and not message.get("more_body", False)
+            ):
+                payment_response, error, paid = await _settle_request(route, verified)
+                if error is not None:
+                    logger.error(f"{error} after the response was sent")
+                if trailers:
+                    trailer = {"type": "http.response.trailers", "headers": []}
+                    if payment_response is not None:
+                        trailer = _with_header(
+                            trailer, "X-PAYMENT-RESPONSE", payment_response
+                        )
+                    if paid and route.sessions is not None:
+                        trailer = _with_header(
+                            trailer,
+                            SESSION_HEADER,
+                            route.sessions.issue(verified.payment_requirements),
+                        )
+                    await send({**trailer, "more_trailers": False})
+
+        return send_wrapper
+
+
+class _VerifiedPayment(NamedTuple):
+    payment: PaymentPayload
+    payment_requirements: PaymentRequirements
+    verify_response: VerifyResponse
+
+
+class _Settlement(NamedTuple):
+    payment_response: Optional[str]
+    error: Optional[str]
+    # Settled, or journaled for the first time for deferred settlement
+    paid: bool
+
 
-        # Verify payment
-        verify_response = await facilitator.verify(
+def _with_header(message: Message, name: str, value: str) -> Message:
+    headers = list(message.get("headers", []))
+    headers.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+    return {**message, "headers": headers}
+
+
+def _payment_required_response(
+    route: PaymentRoute, request: Request, error: str
+) -> Response:
+    """Create a 402 response with payment requirements."""
+    status_code = 402
+
+    if is_browser_request(dict(request.headers)):
+        payment_requirements = route.requirements.for_request(
+            request.method, str(request.url)
+        )
+        html_content = route.custom_paywall_html or get_paywall_html(
+            error,
+            payment_requirements,
+            route.paywall_config,
+            request.scope.get("root_path", "") + PAYWALL_ASSET_PATH,
+        )
+        headers = {"Content-Type": "text/html; charset=utf-8"}
+
+        return HTMLResponse(
+            content=html_content,
+            status_code=status_code,
+            headers=headers,
+        )
+    else:
+        body = route.requirements.payment_required_body(
+            request.method, str(request.url), error
+        )
+
+        return Response(
+            content=body.content,
+            status_code=status_code,
+            media_type="application/json",
+            headers={"ETag": body.etag},
+        )
+
+
+async def _paywall_asset(request: Request) -> Optional[Response]:
+    """Serve the paywall stylesheet and script linked from paywall pages."""
+    path = request.url.path
+    root_path = request.scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path) :]
+    if not path.startswith(PAYWALL_ASSET_PATH):
+        return None
+
+    # Loading the bundle and compressing an asset for the first time take a while
+    asset = await asyncio.to_thread(
+        paywall_asset_response,
+        request.method,
+        path,
+        request.headers.get("Accept-Encoding", ""),
+        request.headers.get("If-None-Match", ""),
+    )
+    if asset is None:
+        return None
+    return Response(
+        content=asset.content,
+        status_code=asset.status_code,
+        headers=dict(asset.headers),
+    )
+
+
+def _redeem_session(
+    route: PaymentRoute, request: Request
+) -> Union[Response, SessionClaims, None]:
+    """Use one call of the prepaid session presented with a request, if any.
+
+    Returns:
+        The session claims if the request is covered by a session, the 402 response
+        to send if its session cannot be used and it carries no payment, or None
+    """
+    token = request.headers.get(SESSION_HEADER)
+    if route.sessions is None or not token:
+        return None
+
+    for payment_requirements in route.requirements.for_request(
+        request.method, str(request.url)
+    ):
+        claims = route.sessions.redeem(token, payment_requirements)
+        if claims is not None:
+            request.state.payment_session = claims
+            return claims
+
+    if not request.headers.get("X-PAYMENT"):
+        return _payment_required_response(
+            route, request, "Payment session expired or invalid"
+        )
+    return None
+
+
+async def _select_payment(
+    route: PaymentRoute, request: Request
+) -> Union[Response, tuple[PaymentPayload, PaymentRequirements]]:
+    """Decode the payment of a request and select the requirements it pays for.
+
+    Returns:
+        The payment and its requirements, or the 402 response to send instead
+    """
+    payment_requirements = route.requirements.for_request(
+        request.method, str(request.url)
+    )
+
+    # Check for payment header
+    payment_header = request.headers.get("X-PAYMENT", "")
+
+    if payment_header == "":
+        return _payment_required_response(
+            route, request, "No X-PAYMENT header provided"
+        )
+
+    # Decode payment header
+    try:
+        payment = decode_payment_header(payment_header)
+    except Exception as e:
+        logger.warning(
+            f"Invalid payment header format from {request.client.host if request.client else 'unknown'}: {str(e)}"
+        )
+        return _payment_required_response(
+            route, request, "Invalid payment header format"
+        )
+
+    # Find matching payment requirements
+    selected_payment_requirements = find_matching_payment_requirements(
+        payment_requirements, payment
+    )
+
+    if not selected_payment_requirements:
+        return _payment_required_response(
+            route, request, "No matching payment requirements found"
+        )
+
+    # A deferred payment is accepted once, even before it has been settled
+    if (
+        route.deferred_settlement is not None
+        and await route.deferred_settlement.contains(
             payment, selected_payment_requirements
         )
+    ):
+        return _payment_required_response(route, request, "Payment already used")
 
-        if not verify_response.is_valid:
-            error_reason = verify_response.invalid_reason or "Unknown error"
-            return x402_response(f"Invalid payment: {error_reason}")
+    # Replays of an authorization in use are rejected without asking the facilitator
+    if route.replay_guard is not None and not route.replay_guard.claim(
+        payment, selected_payment_requirements
+    ):
+        return _payment_required_response(route, request, "Payment already used")
 
-        request.state.payment_details = selected_payment_requirements
-        request.state.verify_response = verify_response
+    return payment, selected_payment_requirements
 
-        # Process the request
-        response = await call_next(request)
 
-        # Early return without settling if the response is not a 2xx
-        if response.status_code < 200 or response.status_code >= 300:
-            return response
+def _release_payment(
+    route: PaymentRoute,
+    payment: PaymentPayload,
+    payment_requirements: PaymentRequirements,
+) -> None:
+    """Release the replay guard claim of a payment that was not used."""
+    if route.replay_guard is not None:
+        route.replay_guard.release(payment, payment_requirements)
+
+
+async def _verify_payment(
+    route: PaymentRoute,
+    request: Request,
+    payment: PaymentPayload,
+    payment_requirements: PaymentRequirements,
+) -> Union[Response, _VerifiedPayment]:
+    """Verify a selected payment with the facilitator of the route.
+
+    Returns:
+        The verified payment, or the 402 response to send instead
+    """
+    try:
+        verify_response = await route.facilitator.verify(payment, payment_requirements)
+    except BaseException:
+        _release_payment(route, payment, payment_requirements)
+        raise
 
-        # Settle the payment
+    if not verify_response.is_valid:
+        _release_payment(route, payment, payment_requirements)
+        error_reason = verify_response.invalid_reason or "Unknown error"
+        return _payment_required_response(
+            route, request, f"Invalid payment: {error_reason}"
+        )
+
+    request.state.payment_details = payment_requirements
+    request.state.verify_response = verify_response
+
+    return _VerifiedPayment(payment, payment_requirements, verify_response)
+
+
+async def _settle_request(
+    route: PaymentRoute, verified: _VerifiedPayment
+) -> _Settlement:
+    """Settle, or journal for deferred settlement, the payment of a served request.
+
+    Returns:
+        The outcome, with the X-PAYMENT-RESPONSE header value if the payment was
+        settled and the error to respond with if it could not be settled
+    """
+    if route.deferred_settlement is not None:
         try:
-            settle_response = await facilitator.settle(
-                payment, selected_payment_requirements
+            added = await route.deferred_settlement.enqueue(
+                verified.payment, verified.payment_requirements
             )
-            if settle_response.success:
-                response.headers["X-PAYMENT-RESPONSE"] = base64.b64encode(
-                    settle_response.model_dump_json(by_alias=True).encode("utf-8")
-                ).decode("utf-8")
-            else:
-                return x402_response(
-                    "Settle failed: "
-                    + (settle_response.error_reason or "Unknown error")
-                )
-        except Exception:
-            return x402_response("Settle failed")
+        except Exception as e:
+            logger.error(f"Failed to journal payment, settling inline: {str(e)}")
+        else:
+            # Concurrent requests with one payment all pass the check before the
+            # route, only the first one to journal it is served
+            if not added:
+                return _Settlement(None, "Payment already used", False)
+            return _Settlement(None, None, True)
 
-        return response
+    # Settle the payment
+    try:
+        settle_response = await route.facilitator.settle(
+            verified.payment, verified.payment_requirements
+        )
+    except Exception:
+        _release_payment(route, verified.payment, verified.payment_requirements)
+        return _Settlement(None, "Settle failed", False)
 
-    return middleware
+    if not settle_response.success:
+        _release_payment(route, verified.payment, verified.payment_requirements)
+        return _Settlement(
+            None,
+            "Settle failed: " + (settle_response.error_reason or "Unknown error"),
+            False,
+        )
+
+    payment_response = base64.b64encode(
+        settle_response.model_dump_json(by_alias=True).encode("utf-8")
+    ).decode("utf-8")
+    return _Settlement(payment_response, None, True)
+
+
+def facilitator_lifespan(*facilitators: FacilitatorClient):
+    """Create a FastAPI lifespan that closes the given facilitator clients on shutdown.
+
+    Usage:
+        facilitator = FacilitatorClient({"url": "https://x402.org/facilitator"})
+        app = FastAPI(lifespan=facilitator_lifespan(facilitator))
+        app.middleware("http")(require_payment(..., facilitator=facilitator))
+
+    Args:
+        *facilitators: Facilitator clients whose connection pools should be released
+
+    Returns:
+        Lifespan context manager factory to pass to `FastAPI(lifespan=...)`
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        try:
+            yield
+        finally:
+            for facilitator in facilitators:
+                await facilitator.aclose()
+
+    return lifespan
@@ -1,25 +1,32 @@
 import base64
-import json
-from typing import Any, Dict, Optional, Union, get_args, cast
-from flask import Flask, request, g
-from x402.path import path_is_match
+import logging
+from typing import Any, Optional, Union
+from flask import Flask, g
+from werkzeug.sansio.utils import get_current_url
+from werkzeug.wsgi import get_host
 from x402.types import (
     Price,
-    PaymentPayload,
-    PaymentRequirements,
-    x402PaymentRequiredResponse,
     PaywallConfig,
-    SupportedNetworks,
     HTTPInputSchema,
 )
-from x402.common import (
-    process_price_to_atomic_amount,
-    x402_VERSION,
-    find_matching_payment_requirements,
+from x402.common import find_matching_payment_requirements
+from x402.encoding import decode_payment_header
+from x402.facilitator import (
+    FacilitatorClient,
+    FacilitatorConfig,
+    SyncFacilitatorClient,
 )
-from x402.encoding import safe_base64_decode
-from x402.facilitator import FacilitatorClient, FacilitatorConfig
-from x402.paywall import is_browser_request, get_paywall_html
+from x402.paywall import (
+    PAYWALL_ASSET_PATH,
+    get_paywall_html,
+    is_browser_request,
+    paywall_asset_response,
+)
+from x402.replay import ReplayGuard
+from x402.router import PaymentRouter
+from x402.session import SESSION_HEADER, PaymentSessions
+
+logger = logging.getLogger(__name__)
 
 
 class ResponseWrapper:
@@ -46,6 +53,14 @@ class PaymentMiddleware:
     Flask middleware for x402 payment requirements.
     Allows multiple registrations with different path patterns and configurations.
 
+    All registrations share one PaymentRouter, and the app is wrapped by a single
+    WSGI middleware that looks up the matching route once per request. When several
+    registrations match a path, the last one added wins, so a catch-all added first
+    can be overridden for more specific paths.
+
+    Facilitator calls run on one background event loop per process through a
+    `SyncFacilitatorClient`, so worker threads share pooled connections.
+
     Usage:
         middleware = PaymentMiddleware(app)
         middleware.add(path="/weather", price="$0.001", pay_to_address="0x...")
@@ -55,6 +70,10 @@ class PaymentMiddleware:
     def __init__(self, app: Flask):
         self.app = app
         self.middleware_configs = []
+        self.router = PaymentRouter()
+        # Blocking wrappers of the facilitator clients of the routes
+        self._facilitators: dict[FacilitatorClient, SyncFacilitatorClient] = {}
+        self._applied = False
 
     def add(
         self,
@@ -68,10 +87,13 @@ class PaymentMiddleware:
         output_schema: Optional[Any] = None,
         discoverable: Optional[bool] = True,
         facilitator_config: Optional[FacilitatorConfig] = None,
+        facilitator: Union[FacilitatorClient, SyncFacilitatorClient, None] = None,
         network: str = "base-sepolia",
         resource: Optional[str] = None,
         paywall_config: Optional[PaywallConfig] = None,
         custom_paywall_html: Optional[str] = None,
+        replay_guard: Optional[ReplayGuard] = None,
+        sessions: Optional[PaymentSessions] = None,
     ):
         """
         Add a payment middleware configuration.
@@ -87,10 +109,16 @@ class PaymentMiddleware:
             output_schema (Optional[Any], optional): Schema for the response. Defaults to None.
             discoverable (bool, optional): Whether the route is discoverable. Defaults to True.
             facilitator_config (dict, optional): Facilitator config
+            facilitator (FacilitatorClient | SyncFacilitatorClient, optional): Shared facilitator client to
+                use instead of creating one from `facilitator_config`
             network (str, optional): Network ID
             resource (str, optional): Resource URL
             paywall_config (PaywallConfig, optional): Paywall UI customization config
             custom_paywall_html (str, optional): Custom HTML to display for paywall instead of default
+            replay_guard (ReplayGuard, optional): Reject payments whose authorization is already used by
+                another request without calling the facilitator
+            sessions (PaymentSessions, optional): Answer settled payments with a prepaid session token
+                in the X-PAYMENT-SESSION header, which later requests present instead of a payment
         """
         config = {
             "price": price,
@@ -103,198 +131,224 @@ class PaymentMiddleware:
             "output_schema": output_schema,
             "discoverable": discoverable,
             "facilitator_config": facilitator_config,
+            "facilitator": facilitator,
             "network": network,
             "resource": resource,
             "paywall_config": paywall_config,
             "custom_paywall_html": custom_paywall_html,
+            "replay_guard": replay_guard,
+            "sessions": sessions,
         }
+        if isinstance(facilitator, SyncFacilitatorClient):
+            self._facilitators[facilitator.facilitator] = facilitator
+            facilitator = facilitator.facilitator
+
+        route = self.router.add(**{**config, "facilitator": facilitator})
+        if route.facilitator not in self._facilitators:
+            self._facilitators[route.facilitator] = SyncFacilitatorClient(
+                route.facilitator
+            )
         self.middleware_configs.append(config)
 
         # Apply the middleware to the app
         self._apply_middleware()
 
     def _apply_middleware(self):
-        """Apply all middleware configurations to the Flask app."""
-        # Create the middleware chain
-        current_wsgi_app = self.app.wsgi_app
+        """Wrap the Flask app with the payment middleware, once."""
+        if self._applied:
+            return
 
-        for config in self.middleware_configs:
-            middleware = self._create_middleware(config, current_wsgi_app)
-            current_wsgi_app = middleware
+        self.app.wsgi_app = self._create_middleware(self.app.wsgi_app)
+        self._applied = True
 
-        self.app.wsgi_app = current_wsgi_app
+    def _create_middleware(self, next_app):
+        """Create a WSGI middleware function serving all routes of the router.
 
-    def _create_middleware(self, config: Dict[str, Any], next_app):
-        """Create a WSGI middleware function for the given configuration."""
+        Requests are matched and checked on the WSGI environ directly. No Flask
+        request context is pushed, and an app context is only pushed around the
+        app for paid requests, to pass the payment details in `g`.
+        """
 
-        # Validate network is supported
-        supported_networks = get_args(SupportedNetworks)
-        if config["network"] not in supported_networks:
-            raise ValueError(
-                f"Unsupported network: {config['network']}. Must be one of: {supported_networks}"
+        def middleware(environ, start_response):
+            # Skip if no priced route matches the request path
+            path = _decode_wsgi(environ.get("PATH_INFO") or "")
+            path = "/" + path.lstrip("/")
+
+            # Serve the stylesheet and script linked from paywall pages
+            asset = paywall_asset_response(
+                environ.get("REQUEST_METHOD", "GET"),
+                path,
+                environ.get("HTTP_ACCEPT_ENCODING", ""),
+                environ.get("HTTP_IF_NONE_MATCH", ""),
             )
-
-        # Process price configuration (same as FastAPI)
-        try:
-            max_amount_required, asset_address, eip712_domain = (
-                process_price_to_atomic_amount(config["price"], config["network"])
+            if asset is not None:
+                start_response(asset.status, asset.headers)
+                return [asset.content]
+
+            route = self.router.match(path)
+            if route is None:
+                return next_app(environ, start_response)
+
+            requirements = route.requirements
+            facilitator = self._facilitators[route.facilitator]
+
+            method = environ.get("REQUEST_METHOD", "GET")
+            script_name = _decode_wsgi(environ.get("SCRIPT_NAME") or "")
+            url = get_current_url(
+                environ.get("wsgi.url_scheme", "http"),
+                get_host(environ),
+                script_name,
+                path,
+                environ.get("QUERY_STRING", "").encode("latin-1"),
             )
-        except Exception as e:
-            raise ValueError(f"Invalid price: {config['price']}. Error: {e}")
-
-        facilitator = FacilitatorClient(config["facilitator_config"])
-
-        def middleware(environ, start_response):
-            # Create Flask request context
-            with self.app.request_context(environ):
-                # Skip if the path is not the same as the path in the middleware
-                if not path_is_match(config["path"], request.path):
-                    return next_app(environ, start_response)
-
-                # Get resource URL if not explicitly provided
-                resource_url = config["resource"] or request.url
-
-                # Construct payment details
-                payment_requirements = [
-                    PaymentRequirements(
-                        scheme="exact",
-                        network=cast(SupportedNetworks, config["network"]),
-                        asset=asset_address,
-                        max_amount_required=max_amount_required,
-                        resource=resource_url,
-                        description=config["description"],
-                        mime_type=config["mime_type"],
-                        pay_to=config["pay_to_address"],
-                        max_timeout_seconds=config["max_deadline_seconds"],
-                        # TODO: Rename output_schema to request_structure
-                        output_schema={
-                            "input": {
-                                "type": "http",
-                                "method": request.method.upper(),
-                                "discoverable": config.get("discoverable", True),
-                                **(
-                                    config["input_schema"].model_dump()
-                                    if config["input_schema"]
-                                    else {}
-                                ),
-                            },
-                            "output": config["output_schema"],
-                        },
-                        extra=eip712_domain,
+            payment_requirements = requirements.for_request(method, url)
+
+            def x402_response(error: str):
+                """Create a 402 response with payment requirements."""
+                request_headers = {
+                    "Accept": environ.get("HTTP_ACCEPT", ""),
+                    "User-Agent": environ.get("HTTP_USER_AGENT", ""),
+                }
+                status = "402 Payment Required"
+
+                if is_browser_request(request_headers):
+                    html_content = route.custom_paywall_html or get_paywall_html(
+                        error,
+                        payment_requirements,
+                        route.paywall_config,
+                        script_name.rstrip("/") + PAYWALL_ASSET_PATH,
                     )
-                ]
-
-                def x402_response(error: str):
-                    """Create a 402 response with payment requirements."""
-                    request_headers = dict(request.headers)
-                    status = "402 Payment Required"
-
-                    if is_browser_request(request_headers):
-                        html_content = config[
-                            "custom_paywall_html"
-                        ] or get_paywall_html(
-                            error, payment_requirements, config["paywall_config"]
-                        )
-                        headers = [("Content-Type", "text/html; charset=utf-8")]
-
-                        start_response(status, headers)
-                        return [html_content.encode("utf-8")]
-                    else:
-                        response_data = x402PaymentRequiredResponse(
-                            x402_version=x402_VERSION,
-                            accepts=payment_requirements,
-                            error=error,
-                        ).model_dump(by_alias=True)
+                    headers = [("Content-Type", "text/html; charset=utf-8")]
+
+                    start_response(status, headers)
+                    return [html_content.encode("utf-8")]
+                else:
+                    body = requirements.payment_required_body(method, url, error)
+                    headers = [
+                        ("Content-Type", "application/json"),
+                        ("Content-Length", body.content_length),
+                        ("ETag", body.etag),
+                    ]
+
+                    start_response(status, headers)
+                    return [body.content]
+
+            # Check for payment header
+            payment_header = environ.get("HTTP_X_PAYMENT", "")
+
+            # Requests in a prepaid session skip payment verification and settlement
+            session_token = environ.get("HTTP_X_PAYMENT_SESSION")
+            if route.sessions is not None and session_token:
+                for requirements_option in payment_requirements:
+                    claims = route.sessions.redeem(session_token, requirements_option)
+                    if claims is not None:
+                        with self.app.app_context():
+                            g.payment_session = claims
+                            return next_app(environ, start_response)
 
-                        headers = [
-                            ("Content-Type", "application/json"),
-                            ("Content-Length", str(len(json.dumps(response_data)))),
-                        ]
+                if payment_header == "":
+                    return x402_response("Payment session expired or invalid")
 
-                        start_response(status, headers)
-                        return [json.dumps(response_data).encode("utf-8")]
+            if payment_header == "":
+                return x402_response("No X-PAYMENT header provided")
 
-                # Check for payment header
-                payment_header = request.headers.get("X-PAYMENT", "")
+            # Decode payment header
+            try:
+                payment = decode_payment_header(payment_header)
+            except Exception as e:
+                return x402_response(f"Invalid payment header format: {str(e)}")
 
-                if payment_header == "":
-                    return x402_response("No X-PAYMENT header provided")
+            # Find matching payment requirements
+            selected_payment_requirements = find_matching_payment_requirements(
+                payment_requirements, payment
+            )
 
-                # Decode payment header
-                try:
-                    payment_dict = json.loads(safe_base64_decode(payment_header))
-                    payment = PaymentPayload(**payment_dict)
-                except Exception as e:
-                    return x402_response(f"Invalid payment header format: {str(e)}")
-
-                # Find matching payment requirements
-                selected_payment_requirements = find_matching_payment_requirements(
-                    payment_requirements, payment
-                )
+            if not selected_payment_requirements:
+                return x402_response("No matching payment requirements found")
 
-                if not selected_payment_requirements:
-                    return x402_response("No matching payment requirements found")
+            # Replays of an authorization in use are rejected locally
+            replay_guard = route.replay_guard
+            if replay_guard is not None and not replay_guard.claim(
+                payment, selected_payment_requirements
+            ):
+                return x402_response("Payment already used")
 
-                # Verify payment (async call in sync context)
-                import asyncio
+            def release_payment():
+                if replay_guard is not None:
+                    replay_guard.release(payment, selected_payment_requirements)
 
+            # Verify payment on the shared facilitator event loop
+            try:
+                verify_response = facilitator.verify(
+                    payment, selected_payment_requirements
+                )
+            except Exception:
+                release_payment()
+                raise
+
+            if not verify_response.is_valid:
+                release_payment()
+                error_reason = verify_response.invalid_reason or "Unknown error"
+                return x402_response(f"Invalid payment: {error_reason}")
+
+            # Create response wrapper to capture status and headers
+            response_wrapper = ResponseWrapper(start_response)
+
+            # Process the request, with the payment details in the Flask g object
+            try:
+                with self.app.app_context():
+                    g.payment_details = selected_payment_requirements
+                    g.verify_response = verify_response
+                    response = next_app(environ, response_wrapper)
+            except Exception:
+                release_payment()
+                raise
+
+            # Check if response is successful (2xx status code)
+            if (
+                response_wrapper.status_code is not None
+                and response_wrapper.status_code >= 200
+                and response_wrapper.status_code < 300
+            ):
+                # Settle the payment for successful responses
                 try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    verify_response = loop.run_until_complete(
-                        facilitator.verify(payment, selected_payment_requirements)
+                    settle_response = facilitator.settle(
+                        payment, selected_payment_requirements
                     )
-                finally:
-                    loop.close()
-
-                if not verify_response.is_valid:
-                    error_reason = verify_response.invalid_reason or "Unknown error"
-                    return x402_response(f"Invalid payment: {error_reason}")
-
-                # Store payment details in Flask g object
-                g.payment_details = selected_payment_requirements
-                g.verify_response = verify_response
-
-                # Create response wrapper to capture status and headers
-                response_wrapper = ResponseWrapper(start_response)
-
-                # Process the request
-                response = next_app(environ, response_wrapper)
-
-                # Check if response is successful (2xx status code)
-                if (
-                    response_wrapper.status_code is not None
-                    and response_wrapper.status_code >= 200
-                    and response_wrapper.status_code < 300
-                ):
-                    # Settle the payment for successful responses
-                    try:
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        settle_response = loop.run_until_complete(
-                            facilitator.settle(payment, selected_payment_requirements)
-                        )
 
-                        if settle_response.success:
-                            # Add settlement response header
-                            settlement_header = base64.b64encode(
-                                settle_response.model_dump_json(by_alias=True).encode(
-                                    "utf-8"
-                                )
-                            ).decode("utf-8")
+                    if settle_response.success:
+                        # Add settlement response header
+                        settlement_header = base64.b64encode(
+                            settle_response.model_dump_json(by_alias=True).encode(
+                                "utf-8"
+                            )
+                        ).decode("utf-8")
+                        response_wrapper.add_header(
+                            "X-PAYMENT-RESPONSE", settlement_header
+                        )
+                        if route.sessions is not None:
                             response_wrapper.add_header(
-                                "X-PAYMENT-RESPONSE", settlement_header
+                                SESSION_HEADER,
+                                route.sessions.issue(selected_payment_requirements),
                             )
-                        else:
-                            # If settlement fails, we can't return a new response since headers are already sent
-                            # Just log the error and continue with the original response
-                            print(f"Settle failed: {settle_response.error_reason}")
-                    except Exception as e:
-                        # Log the error but don't try to return a new response
-                        print(f"Settle failed: {str(e)}")
-                    finally:
-                        loop.close()
-
-                return response
+                    else:
+                        # If settlement fails, we can't return a new response since headers are already sent
+                        # Just log the error and continue with the original response
+                        release_payment()
+                        logger.error(f"Settle failed: {settle_response.error_reason}")
+                except Exception:
+                    # Log the error but don't try to return a new response
+                    release_payment()
+                    logger.exception("Settle failed")
+            else:
+                release_payment()
+
+            return response
 
         return middleware
+
+
+def _decode_wsgi(value: str) -> str:
+    """Decode a WSGI environ string like Flask's request does."""
+    # WSGI servers pass paths as latin-1 decoded bytes
+    return value.encode("latin-1").decode("utf-8", "replace")
@@ -1,6 +1,24 @@
 import fnmatch
+import functools
 import re
-from typing import Union
+import threading
+import warnings
+from collections import OrderedDict
+from typing import Generic, Optional, TypeVar, Union
+
+T = TypeVar("T")
+
+# Characters with a special meaning in regular expressions and globs
+_REGEX_META = frozenset(".^$*+?{}[]\\|()")
+_GLOB_META = frozenset("*?[")
+
+# Backreferences, named groups and global inline flags do not survive being
+# merged into one regex
+_UNMERGEABLE = re.compile(r"\\[1-9]|\(\?P[<=]|^\(\?[aiLmsux]+\)")
+_INLINE_FLAGS = re.compile(r"\(\?[aiLmsux]+\)")
+
+# Named groups fnmatch.translate emits for globs with several wildcards (Python < 3.11)
+_GLOB_GROUP = re.compile(r"\(\?P(<|=)g(\d+)")
 
 
 def path_is_match(path: Union[str, list[str]], request_path: str) -> bool:
@@ -20,24 +38,245 @@ def path_is_match(path: Union[str, list[str]], request_path: str) -> bool:
     Returns:
         bool: True if the request path matches any of the patterns, False otherwise.
     """
+    if isinstance(path, str):
+        patterns = (path,)
+    elif isinstance(path, list):
+        patterns = tuple(path)
+    else:
+        return False
 
-    def single_path_match(pattern: str) -> bool:
-        # Regex pattern
-        if pattern.startswith("regex:"):
-            regex_pattern = pattern[6:]  # Remove 'regex:' prefix
-            return bool(re.match(regex_pattern, request_path))
+    return _compiled_patterns(patterns).match(request_path) is not None
 
-        # Glob pattern (contains * or ?)
-        elif "*" in pattern or "?" in pattern:
-            return fnmatch.fnmatch(request_path, pattern)
 
-        # Exact match
-        else:
-            return pattern == request_path
+@functools.lru_cache(maxsize=256)
+def _compiled_patterns(patterns: tuple[str, ...]) -> "PathMatcher[bool]":
+    matcher: PathMatcher[bool] = PathMatcher(max_cached_paths=0)
+    matcher.add(list(patterns), True)
+    return matcher
 
-    if isinstance(path, str):
-        return single_path_match(path)
-    elif isinstance(path, list):
-        return any(single_path_match(p) for p in path)
 
-    return False
+class _TrieNode:
+    """Node of the pattern trie, keyed by the literal prefix of its patterns."""
+
+    __slots__ = ("children", "terminal", "regexes", "combined", "groups", "separate")
+
+    def __init__(self):
+        self.children: dict[str, "_TrieNode"] = {}
+        # Index of the first prefix glob ending here, e.g. "/api/" for "/api/*"
+        self.terminal: Optional[int] = None
+        # Globs and regexes whose literal prefix ends here, merged when compiled
+        self.regexes: list[tuple[int, str, bool]] = []
+        self.combined: Optional[re.Pattern] = None
+        self.groups: dict[str, int] = {}
+        self.separate: list[tuple[int, re.Pattern]] = []
+
+    def compile(self) -> None:
+        mergeable = [
+            (i, r) for i, r, glob in self.regexes if glob or not _UNMERGEABLE.search(r)
+        ]
+        self.separate = [
+            (i, re.compile(r))
+            for i, r, glob in self.regexes
+            if not glob and _UNMERGEABLE.search(r)
+        ]
+
+        if mergeable:
+            alternatives = [f"(?P<p{n}>{r})" for n, (_, r) in enumerate(mergeable)]
+            try:
+                with warnings.catch_warnings():
+                    # e.g. inline flags that only apply at the start of a pattern
+                    warnings.simplefilter("error")
+                    self.combined = re.compile("|".join(alternatives))
+                self.groups = {f"p{n}": i for n, (i, _) in enumerate(mergeable)}
+            except (re.error, Warning):
+                self.separate.extend((i, re.compile(r)) for i, r in mergeable)
+                self.separate.sort(key=lambda item: item[0])
+
+        for child in self.children.values():
+            child.compile()
+
+
+def _glob_literal_prefix(pattern: str) -> str:
+    for position, char in enumerate(pattern):
+        if char in _GLOB_META:
+            return pattern[:position]
+    return pattern
+
+
+def _regex_literal_prefix(regex: str) -> str:
+    """Literal text every match of `regex` (with `re.match`) must start with."""
+    if "|" in regex or _INLINE_FLAGS.search(regex):
+        # An alternation may match text with another prefix, and flags such as
+        # (?i) change what the literal text matches
+        return ""
+
+    start = position = 1 if regex.startswith("^") else 0
+    while position < len(regex) and regex[position] not in _REGEX_META:
+        position += 1
+    if position < len(regex) and regex[position] in "*?{":
+        # The last literal character is optional
+        position = max(start, position - 1)
+    return regex[start:position]
+
+
+class PathMatcher(Generic[T]):
+    """Match request paths against many path patterns at once.
+
+    Patterns use the syntax of `path_is_match` and are compiled on first use after
+    being added. Exact paths go into a hash table and all other patterns into a
+    character trie keyed by their literal prefix: prefix globs such as `/api/*` are
+    resolved by the trie alone, and the globs and `regex:` patterns sharing a prefix
+    are merged into one alternation regex per trie node. A lookup costs one hash
+    probe plus one walk of the request path, matching only the patterns whose prefix
+    the path starts with. Results for recent request paths are kept in an LRU cache.
+
+    When several patterns match, the value added first wins, or the value added
+    last with `last_wins`.
+
+    Args:
+        max_cached_paths: Maximum number of request paths whose result is cached
+        last_wins: Whether the value added last wins when several patterns match
+    """
+
+    def __init__(self, max_cached_paths: int = 4096, last_wins: bool = False):
+        self.max_cached_paths = max_cached_paths
+        self.last_wins = last_wins
+        self._patterns: list[tuple[str, int]] = []
+        self._values: list[T] = []
+        # Values in order of precedence, indexed by the compiled patterns
+        self._ranked: list[T] = []
+        self._exact: dict[str, int] = {}
+        self._root = _TrieNode()
+        self._compiled = True
+        self._cache: OrderedDict[str, Optional[int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def add(self, pattern: Union[str, list[str]], value: T) -> None:
+        """Add path pattern(s) resolving to `value`.
+
+        Args:
+            pattern: Path pattern(s) as accepted by `path_is_match`
+            value: Value returned by `match` for request paths matching the pattern(s)
+        """
+        patterns = [pattern] if isinstance(pattern, str) else pattern
+
+        with self._lock:
+            index = len(self._values)
+            for p in patterns:
+                if p.startswith("regex:"):
+                    # Surface invalid regular expressions when they are added
+                    re.compile(p[6:])
+
+            self._values.append(value)
+            self._patterns.extend((p, index) for p in patterns)
+            self._compiled = False
+            self._cache.clear()
+
+    def match(self, request_path: str) -> Optional[T]:
+        """Return the value of the winning pattern matching `request_path`.
+
+        Args:
+            request_path: The actual request path to check
+
+        Returns:
+            The matching value, or None if no pattern matches
+        """
+        with self._lock:
+            if not self._compiled:
+                self._compile()
+
+            if request_path in self._cache:
+                self._cache.move_to_end(request_path)
+                index = self._cache[request_path]
+            else:
+                index = self._lookup(request_path)
+                if self.max_cached_paths > 0:
+                    self._cache[request_path] = index
+                    while len(self._cache) > self.max_cached_paths:
+                        self._cache.popitem(last=False)
+
+        return self._ranked[index] if index is not None else None
+
+    def _lookup(self, request_path: str) -> Optional[int]:
+        best = self._exact.get(request_path)
+
+        node = self._root
+        position = 0
+        while True:
+            if node.terminal is not None and (best is None or node.terminal < best):
+                best = node.terminal
+
+            if node.combined is not None:
+                # Alternatives are tried in order, so the first match is the lowest index
+                match = node.combined.match(request_path)
+                if match is not None:
+                    index = node.groups[match.lastgroup]
+                    if best is None or index < best:
+                        best = index
+
+            for index, regex in node.separate:
+                if best is not None and index >= best:
+                    break
+                if regex.match(request_path):
+                    best = index
+                    break
+
+            if position == len(request_path):
+                break
+            node = node.children.get(request_path[position])
+            if node is None:
+                break
+            position += 1
+
+        return best
+
+    def _compile(self) -> None:
+        self._exact = {}
+        self._root = _TrieNode()
+
+        # Patterns are compiled by rank, the lowest rank winning
+        patterns = self._patterns
+        self._ranked = self._values
+        if self.last_wins:
+            last = len(self._values) - 1
+            patterns = sorted(
+                ((pattern, last - index) for pattern, index in patterns),
+                key=lambda item: item[1],
+            )
+            self._ranked = self._values[::-1]
+
+        for pattern, index in patterns:
+            if pattern.startswith("regex:"):
+                regex = pattern[6:]
+                node = self._node(_regex_literal_prefix(regex))
+                node.regexes.append((index, regex, False))
+            elif "*" in pattern or "?" in pattern:
+                prefix = _glob_literal_prefix(pattern)
+                node = self._node(prefix)
+                if pattern == prefix + "*":
+                    if node.terminal is None:
+                        node.terminal = index
+                else:
+                    # Give the helper groups of every glob unique names
+                    regex = _GLOB_GROUP.sub(
+                        lambda m: f"(?P{m[1]}g{index}_{len(node.regexes)}_{m[2]}",
+                        fnmatch.translate(pattern),
+                    )
+                    node.regexes.append((index, regex, True))
+            else:
+                self._exact.setdefault(pattern, index)
+
+        self._root.compile()
+        self._compiled = True
+
+    def _node(self, prefix: str) -> _TrieNode:
+        node = self._root
+        for char in prefix:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _TrieNode()
+            node = child
+        return node
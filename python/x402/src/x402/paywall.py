@@ -1,9 +1,250 @@
+import functools
+import gzip
+import hashlib
 import json
-from typing import Dict, Any, List, Optional
+import threading
+from http import HTTPStatus
+from importlib import resources
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
 
 from x402.types import PaymentRequirements, PaywallConfig
 from x402.common import x402_VERSION
-from x402.template import PAYWALL_TEMPLATE
+
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# URL path the paywall assets are served from, below the app's root path
+PAYWALL_ASSET_PATH = "/x402/paywall/"
+
+# Assets have versioned URLs, so browsers can keep them for good
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _read_paywall_template() -> str:
+    return (
+        resources.files("x402")
+        .joinpath("static/paywall.html")
+        .read_text(encoding="utf-8")
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def load_paywall_template() -> str:
+    """
+    Load the bundled paywall HTML template.
+
+    The template is read from the packaged `static/paywall.html` the first time it
+    is needed, so processes that only serve API clients never load it.
+
+    Returns:
+        The paywall HTML template
+    """
+    return _read_paywall_template()
+
+
+class PaywallAssetResponse(NamedTuple):
+    """Status, headers and body of a response serving a paywall asset."""
+
+    status_code: int
+    headers: List[Tuple[str, str]]
+    content: bytes
+
+    @property
+    def status(self) -> str:
+        """The WSGI status line."""
+        return f"{self.status_code} {HTTPStatus(self.status_code).phrase}"
+
+
+class PaywallAsset:
+    """A static file of the paywall bundle, compressed once per encoding on demand.
+
+    Compressing the script takes a noticeable time, so async servers should serve
+    assets from a worker thread.
+
+    Args:
+        name: File name, which includes a hash of the content
+        content_type: Content-Type header value
+        content: Uncompressed file content
+    """
+
+    def __init__(self, name: str, content_type: str, content: bytes):
+        self.name = name
+        self.content_type = content_type
+        self.version = name.split(".")[-2]
+        self._variants: Dict[str, bytes] = {"identity": content}
+        self._lock = threading.Lock()
+
+    def variant(self, encoding: str) -> bytes:
+        """Return the content in a content coding: identity, gzip or br."""
+        with self._lock:
+            content = self._variants.get(encoding)
+            if content is None:
+                identity = self._variants["identity"]
+                if encoding == "br":
+                    content = brotli.compress(identity, quality=9)
+                else:
+                    content = gzip.compress(identity, compresslevel=9, mtime=0)
+                self._variants[encoding] = content
+            return content
+
+    def response(
+        self, accept_encoding: str = "", if_none_match: str = ""
+    ) -> PaywallAssetResponse:
+        """Serve the asset, compressed if the client accepts it.
+
+        Args:
+            accept_encoding: Accept-Encoding header of the request
+            if_none_match: If-None-Match header of the request
+
+        Returns:
+            A 200 response, or a 304 if the client has the same variant cached
+        """
+        encoding = _negotiate_encoding(accept_encoding)
+        etag = (
+            f'"{self.version}"'
+            if encoding == "identity"
+            else f'"{self.version}-{encoding}"'
+        )
+        headers = [
+            ("Cache-Control", ASSET_CACHE_CONTROL),
+            ("ETag", etag),
+            ("Vary", "Accept-Encoding"),
+        ]
+
+        cached = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in cached or "*" in cached:
+            return PaywallAssetResponse(304, headers, b"")
+
+        content = self.variant(encoding)
+        headers.append(("Content-Type", self.content_type))
+        headers.append(("Content-Length", str(len(content))))
+        if encoding != "identity":
+            headers.append(("Content-Encoding", encoding))
+        return PaywallAssetResponse(200, headers, content)
+
+
+def _negotiate_encoding(accept_encoding: str) -> str:
+    accepted = set()
+    for coding in accept_encoding.lower().split(","):
+        name, _, params = coding.partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q=") and params[2:].strip("0.") == "":
+            continue  # q=0 refuses the coding
+        accepted.add(name.strip())
+
+    if "br" in accepted and brotli is not None:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return "identity"
+
+
+class PaywallBundle:
+    """The paywall template split into a small HTML shell and static assets.
+
+    The template's stylesheet and module script are served as assets from URLs
+    that carry a hash of their content. The shell rendered for each 402 only
+    holds the page markup, links to the assets and the `window.x402` config.
+
+    Args:
+        template: The single-file paywall HTML template
+    """
+
+    def __init__(self, template: str):
+        head_start = template.index("<head>") + len("<head>")
+        head_end = template.index("</head>")
+        style_start = template.index("<style>", head_start, head_end)
+        style_end = template.rindex("</style>", head_start, head_end)
+        body_start = template.index("<body>", head_end) + len("<body>")
+        script_start = template.index('<script type="module">', body_start)
+        script_end = template.rindex("</script>")
+
+        self.head = (
+            template[head_start:style_start]
+            + template[style_end + len("</style>") : head_end]
+        )
+        self.body = template[body_start:script_start]
+        self.stylesheet = self._add_asset(
+            "paywall.{}.css",
+            "text/css; charset=utf-8",
+            template[style_start + len("<style>") : style_end],
+        )
+        self.script = self._add_asset(
+            "paywall.{}.js",
+            "text/javascript; charset=utf-8",
+            template[script_start + len('<script type="module">') : script_end],
+        )
+        self.assets = {asset.name: asset for asset in (self.stylesheet, self.script)}
+
+    @staticmethod
+    def _add_asset(name: str, content_type: str, text: str) -> PaywallAsset:
+        content = text.encode("utf-8")
+        version = hashlib.sha256(content).hexdigest()[:16]
+        return PaywallAsset(name.format(version), content_type, content)
+
+    def render(self, config_script: str, asset_path: str = PAYWALL_ASSET_PATH) -> str:
+        """Render the HTML shell of a paywall.
+
+        Args:
+            config_script: Script tag setting `window.x402`
+            asset_path: URL path the assets are served from
+
+        Returns:
+            The paywall page
+        """
+        return (
+            f'<!DOCTYPE html><html lang="en"><head>{self.head}'
+            f'<link rel="stylesheet" href="{asset_path}{self.stylesheet.name}">'
+            f'<link rel="modulepreload" href="{asset_path}{self.script.name}">'
+            f"{config_script}\n</head><body>{self.body}"
+            f'<script type="module" src="{asset_path}{self.script.name}"></script>'
+            "</body></html>"
+        )
+
+
+@functools.lru_cache(maxsize=1)
+def load_paywall_bundle() -> PaywallBundle:
+    """
+    Load the paywall shell and assets, split from the bundled template once.
+
+    Returns:
+        The paywall bundle
+    """
+    return PaywallBundle(_read_paywall_template())
+
+
+def paywall_asset_response(
+    method: str, path: str, accept_encoding: str = "", if_none_match: str = ""
+) -> Optional[PaywallAssetResponse]:
+    """
+    Serve a request for a paywall asset.
+
+    Args:
+        method: HTTP method of the request
+        path: Request path, relative to the app's root path
+        accept_encoding: Accept-Encoding header of the request
+        if_none_match: If-None-Match header of the request
+
+    Returns:
+        The asset response, or None if the request is not for a paywall asset
+    """
+    if method not in ("GET", "HEAD") or not path.startswith(PAYWALL_ASSET_PATH):
+        return None
+
+    asset = load_paywall_bundle().assets.get(path[len(PAYWALL_ASSET_PATH) :])
+    if asset is None:
+        return None
+    return asset.response(accept_encoding, if_none_match)
+
+
+def __getattr__(name: str):
+    # PAYWALL_TEMPLATE used to be imported eagerly from x402.template
+    if name == "PAYWALL_TEMPLATE":
+        return load_paywall_template()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def is_browser_request(headers: Dict[str, Any]) -> bool:
@@ -81,39 +322,48 @@ def inject_payment_data(
     # Create x402 configuration object
     x402_config = create_x402_config(error, payment_requirements, paywall_config)
 
-    # Create the configuration script (matching TypeScript pattern)
+    # Inject the configuration script into the head (same as TypeScript)
+    return html_content.replace("</head>", f"{_config_script(x402_config)}\n</head>")
+
+
+def _config_script(x402_config: Dict[str, Any]) -> str:
+    """Create the script setting `window.x402` (matching TypeScript pattern)."""
     log_on_testnet = (
         "console.log('Payment requirements initialized:', window.x402);"
         if x402_config["testnet"]
         else ""
     )
+    # Escape "<" so that values cannot close the script element
+    config_json = json.dumps(x402_config).replace("<", "\\u003c")
 
-    config_script = f"""
+    return f"""
   <script>
-    window.x402 = {json.dumps(x402_config)};
+    window.x402 = {config_json};
     {log_on_testnet}
   </script>"""
 
-    # Inject the configuration script into the head (same as TypeScript)
-    return html_content.replace("</head>", f"{config_script}\n</head>")
-
 
 def get_paywall_html(
     error: str,
     payment_requirements: List[PaymentRequirements],
     paywall_config: Optional[PaywallConfig] = None,
+    asset_path: str = PAYWALL_ASSET_PATH,
 ) -> str:
     """
-    Load paywall HTML and inject payment data.
+    Render the paywall page with injected payment data.
+
+    The page is a small shell that loads the paywall stylesheet and script from
+    `asset_path`, where the payment middlewares serve them with long-lived caching
+    (see `paywall_asset_response`).
 
     Args:
         error: Error message to display
         payment_requirements: List of payment requirements
         paywall_config: Optional paywall UI configuration
+        asset_path: URL path the paywall assets are served from
 
     Returns:
-        Complete HTML with injected payment data
+        HTML of the paywall page with injected payment data
     """
-    return inject_payment_data(
-        PAYWALL_TEMPLATE, error, payment_requirements, paywall_config
-    )
+    x402_config = create_x402_config(error, payment_requirements, paywall_config)
+    return load_paywall_bundle().render(_config_script(x402_config), asset_path)
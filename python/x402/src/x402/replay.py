@@ -0,0 +1,208 @@
+import heapq
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from x402.types import PaymentPayload, PaymentRequirements
+
+
+def nonce_key(
+    payment: PaymentPayload, payment_requirements: PaymentRequirements
+) -> str:
+    """Identify the authorization a payment spends, independent of its signature.
+
+    Args:
+        payment: The decoded payment payload
+        payment_requirements: The payment requirements selected for the payment
+
+    Returns:
+        The key `network:asset:from:nonce`, lowercased
+    """
+    authorization = payment.payload.authorization
+    return ":".join(
+        (
+            payment.network,
+            payment_requirements.asset,
+            authorization.from_,
+            authorization.nonce,
+        )
+    ).lower()
+
+
+class NonceStore(ABC):
+    """Set of claimed authorization nonces, each kept until it expires.
+
+    Subclass it to share claimed nonces between workers, e.g. in a database.
+    Implementations must be thread safe and `add` must be atomic.
+    """
+
+    @abstractmethod
+    def add(self, key: str, expires_at: float) -> bool:
+        """Claim a nonce until `expires_at` (a Unix timestamp).
+
+        Returns:
+            True if the nonce was claimed, False if it already is
+        """
+
+    @abstractmethod
+    def discard(self, key: str) -> None:
+        """Release a claimed nonce, if it is claimed."""
+
+    @abstractmethod
+    def __contains__(self, key: str) -> bool:
+        """Whether a nonce is claimed and has not expired."""
+
+
+class MemoryNonceStore(NonceStore):
+    """In-process nonce store with time-bucketed expiry.
+
+    Nonces are grouped into buckets of `bucket_seconds` by expiry time, and a whole
+    bucket is dropped at once when its last nonce expires, so expiring nonces costs
+    one heap pop per bucket instead of a scan of every entry.
+
+    Args:
+        bucket_seconds: Width of the expiry buckets in seconds
+    """
+
+    def __init__(self, bucket_seconds: float = 10.0):
+        self.bucket_seconds = bucket_seconds
+        self._buckets: dict[int, set[str]] = {}
+        self._bucket_ends: list[int] = []
+        self._index: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._expire(time.time())
+            return key in self._index
+
+    def add(self, key: str, expires_at: float) -> bool:
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if key in self._index:
+                return False
+            if expires_at <= now:
+                # Already expired, nothing to remember
+                return True
+
+            bucket = int(expires_at // self.bucket_seconds) + 1
+            if bucket not in self._buckets:
+                self._buckets[bucket] = set()
+                heapq.heappush(self._bucket_ends, bucket)
+            self._buckets[bucket].add(key)
+            self._index[key] = bucket
+            return True
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            bucket = self._index.pop(key, None)
+            if bucket is not None:
+                self._buckets[bucket].discard(key)
+
+    def _expire(self, now: float) -> None:
+        while self._bucket_ends and self._bucket_ends[0] * self.bucket_seconds <= now:
+            for key in self._buckets.pop(heapq.heappop(self._bucket_ends)):
+                del self._index[key]
+
+
+class SQLiteNonceStore(NonceStore):
+    """Nonce store in a SQLite database, shared by the worker processes of a host.
+
+    Args:
+        path: Path of the SQLite database file
+        prune_interval: Seconds between deletions of expired nonces
+    """
+
+    def __init__(self, path: str = "x402-nonces.db", prune_interval: float = 60.0):
+        self.path = path
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=5.0
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS nonces"
+            " (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM nonces WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+            return row is not None
+
+    def add(self, key: str, expires_at: float) -> bool:
+        now = time.time()
+        with self._lock:
+            if now >= self._next_prune:
+                self._db.execute("DELETE FROM nonces WHERE expires_at <= ?", (now,))
+                self._next_prune = now + self.prune_interval
+
+            # Insert the nonce, or take over an expired claim of it
+            cursor = self._db.execute(
+                "INSERT INTO nonces (key, expires_at) VALUES (?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET expires_at = excluded.expires_at"
+                " WHERE nonces.expires_at <= ?",
+                (key, expires_at, now),
+            )
+            return cursor.rowcount == 1
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM nonces WHERE key = ?", (key,))
+
+
+class ReplayGuard:
+    """Reject payments whose authorization is already being used by another request.
+
+    A payment's authorization nonce is claimed when a request carrying it is
+    accepted, and kept until the authorization's `validBefore` time, after which
+    the facilitator rejects it anyway. Replays of a claimed authorization are
+    rejected locally, without a facilitator call. Claims are released when the
+    request does not go through (invalid payment, failed response or settlement),
+    so the payment can be retried.
+
+    Usage:
+        guard = ReplayGuard()  # or ReplayGuard(SQLiteNonceStore("nonces.db"))
+        app.middleware("http")(require_payment(..., replay_guard=guard))
+
+    Args:
+        store: Store of claimed nonces, an in-process `MemoryNonceStore` by default
+    """
+
+    def __init__(self, store: Optional[NonceStore] = None):
+        self.store = store if store is not None else MemoryNonceStore()
+
+    def claim(
+        self, payment: PaymentPayload, payment_requirements: PaymentRequirements
+    ) -> bool:
+        """Claim the authorization of a payment.
+
+        Returns:
+            True if the payment may be used, False if it is a replay
+        """
+        try:
+            expires_at = float(payment.payload.authorization.valid_before)
+        except ValueError:
+            expires_at = time.time() + payment_requirements.max_timeout_seconds
+        return self.store.add(nonce_key(payment, payment_requirements), expires_at)
+
+    def release(
+        self, payment: PaymentPayload, payment_requirements: PaymentRequirements
+    ) -> None:
+        """Release the claim on the authorization of a payment that was not used."""
+        self.store.discard(nonce_key(payment, payment_requirements))
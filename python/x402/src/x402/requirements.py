@@ -0,0 +1,196 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, List, NamedTuple, Optional, cast, get_args
+
+from x402.common import process_price_to_atomic_amount, x402_VERSION
+from x402.types import (
+    HTTPInputSchema,
+    PaymentRequirements,
+    Price,
+    SupportedNetworks,
+    x402PaymentRequiredResponse,
+)
+
+
+class PaymentRequiredBody(NamedTuple):
+    """A serialized 402 response body with its precomputed headers."""
+
+    content: bytes
+    content_length: str
+    etag: str
+
+
+class PaymentRequirementsTemplate:
+    """Payment requirements of a protected route, built once and reused per request.
+
+    The price, asset and schemas are processed when the template is created. Each
+    HTTP method gets its own `PaymentRequirements` template the first time it is
+    seen, and requests only stamp their resource URL into a copy of it. Copies are
+    memoized per (method, resource), so repeated requests for the same resource get
+    the same objects back; treat them as read-only. The JSON bodies of 402 responses
+    are likewise serialized once per (method, resource, error).
+
+    Args:
+        price: Payment price, either a USD amount or a TokenAmount
+        pay_to_address: Ethereum address to receive the payment
+        network: Network the payment is made on
+        description: Description of what is being purchased
+        mime_type: MIME type of the resource
+        max_deadline_seconds: Maximum time allowed for payment
+        input_schema: Schema for the request structure
+        output_schema: Schema for the response
+        discoverable: Whether the route is discoverable
+        resource: Fixed resource URL used instead of the request URL
+        max_resources: Maximum number of memoized (method, resource) requirements, and
+            of memoized 402 response bodies
+
+    Raises:
+        ValueError: If the network is not supported or the price is invalid
+    """
+
+    def __init__(
+        self,
+        price: Price,
+        pay_to_address: str,
+        network: str = "base-sepolia",
+        description: str = "",
+        mime_type: str = "",
+        max_deadline_seconds: int = 60,
+        input_schema: Optional[HTTPInputSchema] = None,
+        output_schema: Optional[Any] = None,
+        discoverable: Optional[bool] = True,
+        resource: Optional[str] = None,
+        max_resources: int = 1024,
+    ):
+        # Validate network is supported
+        supported_networks = get_args(SupportedNetworks)
+        if network not in supported_networks:
+            raise ValueError(
+                f"Unsupported network: {network}. Must be one of: {supported_networks}"
+            )
+
+        try:
+            max_amount_required, asset_address, eip712_domain = (
+                process_price_to_atomic_amount(price, network)
+            )
+        except Exception as e:
+            raise ValueError(f"Invalid price: {price}. Error: {e}")
+
+        self.resource = resource
+        self.max_resources = max_resources
+        self._fields = dict(
+            scheme="exact",
+            network=cast(SupportedNetworks, network),
+            asset=asset_address,
+            max_amount_required=max_amount_required,
+            description=description,
+            mime_type=mime_type,
+            pay_to=pay_to_address,
+            max_timeout_seconds=max_deadline_seconds,
+            extra=eip712_domain,
+        )
+        self._input = {
+            "discoverable": discoverable if discoverable is not None else True,
+            **(input_schema.model_dump() if input_schema else {}),
+        }
+        self._output_schema = output_schema
+
+        self._methods: dict[str, PaymentRequirements] = {}
+        self._resources: OrderedDict[tuple[str, str], List[PaymentRequirements]] = (
+            OrderedDict()
+        )
+        self._bodies: OrderedDict[tuple[str, str, str], PaymentRequiredBody] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def _method_template(self, method: str) -> PaymentRequirements:
+        template = self._methods.get(method)
+        if template is None:
+            template = PaymentRequirements(
+                resource=self.resource or "",
+                # TODO: Rename output_schema to request_structure
+                output_schema={
+                    "input": {"type": "http", "method": method, **self._input},
+                    "output": self._output_schema,
+                },
+                **self._fields,
+            )
+            self._methods[method] = template
+        return template
+
+    def for_request(self, method: str, resource: str) -> List[PaymentRequirements]:
+        """Return the payment requirements accepted for a request.
+
+        The requirements are memoized and returned again for later requests for the
+        same method and resource, so they must not be modified. Each memoized entry
+        is a deep copy of the template, sharing no `extra` or `output_schema` dicts
+        with the entries of other resources or methods.
+
+        Args:
+            method: HTTP method of the request
+            resource: Request URL, ignored when the template has a fixed resource
+
+        Returns:
+            List of accepted payment requirements for the request
+        """
+        method = method.upper()
+        key = (method, self.resource or resource)
+
+        with self._lock:
+            requirements = self._resources.get(key)
+            if requirements is not None:
+                self._resources.move_to_end(key)
+                return requirements
+
+            template = self._method_template(method)
+            requirements = [template.model_copy(update={"resource": key[1]}, deep=True)]
+
+            self._resources[key] = requirements
+            while len(self._resources) > self.max_resources:
+                self._resources.popitem(last=False)
+            return requirements
+
+    def payment_required_body(
+        self, method: str, resource: str, error: str
+    ) -> PaymentRequiredBody:
+        """Return the JSON body of a 402 response for a request.
+
+        Args:
+            method: HTTP method of the request
+            resource: Request URL, ignored when the template has a fixed resource
+            error: Error message explaining why payment is required
+
+        Returns:
+            The serialized body with its Content-Length and ETag header values
+        """
+        method = method.upper()
+        key = (method, self.resource or resource, error)
+
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+                return body
+
+        content = (
+            x402PaymentRequiredResponse(
+                x402_version=x402_VERSION,
+                accepts=self.for_request(method, resource),
+                error=error,
+            )
+            .model_dump_json(by_alias=True)
+            .encode("utf-8")
+        )
+        body = PaymentRequiredBody(
+            content=content,
+            content_length=str(len(content)),
+            etag=f'"{hashlib.sha256(content).hexdigest()[:32]}"',
+        )
+
+        with self._lock:
+            self._bodies[key] = body
+            while len(self._bodies) > self.max_resources:
+                self._bodies.popitem(last=False)
+        return body
@@ -0,0 +1,173 @@
+from typing import Any, Hashable, Optional, Union
+
+from x402.facilitator import FacilitatorClient, FacilitatorConfig
+from x402.path import PathMatcher
+from x402.replay import ReplayGuard
+from x402.requirements import PaymentRequirementsTemplate
+from x402.session import PaymentSessions
+from x402.settlement import DeferredSettlement
+from x402.types import HTTPInputSchema, PaywallConfig, Price
+
+
+class PaymentRoute:
+    """A priced route: its payment requirements and how payments for it are handled.
+
+    Args:
+        requirements: Payment requirements template of the route
+        facilitator: Facilitator client verifying and settling payments for the route
+        paywall_config: Configuration for paywall UI customization
+        custom_paywall_html: Custom HTML to display for the paywall instead of the default
+        deferred_settlement: Journal payments for background settlement instead of
+            settling before the response is returned
+        speculative: Run the handler while the payment is being verified, for
+            idempotent read-only routes
+        replay_guard: Reject replays of payment authorizations in use locally
+        sessions: Issue prepaid session tokens for settled payments
+    """
+
+    def __init__(
+        self,
+        requirements: PaymentRequirementsTemplate,
+        facilitator: FacilitatorClient,
+        paywall_config: Optional[PaywallConfig] = None,
+        custom_paywall_html: Optional[str] = None,
+        deferred_settlement: Optional[DeferredSettlement] = None,
+        speculative: bool = False,
+        replay_guard: Optional[ReplayGuard] = None,
+        sessions: Optional[PaymentSessions] = None,
+    ):
+        self.requirements = requirements
+        self.facilitator = facilitator
+        self.paywall_config = paywall_config
+        self.custom_paywall_html = custom_paywall_html
+        self.deferred_settlement = deferred_settlement
+        self.speculative = speculative
+        self.replay_guard = replay_guard
+        self.sessions = sessions
+
+
+def _config_key(config: Optional[FacilitatorConfig]) -> Hashable:
+    """Hashable identity of a facilitator configuration."""
+    if config is None:
+        return None
+    return tuple(
+        sorted(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in config.items()
+        )
+    )
+
+
+class PaymentRouter:
+    """Table of priced routes shared by the FastAPI and Flask middlewares.
+
+    Routes are matched in one lookup per request instead of one middleware layer per
+    route: their path patterns are compiled into a single `PathMatcher`, and the
+    route resolved for each request path is memoized.
+
+    When several routes match a path, the one registered last wins, as it did when
+    each route was its own middleware layer wrapping the ones before it: add a
+    catch-all price first and the more specific paths after it. Pass
+    `last_wins=False` to have the first registered route win instead.
+
+    Routes registered with the same `facilitator_config` share one
+    `FacilitatorClient`, and with it its connection pool and caches.
+
+    Usage:
+        router = PaymentRouter()
+        router.add(path="/weather", price="$0.001", pay_to_address="0x...")
+        router.add(path="/premium/*", price=TokenAmount(...), pay_to_address="0x...")
+
+    Args:
+        max_cached_paths: Maximum number of memoized request path lookups
+        last_wins: Whether the route registered last wins when several routes match
+            (defaults to True)
+    """
+
+    def __init__(self, max_cached_paths: int = 4096, last_wins: bool = True):
+        self.routes: list[PaymentRoute] = []
+        self._facilitators: dict[Hashable, FacilitatorClient] = {}
+        self._matcher: PathMatcher[PaymentRoute] = PathMatcher(
+            max_cached_paths, last_wins=last_wins
+        )
+
+    def add(
+        self,
+        price: Price,
+        pay_to_address: str,
+        path: Union[str, list[str]] = "*",
+        description: str = "",
+        mime_type: str = "",
+        max_deadline_seconds: int = 60,
+        input_schema: Optional[HTTPInputSchema] = None,
+        output_schema: Optional[Any] = None,
+        discoverable: Optional[bool] = True,
+        facilitator_config: Optional[FacilitatorConfig] = None,
+        facilitator: Optional[FacilitatorClient] = None,
+        network: str = "base-sepolia",
+        resource: Optional[str] = None,
+        paywall_config: Optional[PaywallConfig] = None,
+        custom_paywall_html: Optional[str] = None,
+        deferred_settlement: Optional[DeferredSettlement] = None,
+        speculative: bool = False,
+        replay_guard: Optional[ReplayGuard] = None,
+        sessions: Optional[PaymentSessions] = None,
+    ) -> PaymentRoute:
+        """Register a priced route.
+
+        Takes the same arguments as `x402.fastapi.middleware.require_payment`.
+
+        Returns:
+            The registered route
+        """
+        route = PaymentRoute(
+            requirements=PaymentRequirementsTemplate(
+                price=price,
+                pay_to_address=pay_to_address,
+                network=network,
+                description=description,
+                mime_type=mime_type,
+                max_deadline_seconds=max_deadline_seconds,
+                input_schema=input_schema,
+                output_schema=output_schema,
+                discoverable=discoverable,
+                resource=resource,
+            ),
+            facilitator=facilitator or self._facilitator(facilitator_config),
+            paywall_config=paywall_config,
+            custom_paywall_html=custom_paywall_html,
+            deferred_settlement=deferred_settlement,
+            speculative=speculative,
+            replay_guard=replay_guard,
+            sessions=sessions,
+        )
+        self.add_route(path, route)
+        return route
+
+    def _facilitator(self, config: Optional[FacilitatorConfig]) -> FacilitatorClient:
+        key = _config_key(config)
+        facilitator = self._facilitators.get(key)
+        if facilitator is None:
+            facilitator = self._facilitators[key] = FacilitatorClient(config)
+        return facilitator
+
+    def add_route(self, path: Union[str, list[str]], route: PaymentRoute) -> None:
+        """Register an already built route for the given path pattern(s).
+
+        Args:
+            path: Path pattern(s) as accepted by `x402.path.path_is_match`
+            route: The route to serve for matching request paths
+        """
+        self._matcher.add(path, route)
+        self.routes.append(route)
+
+    def match(self, request_path: str) -> Optional[PaymentRoute]:
+        """Find the route serving a request path.
+
+        Args:
+            request_path: The path of the incoming request
+
+        Returns:
+            The winning matching route, or None if the path is not priced
+        """
+        return self._matcher.match(request_path)
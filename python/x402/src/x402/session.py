@@ -0,0 +1,189 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Union
+
+from pydantic import BaseModel
+
+from x402.types import PaymentRequirements
+
+SESSION_HEADER = "X-PAYMENT-SESSION"
+
+
+class SessionClaims(BaseModel):
+    """Payload of a session token."""
+
+    sid: str
+    scope: str
+    expires_at: float
+    calls: Optional[int] = None
+
+
+def session_scope(payment_requirements: PaymentRequirements) -> str:
+    """Identify what a session pays for: the same price, asset and recipient.
+
+    Args:
+        payment_requirements: The payment requirements the session was bought with
+
+    Returns:
+        Short hex digest shared by all routes with the same payment terms
+    """
+    terms = ":".join(
+        (
+            payment_requirements.scheme,
+            payment_requirements.network,
+            payment_requirements.asset,
+            payment_requirements.pay_to,
+            payment_requirements.max_amount_required,
+        )
+    ).lower()
+    return hashlib.sha256(terms.encode("utf-8")).hexdigest()[:32]
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class PaymentSessions:
+    """Prepaid payment sessions, redeemed without calling the facilitator.
+
+    Each settled payment for a route with sessions enabled buys a session of
+    `calls` requests (including the paid one) within `ttl` seconds. The paid
+    response carries a bearer token in the `X-PAYMENT-SESSION` header; requests
+    presenting it in the same header are served without a payment as long as the
+    session has calls left. Tokens are signed with HMAC-SHA256 and checked
+    locally, and only redeem on routes with the same price, asset and recipient.
+
+    Remaining calls are counted in memory by the process that issued the token,
+    so other processes reject it and the client falls back to paying. Route
+    session clients to the same worker (sticky sessions) when running several.
+
+    Usage:
+        sessions = PaymentSessions(secret=os.environ["X402_SESSION_SECRET"], calls=100)
+        app.middleware("http")(require_payment(..., sessions=sessions))
+
+    Args:
+        secret: Key the tokens are signed with
+        calls: Requests a session covers, None for unlimited requests until it expires
+        ttl: Seconds a session is valid for
+        max_sessions: Maximum number of sessions whose remaining calls are tracked
+    """
+
+    def __init__(
+        self,
+        secret: Union[str, bytes],
+        calls: Optional[int] = 100,
+        ttl: float = 300.0,
+        max_sessions: int = 100_000,
+    ):
+        if not secret:
+            raise ValueError("A session secret is required")
+        if calls is not None and calls < 1:
+            raise ValueError("calls must be at least 1")
+
+        self.secret = secret.encode("utf-8") if isinstance(secret, str) else secret
+        self.calls = calls
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # Remaining calls per session id, in order of expiry
+        self._credits: OrderedDict[str, tuple[float, Optional[int]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._credits)
+
+    def issue(self, payment_requirements: PaymentRequirements) -> str:
+        """Open a session for a settled payment, which used its first call.
+
+        Args:
+            payment_requirements: The payment requirements the payment was settled for
+
+        Returns:
+            The session token
+        """
+        now = time.time()
+        claims = SessionClaims(
+            sid=secrets.token_hex(16),
+            scope=session_scope(payment_requirements),
+            expires_at=now + self.ttl,
+            calls=self.calls,
+        )
+        remaining = self.calls - 1 if self.calls is not None else None
+
+        with self._lock:
+            self._expire(now)
+            while len(self._credits) >= self.max_sessions:
+                self._credits.popitem(last=False)
+            self._credits[claims.sid] = (claims.expires_at, remaining)
+
+        payload = _b64encode(claims.model_dump_json(exclude_none=True).encode("utf-8"))
+        return f"{payload}.{self._sign(payload)}"
+
+    def redeem(
+        self, token: str, payment_requirements: PaymentRequirements
+    ) -> Optional[SessionClaims]:
+        """Use one call of a session.
+
+        Args:
+            token: The session token presented by the client
+            payment_requirements: Payment requirements of the requested route
+
+        Returns:
+            The claims of the session, or None if the token is invalid, expired,
+            for other payment terms or out of calls
+        """
+        claims = self.decode(token)
+        if claims is None or claims.scope != session_scope(payment_requirements):
+            return None
+
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            credit = self._credits.get(claims.sid)
+            if credit is None:
+                return None
+
+            expires_at, remaining = credit
+            if remaining is not None:
+                if remaining <= 0:
+                    return None
+                self._credits[claims.sid] = (expires_at, remaining - 1)
+        return claims
+
+    def decode(self, token: str) -> Optional[SessionClaims]:
+        """Check the signature and expiry of a token and return its claims."""
+        payload, _, signature = token.partition(".")
+        if not hmac.compare_digest(
+            signature.encode("utf-8"), self._sign(payload).encode("ascii")
+        ):
+            return None
+
+        try:
+            claims = SessionClaims(**json.loads(_b64decode(payload)))
+        except (ValueError, binascii.Error):
+            return None
+
+        if claims.expires_at <= time.time():
+            return None
+        return claims
+
+    def _sign(self, payload: str) -> str:
+        digest = hmac.new(self.secret, payload.encode("utf-8"), hashlib.sha256)
+        return _b64encode(digest.digest())
+
+    def _expire(self, now: float) -> None:
+        while self._credits:
+            sid, (expires_at, _) = next(iter(self._credits.items()))
+            if expires_at > now:
+                break
+            del self._credits[sid]
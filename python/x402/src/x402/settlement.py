@@ -0,0 +1,457 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Optional, Union
+
+from pydantic import BaseModel
+
+from x402.replay import nonce_key
+from x402.facilitator import FacilitatorClient
+from x402.types import PaymentPayload, PaymentRequirements, SettleResponse
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SETTLING = "settling"
+SETTLED = "settled"
+FAILED = "failed"
+# Rejected as already used after an earlier attempt whose outcome is unknown, so
+# it may well have settled; these need reconciling against the chain
+UNCONFIRMED = "unconfirmed"
+
+# Facilitator error reasons for an authorization that has already been used
+_ALREADY_USED_REASONS = frozenset({"invalid_transaction_state", "payment_already_used"})
+
+
+class SettlementRecord(BaseModel):
+    """A payment waiting in the settlement journal."""
+
+    key: str
+    payment: PaymentPayload
+    payment_requirements: PaymentRequirements
+    attempts: int
+    # Whether an earlier attempt may have reached the chain without us learning of it
+    maybe_submitted: bool = False
+
+
+class SettlementJournal:
+    """Durable SQLite journal of payments that still have to be settled.
+
+    Each authorization is stored once, keyed by its network, asset, payer and
+    nonce (see `nonce_key`), so sending it to another resource URL does not journal
+    it again. A payment moves from pending to settling to settled (or failed, or
+    unconfirmed when it may have settled without a confirmation).
+
+    A journal file can be shared by several processes. Claiming a payment takes a
+    lease on it for `lease_seconds`, and only payments whose lease has expired
+    (because the process settling them died) are claimed again, so the lease must
+    be longer than a settlement request can take.
+
+    Args:
+        path: Path of the SQLite database file, or ":memory:" for a non-durable journal
+        lease_seconds: Seconds a claimed payment stays reserved for its claimant
+    """
+
+    def __init__(self, path: str = "x402-settlements.db", lease_seconds: float = 300.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS settlements (
+                key TEXT PRIMARY KEY,
+                payment TEXT NOT NULL,
+                payment_requirements TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                settle_response TEXT,
+                owner TEXT,
+                lease_expires_at REAL,
+                maybe_submitted INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        # Journals created by older versions lack the newer columns
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(settlements)")}
+        for column, type_ in (
+            ("owner", "TEXT"),
+            ("lease_expires_at", "REAL"),
+            ("maybe_submitted", "INTEGER NOT NULL DEFAULT 0"),
+        ):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE settlements ADD COLUMN {column} {type_}")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS settlements_due"
+            " ON settlements (status, next_attempt_at)"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def add(
+        self, payment: PaymentPayload, payment_requirements: PaymentRequirements
+    ) -> bool:
+        """Journal a payment for settlement.
+
+        Returns:
+            True if the payment was added, False if it was already journaled
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO settlements (key, payment, payment_requirements,"
+                " status, next_attempt_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    nonce_key(payment, payment_requirements),
+                    payment.model_dump_json(by_alias=True),
+                    payment_requirements.model_dump_json(by_alias=True),
+                    PENDING,
+                    now,
+                    now,
+                    now,
+                ),
+            )
+            return cursor.rowcount == 1
+
+    def contains(
+        self, payment: PaymentPayload, payment_requirements: PaymentRequirements
+    ) -> bool:
+        """Whether a payment has already been journaled, in any state."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM settlements WHERE key = ?",
+                (nonce_key(payment, payment_requirements),),
+            ).fetchone()
+            return row is not None
+
+    def status(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status FROM settlements WHERE key = ?", (key,)
+            ).fetchone()
+            return row[0] if row else None
+
+    def claim(self, now: Optional[float] = None) -> Optional[SettlementRecord]:
+        """Lease the oldest due payment and mark it as settling.
+
+        Due payments are pending ones whose retry time has come, and settling ones
+        whose lease has expired. The latter may have been submitted by their
+        previous claimant.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT key, payment, payment_requirements, attempts, status,"
+                    " maybe_submitted FROM settlements"
+                    " WHERE (status = ? AND next_attempt_at <= ?)"
+                    " OR (status = ? AND COALESCE(lease_expires_at, 0) <= ?)"
+                    " ORDER BY next_attempt_at LIMIT 1",
+                    (PENDING, now, SETTLING, now),
+                ).fetchone()
+                if row is not None:
+                    key, payment, payment_requirements, attempts, status, submitted = (
+                        row
+                    )
+                    maybe_submitted = bool(submitted) or status == SETTLING
+                    self._db.execute(
+                        "UPDATE settlements SET status = ?, owner = ?,"
+                        " lease_expires_at = ?, maybe_submitted = ?, updated_at = ?"
+                        " WHERE key = ?",
+                        (
+                            SETTLING,
+                            self.owner,
+                            now + self.lease_seconds,
+                            maybe_submitted,
+                            now,
+                            key,
+                        ),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+        return SettlementRecord(
+            key=key,
+            payment=PaymentPayload.model_validate_json(payment),
+            payment_requirements=PaymentRequirements.model_validate_json(
+                payment_requirements
+            ),
+            attempts=attempts,
+            maybe_submitted=maybe_submitted,
+        )
+
+    def mark_settled(self, key: str, settle_response: SettleResponse) -> None:
+        self._update(
+            key,
+            status=SETTLED,
+            settle_response=settle_response.model_dump_json(by_alias=True),
+        )
+
+    def mark_retry(
+        self,
+        key: str,
+        error: str,
+        next_attempt_at: float,
+        maybe_submitted: bool = False,
+    ) -> None:
+        """Return a payment to pending for another attempt.
+
+        Args:
+            maybe_submitted: Whether the failed attempt may have reached the chain,
+                as when the facilitator request failed without a response
+        """
+        fields: dict[str, Any] = {}
+        if maybe_submitted:
+            fields["maybe_submitted"] = True
+        self._update(
+            key,
+            status=PENDING,
+            last_error=error,
+            next_attempt_at=next_attempt_at,
+            increment_attempts=True,
+            **fields,
+        )
+
+    def mark_failed(self, key: str, error: str) -> None:
+        self._update(key, status=FAILED, last_error=error, increment_attempts=True)
+
+    def mark_unconfirmed(self, key: str, error: str) -> None:
+        self._update(key, status=UNCONFIRMED, last_error=error, increment_attempts=True)
+
+    def recover(self, now: Optional[float] = None) -> int:
+        """Return settlements whose lease has expired to the pending state.
+
+        Settlements leased by a live process are left alone. Recovered ones are
+        flagged as possibly submitted by the process that leased them.
+
+        Returns:
+            Number of recovered settlements
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE settlements SET status = ?, owner = NULL,"
+                " lease_expires_at = NULL, maybe_submitted = 1, updated_at = ?"
+                " WHERE status = ? AND COALESCE(lease_expires_at, 0) <= ?",
+                (PENDING, now, SETTLING, now),
+            )
+            return cursor.rowcount
+
+    def pending_count(self) -> int:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(*) FROM settlements WHERE status IN (?, ?)",
+                (PENDING, SETTLING),
+            ).fetchone()
+            return row[0]
+
+    def _update(
+        self, key: str, increment_attempts: bool = False, **fields: Any
+    ) -> None:
+        # Only the holder of the lease may record the outcome; once it has expired
+        # the payment may have been claimed by another process
+        assignments = ["updated_at = ?", "lease_expires_at = NULL"] + [
+            f"{name} = ?" for name in fields
+        ]
+        if increment_attempts:
+            assignments.append("attempts = attempts + 1")
+
+        with self._lock:
+            self._db.execute(
+                f"UPDATE settlements SET {', '.join(assignments)}"
+                " WHERE key = ? AND owner = ?",
+                (time.time(), *fields.values(), key, self.owner),
+            )
+
+
+class DeferredSettlement:
+    """Settle payments in the background from a durable journal.
+
+    Payments are written to the journal by `enqueue()` and drained by a pool of
+    worker tasks that call the facilitator, retrying failures with exponential
+    backoff. Workers start on first use (or with `start()`), and settlements
+    abandoned by a crashed process are picked up again once their lease expires
+    (see `SettlementJournal`).
+
+    Usage:
+        settlement = DeferredSettlement(facilitator, "settlements.db")
+        app.middleware("http")(require_payment(..., deferred_settlement=settlement))
+
+    Args:
+        facilitator: Facilitator client used to settle payments
+        journal: Journal instance, or a path to create one at
+        workers: Number of concurrent settlement workers
+        max_attempts: Settlement attempts before a payment is marked as failed
+        retry_backoff: Delay in seconds before the first retry, doubled on each attempt
+        max_backoff: Maximum delay in seconds between retries
+        poll_interval: Seconds an idle worker waits before checking for due retries
+    """
+
+    def __init__(
+        self,
+        facilitator: FacilitatorClient,
+        journal: Union[SettlementJournal, str] = "x402-settlements.db",
+        workers: int = 4,
+        max_attempts: int = 5,
+        retry_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        poll_interval: float = 1.0,
+    ):
+        self.facilitator = facilitator
+        self.journal = (
+            journal
+            if isinstance(journal, SettlementJournal)
+            else SettlementJournal(journal)
+        )
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._start_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Recover expired settlements and start the worker pool."""
+        if self._tasks:
+            return
+
+        # Every enqueue() starts the pool, so a burst of first requests must not
+        # start one pool each
+        async with self._start_lock:
+            if self._tasks:
+                return
+
+            self._wakeup = asyncio.Event()
+            recovered = await asyncio.to_thread(self.journal.recover)
+            if recovered:
+                logger.info(f"Recovered {recovered} pending settlements")
+
+            self._tasks = [
+                asyncio.create_task(self._worker()) for _ in range(self.workers)
+            ]
+
+    async def aclose(self) -> None:
+        """Stop the worker pool. Unsettled payments stay in the journal."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def __aenter__(self) -> "DeferredSettlement":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def contains(
+        self, payment: PaymentPayload, payment_requirements: PaymentRequirements
+    ) -> bool:
+        """Whether a payment has already been accepted for settlement."""
+        return await asyncio.to_thread(
+            self.journal.contains, payment, payment_requirements
+        )
+
+    async def enqueue(
+        self, payment: PaymentPayload, payment_requirements: PaymentRequirements
+    ) -> bool:
+        """Durably record a payment for background settlement.
+
+        Returns:
+            True if the payment was journaled, False if it already was
+        """
+        await self.start()
+        added = await asyncio.to_thread(self.journal.add, payment, payment_requirements)
+        if added:
+            self._wakeup.set()
+        return added
+
+    async def _worker(self) -> None:
+        while True:
+            # A journal error (e.g. a locked or full database) must not take the
+            # worker down with it; a payment it was settling is retried once its
+            # lease expires
+            try:
+                record = await asyncio.to_thread(self.journal.claim)
+                if record is not None:
+                    await self._settle(record)
+                    continue
+            except Exception:
+                logger.exception("Settlement worker error")
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _settle(self, record: SettlementRecord) -> None:
+        try:
+            settle_response = await self.facilitator.settle(
+                record.payment, record.payment_requirements
+            )
+            error = None if settle_response.success else settle_response.error_reason
+        except Exception as e:
+            settle_response = None
+            error = str(e) or type(e).__name__
+
+        if settle_response is not None and settle_response.success:
+            await asyncio.to_thread(
+                self.journal.mark_settled, record.key, settle_response
+            )
+            return
+
+        # After an attempt that may have gone through, "already used" most likely
+        # means that attempt settled the payment, not that it failed
+        if (
+            settle_response is not None
+            and record.maybe_submitted
+            and settle_response.error_reason in _ALREADY_USED_REASONS
+        ):
+            logger.warning(
+                f"Settlement {record.key} was rejected as already used after an"
+                f" attempt with an unknown outcome; it needs reconciling: {error}"
+            )
+            await asyncio.to_thread(self.journal.mark_unconfirmed, record.key, error)
+            return
+
+        error = error or "Unknown error"
+        attempts = record.attempts + 1
+        if attempts >= self.max_attempts:
+            logger.error(
+                f"Settlement {record.key} failed after {attempts} attempts: {error}"
+            )
+            await asyncio.to_thread(self.journal.mark_failed, record.key, error)
+            return
+
+        delay = min(self.retry_backoff * 2 ** (attempts - 1), self.max_backoff)
+        logger.warning(f"Settlement {record.key} failed, retrying in {delay}s: {error}")
+        await asyncio.to_thread(
+            self.journal.mark_retry,
+            record.key,
+            error,
+            time.time() + delay,
+            settle_response is None,
+        )
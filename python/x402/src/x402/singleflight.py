@@ -0,0 +1,50 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into a single execution.
+
+    The first caller for a key starts the work in its own task; callers that arrive
+    while it is running await the same task instead of starting another one. The key
+    is released as soon as the work finishes, so later calls run again.
+
+    Cancelling one waiter does not cancel the shared work for the others.
+    """
+
+    def __init__(self):
+        self._calls: dict[tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run `fn` for `key`, or wait for the call already in flight for it.
+
+        Args:
+            key: Identifier of the work, e.g. an operation name and payment digest
+            fn: Zero-argument coroutine function performing the work
+
+        Returns:
+            The result of the single shared call
+        """
+        # Tasks cannot be awaited from another event loop, so keys are per loop
+        flight_key = (asyncio.get_running_loop(), key)
+
+        task = self._calls.get(flight_key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[flight_key] = task
+            task.add_done_callback(lambda t: self._finish(flight_key, t))
+
+        return await asyncio.shield(task)
+
+    def _finish(self, flight_key: tuple[Any, Hashable], task: asyncio.Task) -> None:
+        if self._calls.get(flight_key) is task:
+            del self._calls[flight_key]
+
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
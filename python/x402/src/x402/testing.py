@@ -0,0 +1,141 @@
+import hashlib
+import json
+import threading
+from typing import Any, Optional, get_args
+
+import httpx
+
+from x402.exact import verify_payment_locally
+from x402.facilitator import FacilitatorClient, FacilitatorConfig
+from x402.networks import SupportedNetworks
+from x402.types import (
+    PaymentPayload,
+    PaymentRequirements,
+    SettleResponse,
+    VerifyResponse,
+)
+
+
+class LocalFacilitator:
+    """In-process stand-in for a facilitator, for tests and offline development.
+
+    Payments are verified with the local exact scheme checks (including the
+    signature) and settled by recording their authorization nonce, so each
+    authorization settles once. Besides `/verify` and `/settle` it accepts the
+    batched `/verify/batch` and `/settle/batch` forms used by `verify_many` and
+    `settle_many`, and answers `/supported` health checks.
+
+    Usage:
+        local = LocalFacilitator()
+        facilitator = local.client({"batch_endpoints": True})
+
+    Args:
+        url: Base URL the stand-in is addressed by
+    """
+
+    def __init__(self, url: str = "http://facilitator.local"):
+        self.url = url
+        self.requests: list[str] = []
+        self.settled: dict[str, SettleResponse] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def transport(self) -> httpx.MockTransport:
+        """An httpx transport serving the facilitator API."""
+        return httpx.MockTransport(self.handle)
+
+    def client(self, config: Optional[FacilitatorConfig] = None) -> FacilitatorClient:
+        """Create a FacilitatorClient that talks to this stand-in."""
+        return FacilitatorClient(
+            {"url": self.url, **(config or {})},
+            http_client=httpx.AsyncClient(transport=self.transport),
+        )
+
+    def verify(
+        self, payment: PaymentPayload, payment_requirements: PaymentRequirements
+    ) -> VerifyResponse:
+        payer = payment.payload.authorization.from_
+        invalid_reason = verify_payment_locally(payment, payment_requirements)
+        if invalid_reason is None and self._nonce_key(payment) in self.settled:
+            invalid_reason = "invalid_transaction_state"
+
+        return VerifyResponse(
+            is_valid=invalid_reason is None, invalid_reason=invalid_reason, payer=payer
+        )
+
+    def settle(
+        self, payment: PaymentPayload, payment_requirements: PaymentRequirements
+    ) -> SettleResponse:
+        with self._lock:
+            verify_response = self.verify(payment, payment_requirements)
+            if not verify_response.is_valid:
+                return SettleResponse(
+                    success=False,
+                    error_reason=verify_response.invalid_reason,
+                    network=payment.network,
+                    payer=verify_response.payer,
+                )
+
+            nonce_key = self._nonce_key(payment)
+            settle_response = SettleResponse(
+                success=True,
+                transaction="0x" + hashlib.sha256(nonce_key.encode()).hexdigest(),
+                network=payment.network,
+                payer=verify_response.payer,
+            )
+            self.settled[nonce_key] = settle_response
+            return settle_response
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        """Serve one facilitator API request."""
+        path = request.url.path.removeprefix(httpx.URL(self.url).path.rstrip("/"))
+        self.requests.append(path)
+
+        handlers = {"/verify": self.verify, "/settle": self.settle}
+        if request.method == "POST" and path in handlers:
+            return httpx.Response(
+                200, json=self._call(handlers[path], json.loads(request.content))
+            )
+
+        if request.method == "POST" and path.removesuffix("/batch") in handlers:
+            handler = handlers[path.removesuffix("/batch")]
+            items = json.loads(request.content)["items"]
+            return httpx.Response(
+                200, json={"results": [self._call(handler, item) for item in items]}
+            )
+
+        if request.method == "GET" and path == "/supported":
+            return httpx.Response(
+                200,
+                json={
+                    "kinds": [
+                        {"x402Version": 1, "scheme": "exact", "network": network}
+                        for network in get_args(SupportedNetworks)
+                    ]
+                },
+            )
+
+        if request.method == "GET" and path == "/discovery/resources":
+            return httpx.Response(
+                200,
+                json={
+                    "x402Version": 1,
+                    "items": [],
+                    "pagination": {"limit": 0, "offset": 0, "total": 0},
+                },
+            )
+
+        return httpx.Response(404, json={"error": f"Not found: {path}"})
+
+    @staticmethod
+    def _call(handler, body: dict[str, Any]) -> dict[str, Any]:
+        response = handler(
+            PaymentPayload(**body["paymentPayload"]),
+            PaymentRequirements(**body["paymentRequirements"]),
+        )
+        return response.model_dump(by_alias=True)
+
+    @staticmethod
+    def _nonce_key(payment: PaymentPayload) -> str:
+        authorization = payment.payload.authorization
+        return f"{payment.network}:{authorization.from_.lower()}:{authorization.nonce.lower()}"
@@ -1,8 +1,10 @@
 import pytest
 import json
 import base64
+import time
 from eth_account import Account
 from x402.clients.base import (
+    PaymentRequirementsCache,
     x402Client,
     PaymentAmountExceededError,
     UnsupportedSchemeException,
@@ -192,3 +194,45 @@ def test_payment_requirements_sorting(client):
     # Test both networks are equal
     selected = client.select_payment_requirements([other_req, base_req])
     assert selected.network == "base-sepolia"
+
+
+def test_requirements_cache(monkeypatch, payment_requirements):
+    now = 1_000_000.0
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache = PaymentRequirementsCache(ttl=60, max_entries=2)
+
+    cache.set("get", "https://example.com/a?x=1", [payment_requirements], 1)
+    # Entries are per method and URL without the query string
+    assert cache.get("GET", "https://example.com/a?x=2") == ([payment_requirements], 1)
+    assert cache.get("POST", "https://example.com/a") is None
+
+    cache.set("GET", "https://example.com/b", [payment_requirements], 1)
+    cache.set("GET", "https://example.com/c", [payment_requirements], 1)
+    assert len(cache) == 2
+    assert cache.get("GET", "https://example.com/a") is None
+
+    cache.invalidate("GET", "https://example.com/b")
+    assert cache.get("GET", "https://example.com/b") is None
+
+    now += 61
+    assert cache.get("GET", "https://example.com/c") is None
+
+
+def test_preemptive_payment_header(account, payment_requirements):
+    url = "https://example.com/a"
+    assert x402Client(account).preemptive_payment_header("GET", url) is None
+
+    client = x402Client(account, requirements_cache=PaymentRequirementsCache())
+    assert client.preemptive_payment_header("GET", url) is None
+
+    client.remember_payment_requirements("GET", url, [payment_requirements], 1)
+    header = client.preemptive_payment_header("GET", url)
+    assert decode_payment(header)["payload"]["authorization"]["value"] == "10000"
+
+    # Requirements the client would not pay are not paid preemptively
+    client.max_value = 100
+    assert client.preemptive_payment_header("GET", url) is None
+
+    client.forget_payment_requirements("GET", url)
+    client.max_value = None
+    assert client.preemptive_payment_header("GET", url) is None
@@ -1,13 +1,23 @@
+import asyncio
 import pytest
 import json
 import base64
 from unittest.mock import AsyncMock, MagicMock, patch
-from httpx import Request, Response
+from httpx import AsyncClient, MockTransport, Request, Response
 from eth_account import Account
-from x402.clients.httpx import HttpxHooks, x402_payment_hooks, x402HttpxClient
+from x402.clients.httpx import (
+    HttpxHooks,
+    x402_payment_hooks,
+    x402HttpxClient,
+    x402HttpxTransport,
+)
 from x402.clients.base import (
     PaymentError,
+    x402Client,
+    PaymentRequirementsCache,
 )
+from x402.encoding import decode_payment_header
+from x402.exact import verify_payment_locally
 from x402.types import PaymentRequirements, x402PaymentRequiredResponse
 
 
@@ -210,20 +220,20 @@ def test_x402_payment_hooks(account):
 def test_x402_httpx_client(account):
     # Test client initialization
     client = x402HttpxClient(account=account)
-    assert "request" in client.event_hooks
-    assert "response" in client.event_hooks
+    assert not client.event_hooks["request"]
+    assert not client.event_hooks["response"]
 
-    # Get the hooks instance
-    hooks_instance = client.event_hooks["response"][0].__self__
+    # Get the payment transport
+    transport = client._transport
+    assert isinstance(transport, x402HttpxTransport)
 
     # Test client configuration
-    assert hooks_instance.client.account == account
-    assert hooks_instance.client.max_value is None
+    assert transport.client.account == account
+    assert transport.client.max_value is None
 
     # Test with max_value
     client = x402HttpxClient(account=account, max_value=1000)
-    hooks_instance = client.event_hooks["response"][0].__self__
-    assert hooks_instance.client.max_value == 1000
+    assert client._transport.client.max_value == 1000
 
     # Test with custom selector
     def custom_selector(accepts, network_filter=None, scheme_filter=None):
@@ -232,8 +242,186 @@ def test_x402_httpx_client(account):
     client = x402HttpxClient(
         account=account, payment_requirements_selector=custom_selector
     )
-    hooks_instance = client.event_hooks["response"][0].__self__
     assert (
-        hooks_instance.client.select_payment_requirements
-        != hooks_instance.client.__class__.select_payment_requirements
+        client._transport.client.select_payment_requirements
+        != client._transport.client.__class__.select_payment_requirements
+    )
+
+
+def test_x402_httpx_client_mounts(account):
+    client = x402HttpxClient(
+        account=account,
+        mounts={"https://paid.example.com": MockTransport(lambda r: Response(200))},
+    )
+    (mounted,) = [t for t in client._mounts.values() if t is not None]
+    assert isinstance(mounted, x402HttpxTransport)
+    assert mounted.client is client._transport.client
+
+
+async def test_preemptive_payment(account, payment_requirements):
+    cache = PaymentRequirementsCache()
+    hooks = x402_payment_hooks(account, requirements_cache=cache)
+    on_request, on_response = hooks["request"][0], hooks["response"][0]
+    url = "https://example.com/data"
+
+    # Unknown endpoints are not paid up front
+    request = Request("GET", url)
+    await on_request(request)
+    assert "X-Payment" not in request.headers
+
+    cache.set("GET", url, [payment_requirements], 1)
+    request = Request("GET", f"{url}?page=2")
+    await on_request(request)
+    payment = decode_payment_header(request.headers["X-Payment"])
+    assert verify_payment_locally(payment, payment_requirements) is None
+
+    # A 402 to a preemptive payment replaces the cached requirements
+    new_requirements = payment_requirements.model_copy(
+        update={"max_amount_required": "20000"}
     )
+    response = Response(402, request=request)
+    response._content = json.dumps(
+        x402PaymentRequiredResponse(
+            x402_version=1, accepts=[new_requirements], error="Payment Required"
+        ).model_dump(by_alias=True)
+    ).encode()
+
+    mock_client = AsyncMock()
+    mock_client.send.return_value = Response(200)
+    mock_client.__aenter__.return_value = mock_client
+    with patch("x402.clients.httpx.AsyncClient", return_value=mock_client):
+        result = await on_response(response)
+
+    assert result.status_code == 200
+    retry_payment = decode_payment_header(
+        mock_client.send.call_args[0][0].headers["X-Payment"]
+    )
+    assert verify_payment_locally(retry_payment, new_requirements) is None
+    assert cache.get("GET", url) == ([new_requirements], 1)
+
+
+class PaidServer:
+    """Mock server answering 402 to requests without a valid payment."""
+
+    def __init__(self, payment_requirements):
+        self.payment_requirements = payment_requirements
+        self.requests = []
+        self.nonces = set()
+
+    def __call__(self, request):
+        self.requests.append(request)
+        header = request.headers.get("X-Payment")
+        if header is not None:
+            payment = decode_payment_header(header)
+            if verify_payment_locally(payment, self.payment_requirements) is None:
+                self.nonces.add(payment.payload.authorization.nonce)
+                return Response(200, json={"body": request.content.decode()})
+
+        return Response(
+            402,
+            json=x402PaymentRequiredResponse(
+                x402_version=1,
+                accepts=[self.payment_requirements],
+                error="Payment Required",
+            ).model_dump(by_alias=True),
+        )
+
+
+async def test_transport_pays_402(account, payment_requirements):
+    server = PaidServer(payment_requirements)
+    async with x402HttpxClient(
+        account,
+        base_url="https://example.com",
+        headers={"X-Api-Key": "key"},
+        timeout=5.0,
+        transport=MockTransport(server),
+    ) as client:
+        response = await client.post("/data", content=b"payload")
+
+    assert response.status_code == 200
+    assert response.json() == {"body": "payload"}
+
+    # The retry went through the same transport with the client's configuration
+    assert len(server.requests) == 2
+    assert len(server.nonces) == 1
+    retry = server.requests[1]
+    assert retry.url == "https://example.com/data"
+    assert retry.headers["X-Api-Key"] == "key"
+    assert retry.extensions["timeout"]["read"] == 5.0
+    assert retry.headers["Access-Control-Expose-Headers"] == "X-Payment-Response"
+
+
+async def test_transport_concurrent_requests(account, payment_requirements):
+    server = PaidServer(payment_requirements)
+    async with x402HttpxClient(account, transport=MockTransport(server)) as client:
+        responses = await asyncio.gather(
+            *(client.get(f"https://example.com/{i}") for i in range(100))
+        )
+
+    assert all(response.status_code == 200 for response in responses)
+    assert len(server.requests) == 200
+    assert len(server.nonces) == 100
+
+
+async def test_transport_retries_once(account, payment_requirements):
+    requests = []
+
+    def reject_payments(request):
+        requests.append(request)
+        return Response(
+            402,
+            json=x402PaymentRequiredResponse(
+                x402_version=1, accepts=[payment_requirements], error="Invalid payment"
+            ).model_dump(by_alias=True),
+        )
+
+    transport = x402HttpxTransport(x402Client(account), MockTransport(reject_payments))
+    async with AsyncClient(transport=transport) as client:
+        response = await client.get("https://example.com")
+
+    assert response.status_code == 402
+    assert response.json()["error"] == "Invalid payment"
+    assert len(requests) == 2
+    assert "X-Payment" in requests[1].headers
+
+
+async def test_transport_payment_error(account, payment_requirements):
+    transport = x402HttpxTransport(
+        x402Client(account, max_value=1),
+        MockTransport(PaidServer(payment_requirements)),
+    )
+    async with AsyncClient(transport=transport) as client:
+        with pytest.raises(PaymentError):
+            await client.get("https://example.com")
+
+    transport = x402HttpxTransport(
+        x402Client(account), MockTransport(lambda request: Response(402, text="no"))
+    )
+    async with AsyncClient(transport=transport) as client:
+        with pytest.raises(PaymentError, match="Failed to handle payment"):
+            await client.get("https://example.com")
+
+
+async def test_transport_preemptive_payment(account, payment_requirements):
+    server = PaidServer(payment_requirements)
+    cache = PaymentRequirementsCache()
+    async with x402HttpxClient(
+        account, requirements_cache=cache, transport=MockTransport(server)
+    ) as client:
+        assert (await client.get("https://example.com/data")).status_code == 200
+        assert len(server.requests) == 2
+
+        # Known endpoints are paid on the first attempt
+        assert (await client.get("https://example.com/data")).status_code == 200
+        assert len(server.requests) == 3
+
+        # Stale requirements are replaced after a 402
+        server.payment_requirements = payment_requirements.model_copy(
+            update={"max_amount_required": "20000"}
+        )
+        assert (await client.get("https://example.com/data")).status_code == 200
+        assert len(server.requests) == 5
+        assert cache.get("GET", "https://example.com/data") == (
+            [server.payment_requirements],
+            1,
+        )
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+from eth_account import Account
+
+from x402.clients.base import x402Client
+from x402.clients.pool import PaymentHeaderPool
+from x402.exact import verify_payment_locally
+from x402.encoding import decode_payment_header
+from x402.types import PaymentRequirements
+
+
+@pytest.fixture
+def account():
+    return Account.create()
+
+
+@pytest.fixture
+def payment_requirements():
+    return PaymentRequirements(
+        scheme="exact",
+        network="base-sepolia",
+        asset="0x036CbD53842c5426634e7929541eC2318f3dCF7e",
+        pay_to="0x0000000000000000000000000000000000000000",
+        max_amount_required="10000",
+        resource="https://example.com",
+        description="test",
+        max_timeout_seconds=1000,
+        mime_type="text/plain",
+        extra={"name": "USD Coin", "version": "2"},
+    )
+
+
+@pytest.fixture
+def pool():
+    with PaymentHeaderPool(depth=2, idle_timeout=3600, refill_interval=0.05) as pool:
+        yield pool
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_presigned_headers_are_used(account, pool, payment_requirements):
+    client = x402Client(account, header_pool=pool)
+    client.presign(payment_requirements)
+    wait_for(lambda: len(pool) == 2)
+
+    headers = [client.create_payment_header(payment_requirements) for _ in range(2)]
+    assert len(pool) < 2
+
+    payments = [decode_payment_header(header) for header in headers]
+    for payment in payments:
+        assert verify_payment_locally(payment, payment_requirements) is None
+    assert payments[0].payload.authorization.nonce != (
+        payments[1].payload.authorization.nonce
+    )
+
+    # The pool refills to its depth
+    wait_for(lambda: len(pool) == 2)
+
+
+def test_pool_learns_paid_requirements(account, pool, payment_requirements):
+    client = x402Client(account, header_pool=pool)
+
+    # The first payment is signed on the spot
+    header = client.create_payment_header(payment_requirements)
+    assert (
+        verify_payment_locally(decode_payment_header(header), payment_requirements)
+        is None
+    )
+    wait_for(lambda: len(pool) == 2)
+
+    other = payment_requirements.model_copy(
+        update={"resource": "https://example.com/b"}
+    )
+    assert pool.take(account.address, client._sign_payment_header, other, 1) is None
+
+
+def test_pool_drops_expiring_headers(account, pool, payment_requirements):
+    client = x402Client(account, header_pool=pool)
+    client.presign(payment_requirements)
+    wait_for(lambda: len(pool) == 2)
+
+    # Headers are dropped once less than min_validity seconds are left
+    with pool._lock:
+        pool._expire(time.time() + payment_requirements.max_timeout_seconds - 5)
+        assert sum(len(slot.headers) for slot in pool._slots.values()) == 0
+
+    wait_for(lambda: len(pool) == 2)
+
+
+def test_pool_forgets_idle_requirements(account, payment_requirements):
+    with PaymentHeaderPool(depth=1, idle_timeout=60, refill_interval=0.05) as pool:
+        x402Client(account, header_pool=pool).presign(payment_requirements)
+        wait_for(lambda: len(pool) == 1)
+
+        with pool._lock:
+            pool._expire(time.time() + 61)
+        assert len(pool) == 0
+
+
+def test_pool_skips_short_lived_requirements(account, pool, payment_requirements):
+    client = x402Client(account, header_pool=pool)
+    short = payment_requirements.model_copy(update={"max_timeout_seconds": 5})
+
+    client.presign(short)
+    assert client.create_payment_header(short)
+    assert len(pool) == 0
+    assert pool._thread is None
+
+
+def test_presign_requires_pool(account, payment_requirements):
+    with pytest.raises(ValueError):
+        x402Client(account).presign(payment_requirements)
+    with pytest.raises(ValueError):
+        PaymentHeaderPool(depth=0)
@@ -11,7 +11,10 @@ from x402.clients.requests import (
 )
 from x402.clients.base import (
     PaymentError,
+    PaymentRequirementsCache,
 )
+from x402.encoding import decode_payment_header
+from x402.exact import verify_payment_locally
 from x402.types import PaymentRequirements, x402PaymentRequiredResponse
 
 
@@ -308,3 +311,59 @@ def test_x402_requests(account):
         adapter.client.select_payment_requirements
         != adapter.client.__class__.select_payment_requirements
     )
+
+
+def test_preemptive_payment_saves_round_trips(account, payment_requirements):
+    cache = PaymentRequirementsCache()
+    adapter = x402_http_adapter(account, requirements_cache=cache)
+    server = {"requirements": payment_requirements, "requests": 0}
+
+    def serve(request, **kwargs):
+        """Answer 402 unless the request pays the current requirements."""
+        server["requests"] += 1
+        response = Response()
+        header = request.headers.get("X-Payment")
+        if header and (
+            verify_payment_locally(
+                decode_payment_header(header), server["requirements"]
+            )
+            is None
+        ):
+            response.status_code = 200
+            response._content = b"paid"
+            return response
+
+        response.status_code = 402
+        response._content = json.dumps(
+            x402PaymentRequiredResponse(
+                x402_version=1,
+                accepts=[server["requirements"]],
+                error="Payment Required",
+            ).model_dump(by_alias=True)
+        ).encode()
+        return response
+
+    def get(url):
+        request = PreparedRequest()
+        request.prepare("GET", url)
+        return adapter.send(request)
+
+    with patch("requests.adapters.HTTPAdapter.send", side_effect=serve):
+        assert get("https://example.com/data?page=1").status_code == 200
+        assert server["requests"] == 2
+
+        # Known endpoints are paid on the first attempt
+        assert get("https://example.com/data?page=2").status_code == 200
+        assert server["requests"] == 3
+
+        # A rejected preemptive payment is retried with the new requirements
+        server["requirements"] = payment_requirements.model_copy(
+            update={"max_amount_required": "20000"}
+        )
+        assert get("https://example.com/data").status_code == 200
+        assert server["requests"] == 5
+        accepts, _ = cache.get("GET", "https://example.com/data")
+        assert accepts[0].max_amount_required == "20000"
+
+        assert get("https://example.com/data").status_code == 200
+        assert server["requests"] == 6
@@ -0,0 +1,50 @@
+import pytest
+
+from x402.types import PaymentPayload, PaymentRequirements
+
+
+@pytest.fixture
+def make_requirements():
+    """Factory of exact payment requirements, with fields overridden by keyword."""
+
+    def make(**overrides):
+        fields = dict(
+            scheme="exact",
+            network="base-sepolia",
+            asset="0x036CbD53842c5426634e7929541eC2318f3dCF7e",
+            pay_to="0x0000000000000000000000000000000000000000",
+            max_amount_required="10000",
+            resource="https://example.com",
+            description="test",
+            max_timeout_seconds=1000,
+            mime_type="text/plain",
+        )
+        fields.update(overrides)
+        return PaymentRequirements(**fields)
+
+    return make
+
+
+@pytest.fixture
+def make_payment():
+    """Factory of exact payments with a dummy signature, matching `make_requirements`."""
+
+    def make(nonce="0x" + "11" * 32, valid_before="9999999999", signature="00"):
+        return PaymentPayload(
+            x402_version=1,
+            scheme="exact",
+            network="base-sepolia",
+            payload={
+                "signature": "0x" + signature * 65,
+                "authorization": {
+                    "from": "0x1111111111111111111111111111111111111111",
+                    "to": "0x0000000000000000000000000000000000000000",
+                    "value": "10000",
+                    "validAfter": "0",
+                    "validBefore": valid_before,
+                    "nonce": nonce,
+                },
+            },
+        )
+
+    return make
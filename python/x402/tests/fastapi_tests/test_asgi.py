@@ -0,0 +1,251 @@
+import asyncio
+import base64
+import json
+
+import httpx
+import pytest
+from eth_account import Account
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from x402.clients.base import x402Client
+from x402.facilitator import FacilitatorClient
+from x402.fastapi.middleware import PaymentMiddleware
+from x402.router import PaymentRouter
+from x402.testing import LocalFacilitator
+from x402.types import x402PaymentRequiredResponse
+
+PAY_TO = "0x1111111111111111111111111111111111111111"
+
+
+async def stream(request):
+    async def chunks():
+        for index in range(3):
+            yield f"data: {index}\n\n"
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+async def missing(request):
+    return PlainTextResponse("missing", status_code=404)
+
+
+async def free(request):
+    return PlainTextResponse("free")
+
+
+def make_app(facilitator: FacilitatorClient, **kwargs) -> Starlette:
+    router = PaymentRouter()
+    router.add(
+        path=["/stream", "/missing"],
+        price="$0.01",
+        pay_to_address=PAY_TO,
+        facilitator=facilitator,
+    )
+    app = Starlette(
+        routes=[
+            Route("/stream", stream),
+            Route("/missing", missing),
+            Route("/free", free),
+        ]
+    )
+    app.add_middleware(PaymentMiddleware, router=router, **kwargs)
+    return app
+
+
+def pay(client: TestClient, path: str) -> str:
+    accepts = x402PaymentRequiredResponse(**client.get(path).json()).accepts
+    return x402Client(Account.create()).create_payment_header(accepts[0])
+
+
+@pytest.fixture
+def local():
+    return LocalFacilitator()
+
+
+def test_streaming_response_gets_payment_response_header(local):
+    client = TestClient(make_app(local.client()))
+
+    response = client.get("/stream")
+    assert response.status_code == 402
+    assert response.json()["error"] == "No X-PAYMENT header provided"
+    assert response.headers["ETag"]
+
+    response = client.get("/stream", headers={"X-PAYMENT": pay(client, "/stream")})
+    assert response.status_code == 200
+    assert response.text == "data: 0\n\ndata: 1\n\ndata: 2\n\n"
+    settlement = json.loads(base64.b64decode(response.headers["X-PAYMENT-RESPONSE"]))
+    assert settlement["success"] is True
+    assert len(local.settled) == 1
+
+
+def test_unpriced_and_failed_responses_are_not_settled(local):
+    client = TestClient(make_app(local.client()))
+
+    assert client.get("/free").text == "free"
+
+    response = client.get("/missing", headers={"X-PAYMENT": pay(client, "/missing")})
+    assert response.status_code == 404
+    assert "X-PAYMENT-RESPONSE" not in response.headers
+    assert local.settled == {}
+
+
+def test_failed_settlement_replaces_response():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/settle":
+            return httpx.Response(
+                200, json={"success": False, "errorReason": "insufficient_funds"}
+            )
+        return httpx.Response(200, json={"isValid": True, "payer": "0x1"})
+
+    facilitator = FacilitatorClient(
+        {"url": "https://facilitator.test"},
+        httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    client = TestClient(make_app(facilitator))
+
+    response = client.get("/stream", headers={"X-PAYMENT": pay(client, "/stream")})
+    assert response.status_code == 402
+    assert response.json()["error"] == "Settle failed: insufficient_funds"
+
+
+def test_settle_after_stream(local):
+    client = TestClient(make_app(local.client(), settle_after_stream=True))
+
+    response = client.get("/stream", headers={"X-PAYMENT": pay(client, "/stream")})
+    assert response.status_code == 200
+    assert response.text == "data: 0\n\ndata: 1\n\ndata: 2\n\n"
+    # Without trailer support the settlement is only recorded
+    assert "X-PAYMENT-RESPONSE" not in response.headers
+    assert len(local.settled) == 1
+
+
+def test_settle_after_stream_sends_trailer(local):
+    app = make_app(local.client(), settle_after_stream=True)
+    header = pay(TestClient(app), "/stream")
+
+    async def call():
+        messages = []
+        disconnected = asyncio.Event()
+        requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "2",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("testserver", 80),
+            "path": "/stream",
+            "raw_path": b"/stream",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"x-payment", header.encode()),
+            ],
+            "extensions": {"http.response.trailers": {}},
+        }
+        await app(scope, receive, send)
+        disconnected.set()
+        return messages
+
+    messages = asyncio.run(call())
+
+    assert messages[0]["type"] == "http.response.start"
+    assert messages[0]["trailers"] is True
+    assert messages[-1]["type"] == "http.response.trailers"
+    ((name, value),) = messages[-1]["headers"]
+    assert name == b"x-payment-response"
+    assert json.loads(base64.b64decode(value))["success"] is True
+    body = b"".join(m.get("body", b"") for m in messages[1:-1])
+    assert body == b"data: 0\n\ndata: 1\n\ndata: 2\n\n"
+
+
+def slow_facilitator(is_valid: bool, events: list[str]) -> FacilitatorClient:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/settle":
+            return httpx.Response(200, json={"success": True, "transaction": "0xabc"})
+        events.append("verify started")
+        await asyncio.sleep(0.2)
+        events.append("verify finished")
+        if is_valid:
+            return httpx.Response(200, json={"isValid": True, "payer": "0x1"})
+        return httpx.Response(
+            200,
+            json={"isValid": False, "invalidReason": "invalid_scheme", "payer": "0x1"},
+        )
+
+    return FacilitatorClient(
+        {"url": "https://facilitator.test"},
+        httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+
+def make_speculative_app(facilitator: FacilitatorClient, events: list[str]):
+    async def compute(request):
+        events.append("handler started")
+        await asyncio.sleep(0.1)
+        events.append("handler finished")
+        return PlainTextResponse("result")
+
+    router = PaymentRouter()
+    router.add(
+        path="/compute",
+        price="$0.01",
+        pay_to_address=PAY_TO,
+        facilitator=facilitator,
+        speculative=True,
+    )
+    app = Starlette(routes=[Route("/compute", compute)])
+    app.add_middleware(PaymentMiddleware, router=router)
+    return app
+
+
+def test_speculative_route_runs_handler_during_verification():
+    events = []
+    client = TestClient(make_speculative_app(slow_facilitator(True, events), events))
+
+    response = client.get("/compute", headers={"X-PAYMENT": pay(client, "/compute")})
+    assert response.status_code == 200
+    assert response.text == "result"
+    assert "X-PAYMENT-RESPONSE" in response.headers
+    # The handler ran to completion while the payment was being verified
+    assert events.index("handler finished") < events.index("verify finished")
+
+
+def test_speculative_route_cancels_handler_on_invalid_payment():
+    events = []
+    client = TestClient(make_speculative_app(slow_facilitator(False, events), events))
+
+    response = client.get("/compute", headers={"X-PAYMENT": pay(client, "/compute")})
+    assert response.status_code == 402
+    assert response.json()["error"] == "Invalid payment: invalid_scheme"
+    assert "handler finished" in events
+
+    # A handler still running when verification fails is cancelled
+    events.clear()
+
+    async def slow(request):
+        events.append("handler started")
+        await asyncio.sleep(10)
+        events.append("handler finished")
+
+    app = make_speculative_app(slow_facilitator(False, events), events)
+    app.router.routes[0] = Route("/compute", slow)
+    client = TestClient(app)
+    response = client.get("/compute", headers={"X-PAYMENT": pay(client, "/compute")})
+    assert response.status_code == 402
+    assert "handler started" in events
+    assert "handler finished" not in events
@@ -1,6 +1,10 @@
+import threading
+
+import httpx
 from fastapi import FastAPI, Request
 from fastapi.testclient import TestClient
 from x402.fastapi.middleware import require_payment
+from x402.paywall import PaywallAsset, load_paywall_bundle
 from x402.types import PaywallConfig
 
 
@@ -347,6 +351,71 @@ def test_browser_request_returns_html():
     assert "window.x402" in html_content
 
 
+def test_paywall_assets_are_served():
+    """Test that the scripts linked from the paywall are served with caching."""
+    app = FastAPI()
+    app.get("/protected")(test_endpoint)
+    app.middleware("http")(
+        require_payment(
+            price="$1.00",
+            pay_to_address="0x1111111111111111111111111111111111111111",
+            path="/protected",
+        )
+    )
+    client = TestClient(app)
+
+    script = load_paywall_bundle().script
+    html = client.get(
+        "/protected", headers={"Accept": "text/html", "User-Agent": "Mozilla/5.0"}
+    ).text
+    assert f'src="/x402/paywall/{script.name}"' in html
+
+    response = client.get(f"/x402/paywall/{script.name}")
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.content == script.variant("identity")
+
+    response = client.get(
+        f"/x402/paywall/{script.name}",
+        headers={"If-None-Match": response.headers["etag"]},
+    )
+    assert response.status_code == 304
+
+
+async def test_paywall_assets_are_compressed_off_the_event_loop(monkeypatch):
+    """Test that compressing a paywall asset does not block the event loop."""
+    threads = []
+    variant = PaywallAsset.variant
+
+    def recording_variant(self, encoding):
+        threads.append(threading.current_thread())
+        return variant(self, encoding)
+
+    monkeypatch.setattr(PaywallAsset, "variant", recording_variant)
+
+    app = FastAPI()
+    app.middleware("http")(
+        require_payment(
+            price="$1.00",
+            pay_to_address="0x1111111111111111111111111111111111111111",
+            path="/protected",
+        )
+    )
+
+    script = load_paywall_bundle().script
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app), base_url="http://testserver"
+    ) as client:
+        response = await client.get(
+            f"/x402/paywall/{script.name}", headers={"Accept-Encoding": "gzip"}
+        )
+
+    assert response.status_code == 200
+    assert threads
+    assert threading.current_thread() not in threads
+
+
 def test_api_client_request_returns_json():
     """Test that API client requests return JSON response."""
     app = FastAPI()
@@ -529,3 +598,160 @@ def test_payment_amount_conversion():
     html_content = response.text
     # $0.001 should be converted to 0.001 in the display
     assert '"amount": 0.001' in html_content
+
+
+def test_payment_middleware_serves_router_routes():
+    from x402.fastapi.middleware import payment_middleware
+    from x402.router import PaymentRouter
+
+    router = PaymentRouter()
+    router.add(price="$1.00", pay_to_address="0x1", path="/a")
+    router.add(price="$2.00", pay_to_address="0x2", path=["/b", "/c/*"])
+
+    app = FastAPI()
+    for route_path in ("/a", "/b", "/c/d", "/free"):
+        app.get(route_path)(test_endpoint)
+    app.middleware("http")(payment_middleware(router))
+
+    client = TestClient(app)
+    assert client.get("/a").json()["accepts"][0]["payTo"] == "0x1"
+    assert client.get("/b").json()["accepts"][0]["payTo"] == "0x2"
+    assert client.get("/c/d").json()["accepts"][0]["resource"].endswith("/c/d")
+    assert client.get("/free").status_code == 200
+
+
+def test_speculative_require_payment():
+    import asyncio
+
+    import httpx
+    from eth_account import Account
+
+    from x402.clients.base import x402Client
+    from x402.facilitator import FacilitatorClient
+    from x402.types import x402PaymentRequiredResponse
+
+    events = []
+    valid = {"value": True}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/settle":
+            return httpx.Response(200, json={"success": True, "transaction": "0xabc"})
+        await asyncio.sleep(0.2)
+        events.append("verified")
+        return httpx.Response(
+            200,
+            json={
+                "isValid": valid["value"],
+                "invalidReason": None if valid["value"] else "invalid_scheme",
+                "payer": "0x1",
+            },
+        )
+
+    app = FastAPI()
+
+    @app.get("/compute")
+    async def compute():
+        events.append("computed")
+        return {"result": 42}
+
+    app.middleware("http")(
+        require_payment(
+            price="$0.01",
+            pay_to_address="0x1111111111111111111111111111111111111111",
+            path="/compute",
+            facilitator=FacilitatorClient(
+                {"url": "https://facilitator.test"},
+                httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            ),
+            speculative=True,
+        )
+    )
+
+    client = TestClient(app)
+    accepts = x402PaymentRequiredResponse(**client.get("/compute").json()).accepts
+    header = x402Client(Account.create()).create_payment_header(accepts[0])
+
+    response = client.get("/compute", headers={"X-PAYMENT": header})
+    assert response.status_code == 200
+    assert response.json() == {"result": 42}
+    assert "X-PAYMENT-RESPONSE" in response.headers
+    assert events == ["computed", "verified"]
+
+    # The response of the endpoint is discarded when the payment is invalid
+    events.clear()
+    valid["value"] = False
+    response = client.get("/compute", headers={"X-PAYMENT": header})
+    assert response.status_code == 402
+    assert response.json()["error"] == "Invalid payment: invalid_scheme"
+    assert events == ["computed", "verified"]
+
+
+async def test_speculative_handler_is_awaited_when_payment_is_invalid(monkeypatch):
+    import asyncio
+
+    import httpx
+    from eth_account import Account
+
+    from x402.clients.base import x402Client
+    from x402.facilitator import FacilitatorClient
+    from x402.types import x402PaymentRequiredResponse
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.1)
+        return httpx.Response(
+            200,
+            json={"isValid": False, "invalidReason": "invalid_scheme", "payer": "0x1"},
+        )
+
+    app = FastAPI()
+
+    @app.get("/compute")
+    async def compute():
+        await asyncio.sleep(1)
+
+    app.middleware("http")(
+        require_payment(
+            price="$0.01",
+            pay_to_address="0x1111111111111111111111111111111111111111",
+            path="/compute",
+            facilitator=FacilitatorClient(
+                {"url": "https://facilitator.test"},
+                httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            ),
+            speculative=True,
+        )
+    )
+
+    tasks = []
+    ensure_future = asyncio.ensure_future
+
+    def record_task(coro, **kwargs):
+        task = ensure_future(coro, **kwargs)
+        tasks.append(task)
+        return task
+
+    monkeypatch.setattr(asyncio, "ensure_future", record_task)
+
+    finished_at_response = []
+
+    async def outer(scope, receive, send):
+        async def checked_send(message):
+            if message["type"] == "http.response.start":
+                finished_at_response.append(all(task.done() for task in tasks))
+            await send(message)
+
+        await app(scope, receive, checked_send)
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(outer), base_url="http://testserver"
+    ) as client:
+        response = await client.get("/compute")
+        accepts = x402PaymentRequiredResponse(**response.json()).accepts
+        header = x402Client(Account.create()).create_payment_header(accepts[0])
+
+        response = await client.get("/compute", headers={"X-PAYMENT": header})
+
+    assert response.status_code == 402
+    # The discarded endpoint task has finished before the rejection is sent
+    assert tasks
+    assert finished_at_response[-1]
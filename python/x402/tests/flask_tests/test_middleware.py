@@ -1,5 +1,16 @@
+import logging
+
+import httpx
+import pytest
+from eth_account import Account
 from flask import Flask, g
+from x402.clients.base import x402Client
+from x402.facilitator import SyncFacilitatorClient
 from x402.flask.middleware import PaymentMiddleware
+from x402.paywall import load_paywall_bundle
+from x402.replay import ReplayGuard
+from x402.testing import LocalFacilitator
+from x402.types import x402PaymentRequiredResponse
 
 
 def create_app_with_middleware(configs):
@@ -182,6 +193,36 @@ def test_browser_request_returns_html():
         assert "window.x402" in html_content
 
 
+def test_paywall_assets_are_served():
+    """Test that the scripts linked from the paywall are served with caching."""
+    app = create_app_with_middleware(
+        [{"price": "$1.00", "pay_to_address": "0x1", "path": "/protected"}]
+    )
+    stylesheet = load_paywall_bundle().stylesheet
+
+    with app.test_client() as client:
+        html = client.get(
+            "/protected",
+            headers={"Accept": "text/html", "User-Agent": "Mozilla/5.0"},
+            base_url="http://localhost/app/",
+        ).get_data(as_text=True)
+        assert f'href="/app/x402/paywall/{stylesheet.name}"' in html
+
+        resp = client.get(
+            f"/x402/paywall/{stylesheet.name}", headers={"Accept-Encoding": "gzip"}
+        )
+        assert resp.status_code == 200
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert resp.headers["Content-Type"] == "text/css; charset=utf-8"
+        assert resp.get_data() == stylesheet.variant("gzip")
+
+        resp = client.get(
+            f"/x402/paywall/{stylesheet.name}",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": resp.headers["ETag"]},
+        )
+        assert resp.status_code == 304
+
+
 def test_api_client_request_returns_json():
     """Test that API client requests return JSON response."""
     app = create_app_with_middleware(
@@ -358,3 +399,208 @@ def test_payment_amount_conversion():
         html_content = resp.get_data(as_text=True)
         # $0.001 should be converted to 0.001 in the display
         assert '"amount": 0.001' in html_content
+
+
+def test_payment_required_body_headers():
+    app = create_app_with_middleware(
+        [{"price": "$1.00", "pay_to_address": "0x1", "path": "/protected"}]
+    )
+    with app.test_client() as client:
+        first = client.get("/protected")
+        second = client.get("/protected")
+
+    assert first.status_code == 402
+    assert first.headers["Content-Length"] == str(len(first.data))
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert first.data == second.data
+
+
+def test_routes_share_one_wsgi_middleware():
+    app = Flask(__name__)
+    original_wsgi_app = app.wsgi_app
+
+    @app.route("/a")
+    def a():
+        return {"a": True}
+
+    middleware = PaymentMiddleware(app)
+    middleware.add(price="$2.00", pay_to_address="0x2", path="/*")
+    wrapped = app.wsgi_app
+    middleware.add(price="$1.00", pay_to_address="0x1", path="/a")
+
+    assert app.wsgi_app is wrapped
+    assert app.wsgi_app is not original_wsgi_app
+    assert len(middleware.router.routes) == 2
+
+    with app.test_client() as client:
+        resp = client.get("/a")
+        assert resp.status_code == 402
+        # The last matching registration wins, as when each registration wrapped
+        # the app in its own middleware
+        assert resp.json["accepts"][0]["maxAmountRequired"] == "1000000"
+        assert client.get("/b").json["accepts"][0]["payTo"] == "0x2"
+
+
+def test_replay_guard_rejects_used_authorization():
+    app = Flask(__name__)
+
+    @app.route("/protected")
+    def protected():
+        return {"message": "protected"}
+
+    local = LocalFacilitator()
+    middleware = PaymentMiddleware(app)
+    middleware.add(
+        price="$1.00",
+        pay_to_address="0x1111111111111111111111111111111111111111",
+        path="/protected",
+        facilitator=local.client(),
+        replay_guard=ReplayGuard(),
+    )
+
+    with app.test_client() as client:
+        accepts = x402PaymentRequiredResponse(**client.get("/protected").json).accepts
+        header = x402Client(Account.create()).create_payment_header(accepts[0])
+
+        resp = client.get("/protected", headers={"X-PAYMENT": header})
+        assert resp.status_code == 200
+        assert "X-PAYMENT-RESPONSE" in resp.headers
+
+        resp = client.get("/protected", headers={"X-PAYMENT": header})
+        assert resp.status_code == 402
+        assert resp.json["error"] == "Payment already used"
+
+    assert local.requests == ["/verify", "/settle"]
+
+
+def test_middleware_works_on_environ_without_request_context(monkeypatch):
+    app = Flask(__name__)
+
+    @app.route("/protected/<name>")
+    def protected(name):
+        return {
+            "name": name,
+            "payer": g.verify_response.payer,
+            "amount": g.payment_details.max_amount_required,
+        }
+
+    @app.route("/unprotected")
+    def unprotected():
+        return {"message": "unprotected"}
+
+    middleware = PaymentMiddleware(app)
+    middleware.add(
+        price="$1.00",
+        pay_to_address="0x1111111111111111111111111111111111111111",
+        path="/protected/*",
+        facilitator=LocalFacilitator().client(),
+    )
+
+    contexts = []
+    request_context = app.request_context
+
+    def counting_request_context(environ):
+        contexts.append(environ["PATH_INFO"])
+        return request_context(environ)
+
+    monkeypatch.setattr(app, "request_context", counting_request_context)
+
+    with app.test_client() as client:
+        assert client.get("/unprotected").status_code == 200
+
+        resp = client.get("/protected/caf%C3%A9?q=1")
+        assert resp.status_code == 402
+        # The resource is the URL Flask reports for the request
+        assert (
+            resp.json["accepts"][0]["resource"] == "http://localhost/protected/café?q=1"
+        )
+
+        accepts = x402PaymentRequiredResponse(**resp.json).accepts
+        account = Account.create()
+        header = x402Client(account).create_payment_header(accepts[0])
+        resp = client.get("/protected/caf%C3%A9?q=1", headers={"X-PAYMENT": header})
+        assert resp.status_code == 200
+        assert resp.json == {
+            "name": "café",
+            "payer": account.address,
+            "amount": "1000000",
+        }
+
+    # Only Flask itself pushed a request context, for the requests it served
+    assert len(contexts) == 2
+
+
+def test_routes_share_one_sync_facilitator_client():
+    app = Flask(__name__)
+
+    @app.route("/<name>")
+    def paid(name):
+        return {"name": name}
+
+    local = LocalFacilitator()
+    shared = SyncFacilitatorClient(local.client())
+    middleware = PaymentMiddleware(app)
+    for path in ("/a", "/b"):
+        middleware.add(
+            price="$1.00", pay_to_address="0x1", path=path, facilitator=shared
+        )
+    middleware.add(price="$1.00", pay_to_address="0x1", path="/c")
+    middleware.add(price="$1.00", pay_to_address="0x1", path="/d")
+
+    a, b, c, d = middleware.router.routes
+    assert a.facilitator is b.facilitator is shared.facilitator
+    assert middleware._facilitators[a.facilitator] is shared
+    # Routes created from the same configuration share a client and its wrapper
+    assert c.facilitator is d.facilitator
+    assert len(middleware._facilitators) == 2
+
+
+class RejectingSettleFacilitator(LocalFacilitator):
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/settle":
+            return httpx.Response(
+                200, json={"success": False, "errorReason": "insufficient_funds"}
+            )
+        return super().handle(request)
+
+
+class UnreachableSettleFacilitator(LocalFacilitator):
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/settle":
+            raise httpx.ConnectError("facilitator down")
+        return super().handle(request)
+
+
+@pytest.mark.parametrize(
+    "facilitator, error",
+    [
+        (RejectingSettleFacilitator, "insufficient_funds"),
+        (UnreachableSettleFacilitator, "facilitator down"),
+    ],
+)
+def test_settle_failures_are_logged(caplog, capsys, facilitator, error):
+    app = Flask(__name__)
+
+    @app.route("/protected")
+    def protected():
+        return {"message": "protected"}
+
+    middleware = PaymentMiddleware(app)
+    middleware.add(
+        price="$1.00",
+        pay_to_address="0x1111111111111111111111111111111111111111",
+        path="/protected",
+        facilitator=facilitator().client(),
+    )
+
+    with app.test_client() as client:
+        accepts = x402PaymentRequiredResponse(**client.get("/protected").json).accepts
+        header = x402Client(Account.create()).create_payment_header(accepts[0])
+        with caplog.at_level(logging.ERROR, logger="x402.flask.middleware"):
+            resp = client.get("/protected", headers={"X-PAYMENT": header})
+
+    assert resp.status_code == 200
+    assert "X-PAYMENT-RESPONSE" not in resp.headers
+    assert "Settle failed" in caplog.text
+    assert error in caplog.text
+    assert capsys.readouterr().out == ""
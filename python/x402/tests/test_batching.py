@@ -0,0 +1,187 @@
+import asyncio
+
+import httpx
+import pytest
+from eth_account import Account
+
+from x402.batching import Batcher
+from x402.clients.base import x402Client
+from x402.exact import decode_payment
+from x402.testing import LocalFacilitator
+from x402.types import PaymentPayload, PaymentRequirements
+
+
+@pytest.fixture
+def payment_requirements():
+    return PaymentRequirements(
+        scheme="exact",
+        network="base-sepolia",
+        asset="0x036CbD53842c5426634e7929541eC2318f3dCF7e",
+        pay_to="0x0000000000000000000000000000000000000000",
+        max_amount_required="10000",
+        resource="https://example.com",
+        description="test",
+        max_timeout_seconds=1000,
+        mime_type="text/plain",
+        extra={"name": "USDC", "version": "2"},
+    )
+
+
+@pytest.fixture
+def client():
+    return x402Client(Account.create())
+
+
+def make_payment(client, payment_requirements):
+    header = client.create_payment_header(payment_requirements)
+    return PaymentPayload(**decode_payment(header))
+
+
+async def test_batcher_flushes_when_full():
+    batches = []
+
+    async def flush(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = Batcher(flush, max_size=3, max_delay=10)
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+
+    assert results == [0, 2, 4]
+    assert batches == [[0, 1, 2]]
+
+
+async def test_batcher_flushes_after_delay():
+    batches = []
+
+    async def flush(items):
+        batches.append(list(items))
+        return items
+
+    batcher = Batcher(flush, max_size=100, max_delay=0.01)
+    assert await asyncio.gather(batcher.submit("a"), batcher.submit("b")) == ["a", "b"]
+    assert await batcher.submit("c") == "c"
+    assert batches == [["a", "b"], ["c"]]
+
+
+async def test_batcher_propagates_errors():
+    async def flush(items):
+        raise ConnectionError("facilitator down")
+
+    batcher = Batcher(flush, max_size=2, max_delay=10)
+    results = await asyncio.gather(
+        batcher.submit(1), batcher.submit(2), return_exceptions=True
+    )
+    assert all(isinstance(r, ConnectionError) for r in results)
+
+
+async def test_settle_many_uses_batch_endpoint(client, payment_requirements):
+    local = LocalFacilitator()
+    facilitator = local.client({"batch_endpoints": True})
+    payments = [make_payment(client, payment_requirements) for _ in range(3)]
+    items = [(payment, payment_requirements) for payment in payments]
+
+    verify_responses = await facilitator.verify_many(items)
+    assert all(r.is_valid for r in verify_responses)
+
+    # Duplicates within a batch are settled once, for their first occurrence
+    settle_responses = await facilitator.settle_many(items + items[:1])
+    assert all(r.success for r in settle_responses[:3])
+    assert not settle_responses[3].success
+    assert settle_responses[3].error_reason == "payment_already_used"
+    assert local.requests == ["/verify/batch", "/settle/batch"]
+    assert len(local.settled) == 3
+
+    # Settled authorizations cannot be settled again
+    settle_responses = await facilitator.settle_many(items[:1])
+    assert not settle_responses[0].success
+
+
+class NoBatchFacilitator(LocalFacilitator):
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/batch"):
+            self.requests.append(request.url.path)
+            return httpx.Response(404)
+        return super().handle(request)
+
+
+async def test_batch_falls_back_to_single_requests(client, payment_requirements):
+    local = NoBatchFacilitator()
+    facilitator = local.client({"batch_endpoints": True})
+    items = [
+        (make_payment(client, payment_requirements), payment_requirements)
+        for _ in range(2)
+    ]
+
+    responses = await facilitator.settle_many(items)
+    assert all(r.success for r in responses)
+    assert local.requests[0] == "/settle/batch"
+    assert "/settle" in local.requests
+
+    # Batching is not attempted again once the facilitator rejected it
+    local.requests.clear()
+    await facilitator.verify_many(
+        [(make_payment(client, payment_requirements), payment_requirements)]
+    )
+    assert local.requests == ["/verify"]
+
+
+class FailingBatchFacilitator(LocalFacilitator):
+    def __init__(self, response: httpx.Response):
+        super().__init__()
+        self.response = response
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/batch"):
+            self.requests.append(request.url.path)
+            return self.response
+        return super().handle(request)
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        httpx.Response(500, text="Internal Server Error"),
+        httpx.Response(401, json={"error": "Unauthorized"}),
+        httpx.Response(200, json={"error": "no results"}),
+    ],
+)
+async def test_failed_batch_requests(client, payment_requirements, response):
+    local = FailingBatchFacilitator(response)
+    facilitator = local.client({"batch_endpoints": True})
+    items = [
+        (make_payment(client, payment_requirements), payment_requirements)
+        for _ in range(2)
+    ]
+
+    # Verification is retried with single requests
+    verify_responses = await facilitator.verify_many(items)
+    assert all(r.is_valid for r in verify_responses)
+    assert local.requests == ["/verify/batch", "/verify", "/verify"]
+
+    # Settlements may have gone through, so they are failed rather than resent
+    local.requests.clear()
+    settle_responses = await facilitator.settle_many(items)
+    assert [r.error_reason for r in settle_responses] == ["unexpected_settle_error"] * 2
+    assert settle_responses[0].payer == items[0][0].payload.authorization.from_
+    assert local.requests == ["/settle/batch"]
+
+
+async def test_settle_calls_are_micro_batched(client, payment_requirements):
+    local = LocalFacilitator()
+    facilitator = local.client(
+        {
+            "batch_endpoints": True,
+            "settle_batch_window": 0.05,
+            "settle_batch_max_size": 10,
+        }
+    )
+    payments = [make_payment(client, payment_requirements) for _ in range(5)]
+
+    responses = await asyncio.gather(
+        *(facilitator.settle(payment, payment_requirements) for payment in payments)
+    )
+
+    assert all(r.success for r in responses)
+    assert len({r.transaction for r in responses}) == 5
+    assert local.requests == ["/settle/batch"]
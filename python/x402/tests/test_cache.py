@@ -0,0 +1,212 @@
+import asyncio
+import base64
+import json
+import time
+
+import httpx
+import pytest
+
+from x402.cache import HeaderCache, VerificationCache, jwt_expiry, payment_digest
+from x402.facilitator import FacilitatorClient
+from x402.types import VerifyResponse
+
+
+VALID = VerifyResponse(
+    is_valid=True, payer="0x1111111111111111111111111111111111111111"
+)
+
+
+def test_payment_digest_is_stable_and_discriminating(make_requirements, make_payment):
+    requirements = make_requirements()
+
+    assert payment_digest(make_payment(), requirements) == payment_digest(
+        make_payment(), requirements
+    )
+    assert payment_digest(make_payment(), requirements) != payment_digest(
+        make_payment(nonce="0x" + "22" * 32), requirements
+    )
+    assert payment_digest(make_payment(), requirements) != payment_digest(
+        make_payment(), make_requirements(resource="https://example.com/other")
+    )
+
+
+def test_cache_hit_and_invalidate():
+    cache = VerificationCache(max_size=4, ttl=60)
+    cache.put("a", VALID, valid_before=int(time.time()) + 600)
+
+    assert cache.get("a") is VALID
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+
+def test_cache_expires_at_valid_before():
+    cache = VerificationCache(max_size=4, ttl=60)
+
+    cache.put("expired", VALID, valid_before=int(time.time()) - 1)
+    assert cache.get("expired") is None
+    assert len(cache) == 0
+
+    cache.put("short", VALID, valid_before=int(time.time()) + 600)
+    cache._entries["short"] = (time.time() - 1, VALID)
+    assert cache.get("short") is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = VerificationCache(max_size=2, ttl=60)
+    valid_before = int(time.time()) + 600
+
+    cache.put("a", VALID, valid_before)
+    cache.put("b", VALID, valid_before)
+    cache.get("a")
+    cache.put("c", VALID, valid_before)
+
+    assert cache.get("a") is VALID
+    assert cache.get("b") is None
+    assert cache.get("c") is VALID
+
+
+async def test_facilitator_reuses_verify_until_settled(make_requirements, make_payment):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path == "/verify":
+            return httpx.Response(200, json={"isValid": True, "payer": "0x1"})
+        return httpx.Response(200, json={"success": True, "transaction": "0xabc"})
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    facilitator = FacilitatorClient({"url": "https://facilitator.test"}, http_client)
+    payment, requirements = make_payment(), make_requirements()
+
+    assert (await facilitator.verify(payment, requirements)).is_valid
+    assert (await facilitator.verify(payment, requirements)).is_valid
+    assert calls == ["/verify"]
+
+    await facilitator.settle(payment, requirements)
+    await facilitator.verify(payment, requirements)
+    assert calls == ["/verify", "/settle", "/verify"]
+
+    await http_client.aclose()
+
+
+async def test_facilitator_does_not_cache_invalid_or_disabled(
+    make_requirements, make_payment
+):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(
+            200,
+            json={
+                "isValid": False,
+                "invalidReason": "insufficient_funds",
+                "payer": "0x1",
+            },
+        )
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    payment, requirements = make_payment(), make_requirements()
+
+    facilitator = FacilitatorClient({"url": "https://facilitator.test"}, http_client)
+    await facilitator.verify(payment, requirements)
+    await facilitator.verify(payment, requirements)
+    assert len(calls) == 2
+
+    facilitator = FacilitatorClient(
+        {"url": "https://facilitator.test", "verify_cache_size": 0}, http_client
+    )
+    assert facilitator._verify_cache is None
+
+    await http_client.aclose()
+
+
+def make_jwt(exp):
+    claims = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).rstrip(b"=")
+    return f"eyJhbGciOiJFUzI1NiJ9.{claims.decode()}.c2lnbmF0dXJl"
+
+
+def test_jwt_expiry():
+    assert jwt_expiry({"Authorization": f"Bearer {make_jwt(1700000000)}"}) == 1700000000
+    assert jwt_expiry({"authorization": f"bearer {make_jwt(5)}"}) == 5
+    assert jwt_expiry({"Authorization": "Basic dXNlcjpwYXNz"}) is None
+    assert jwt_expiry({"Authorization": "Bearer not.a-jwt.token"}) is None
+    assert jwt_expiry({}) is None
+
+
+async def test_header_cache_coalesces_and_refreshes_ahead():
+    calls = 0
+
+    async def create_headers():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {
+            "verify": {"Authorization": f"Bearer {make_jwt(time.time() + 5)}"},
+            "settle": {"X-Api-Key": str(calls)},
+        }
+
+    cache = HeaderCache(create_headers, ttl=60, refresh_ahead=1)
+    verify, settle = await asyncio.gather(cache.get("verify"), cache.get("settle"))
+    assert settle == {"X-Api-Key": "1"}
+    assert calls == 1
+
+    # Headers close to expiry are returned while being refreshed in the background
+    expires_at, headers = cache._entries["verify"]
+    cache._entries["verify"] = (time.time() + 0.5, headers)
+    assert await cache.get("verify") is headers
+    await cache._background
+    assert calls == 2
+    assert await cache.get("settle") == {"X-Api-Key": "2"}
+
+    # Expired headers are created again before being returned
+    cache._entries["settle"] = (time.time() - 1, {"X-Api-Key": "2"})
+    assert await cache.get("settle") == {"X-Api-Key": "3"}
+
+    # Operations without headers are cached as empty
+    assert await cache.get("list") == {}
+    assert await cache.get("list") == {}
+    assert calls == 4
+
+
+async def test_facilitator_caches_headers():
+    calls = 0
+    seen = []
+
+    async def create_headers():
+        nonlocal calls
+        calls += 1
+        return {"list": {"X-Api-Key": str(calls)}}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers["X-Api-Key"])
+        if len(seen) == 2:
+            return httpx.Response(401, json={"error": "expired"})
+        return httpx.Response(
+            200,
+            json={
+                "x402Version": 1,
+                "items": [],
+                "pagination": {"limit": 0, "offset": 0, "total": 0},
+            },
+        )
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    facilitator = FacilitatorClient(
+        {
+            "url": "https://facilitator.test",
+            "create_headers": create_headers,
+            "cache_headers": True,
+        },
+        http_client,
+    )
+
+    await facilitator.list()
+    # A rejected header set is dropped and created again for the next request
+    with pytest.raises(ValueError):
+        await facilitator.list()
+    await facilitator.list()
+    assert seen == ["1", "1", "2"]
+    assert calls == 2
+
+    await http_client.aclose()
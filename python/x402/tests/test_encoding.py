@@ -1,5 +1,12 @@
+import json
+
 import pytest
-from x402.encoding import safe_base64_encode, safe_base64_decode
+from x402.encoding import (
+    decode_payment_header,
+    safe_base64_encode,
+    safe_base64_decode,
+)
+from x402.types import PaymentPayload
 
 
 def test_safe_base64_encode():
@@ -79,3 +86,53 @@ def test_encode_decode_roundtrip():
         assert decoded == test_bytes.decode("utf-8"), (
             f"Roundtrip failed for bytes: {test_bytes}"
         )
+
+
+PAYMENT = {
+    "x402Version": 1,
+    "scheme": "exact",
+    "network": "base-sepolia",
+    "payload": {
+        "signature": "0x" + "ab" * 65,
+        "authorization": {
+            "from": "0x1111111111111111111111111111111111111111",
+            "to": "0x2222222222222222222222222222222222222222",
+            "value": "10000",
+            "validAfter": "0",
+            "validBefore": "9999999999",
+            "nonce": "0x" + "33" * 32,
+        },
+    },
+}
+
+
+def test_decode_payment_header():
+    header = safe_base64_encode(json.dumps(PAYMENT))
+
+    payment = decode_payment_header(header)
+    assert payment == PaymentPayload(**PAYMENT)
+    assert (
+        payment.payload.authorization.from_
+        == PAYMENT["payload"]["authorization"]["from"]
+    )
+    assert decode_payment_header(header.encode("ascii")) == payment
+
+
+def test_decode_payment_header_rejects_invalid_headers():
+    invalid = dict(PAYMENT, payload=dict(PAYMENT["payload"], authorization={}))
+
+    for header in [
+        "invalid base64!",
+        "aGVsbG8",
+        safe_base64_encode("not json"),
+        safe_base64_encode(json.dumps(invalid)),
+        "ünicode",
+    ]:
+        with pytest.raises(ValueError):
+            decode_payment_header(header)
+
+    header = safe_base64_encode(json.dumps(PAYMENT))
+    with pytest.raises(ValueError, match="larger than"):
+        decode_payment_header(header, max_size=len(header) - 1)
+    with pytest.raises(ValueError, match="larger than"):
+        decode_payment_header("A" * 10_000)
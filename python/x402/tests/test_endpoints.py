@@ -0,0 +1,194 @@
+import asyncio
+from typing import Optional
+
+import httpx
+import pytest
+from eth_account import Account
+
+from x402.clients.base import x402Client
+from x402.endpoints import EndpointPool, FacilitatorEndpoint
+from x402.exact import decode_payment
+from x402.facilitator import FacilitatorClient
+from x402.testing import LocalFacilitator
+from x402.types import PaymentPayload, PaymentRequirements
+
+
+@pytest.fixture
+def payment_requirements():
+    return PaymentRequirements(
+        scheme="exact",
+        network="base-sepolia",
+        asset="0x036CbD53842c5426634e7929541eC2318f3dCF7e",
+        pay_to="0x0000000000000000000000000000000000000000",
+        max_amount_required="10000",
+        resource="https://example.com",
+        description="test",
+        max_timeout_seconds=1000,
+        mime_type="text/plain",
+        extra={"name": "USDC", "version": "2"},
+    )
+
+
+@pytest.fixture
+def payment(payment_requirements):
+    header = x402Client(Account.create()).create_payment_header(payment_requirements)
+    return PaymentPayload(**decode_payment(header))
+
+
+class FlakyFacilitator(LocalFacilitator):
+    """A LocalFacilitator that can be taken down or slowed down."""
+
+    def __init__(self, url: str):
+        super().__init__(url)
+        self.error: Optional[type[Exception]] = None
+        self.delay = 0.0
+
+    async def handle_async(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            self.requests.append(request.url.path)
+            raise self.error("facilitator down", request=request)
+        return self.handle(request)
+
+
+def make_client(facilitators, **config) -> FacilitatorClient:
+    by_host = {httpx.URL(f.url).host: f for f in facilitators}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return await by_host[request.url.host].handle_async(request)
+
+    return FacilitatorClient(
+        {"urls": [f.url for f in facilitators], **config},
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+
+def test_endpoint_circuit_breaker():
+    endpoint = FacilitatorEndpoint("https://a.test", failure_threshold=2)
+    endpoint.ejection_seconds = 10
+
+    endpoint.record_failure(now=100)
+    assert endpoint.is_available(now=100)
+    endpoint.record_failure(now=100)
+    assert not endpoint.is_available(now=105)
+
+    # Half-open after the ejection period: one more failure ejects it again
+    assert endpoint.is_available(now=110)
+    endpoint.record_failure(now=110)
+    assert not endpoint.is_available(now=115)
+
+    endpoint.record_success(0.1)
+    assert endpoint.is_available(now=115)
+    assert endpoint.consecutive_failures == 0
+
+
+def test_pool_ranks_by_p95_and_health():
+    pool = EndpointPool(["https://a.test", "https://b.test", "https://c.test"])
+    a, b, c = pool.endpoints
+
+    for _ in range(19):
+        a.record_success(0.01)
+        b.record_success(0.05)
+    a.record_success(2.0)
+    b.record_success(0.05)
+    assert a.p95() == 0.01
+    assert [e.url for e in pool.ranked()] == [c.url, a.url, b.url]
+
+    for _ in range(3):
+        c.record_failure()
+    assert [e.url for e in pool.ranked()] == [a.url, b.url, c.url]
+
+    with pytest.raises(ValueError):
+        EndpointPool([])
+
+
+def test_urls_are_validated():
+    with pytest.raises(ValueError, match="Invalid URL"):
+        FacilitatorClient({"urls": ["https://a.test", "b.test"]})
+
+    facilitator = FacilitatorClient({"urls": ["https://a.test/", "https://b.test"]})
+    assert facilitator.config["url"] == "https://a.test"
+
+
+async def test_verify_fails_over_and_ejects(payment, payment_requirements):
+    a = FlakyFacilitator("https://a.test")
+    b = FlakyFacilitator("https://b.test")
+    a.error = httpx.ReadTimeout
+    facilitator = make_client([a, b], failure_threshold=1, verify_cache_size=0)
+
+    assert (await facilitator.verify(payment, payment_requirements)).is_valid
+    assert a.requests == ["/verify"]
+    assert b.requests == ["/verify"]
+
+    # The failed endpoint is ejected and no longer tried first
+    assert (await facilitator.verify(payment, payment_requirements)).is_valid
+    assert a.requests == ["/verify"]
+    assert (await facilitator.list()).items == []
+    assert b.requests == ["/verify", "/verify", "/discovery/resources"]
+
+
+async def test_settle_only_fails_over_before_sending(payment, payment_requirements):
+    a = FlakyFacilitator("https://a.test")
+    b = FlakyFacilitator("https://b.test")
+
+    # The request may have reached the facilitator, so it is not sent elsewhere
+    a.error = httpx.ReadTimeout
+    facilitator = make_client([a, b])
+    with pytest.raises(httpx.ReadTimeout):
+        await facilitator.settle(payment, payment_requirements)
+    assert b.requests == []
+
+    a.error = httpx.ConnectError
+    facilitator = make_client([a, b])
+    assert (await facilitator.settle(payment, payment_requirements)).success
+    assert b.requests == ["/settle"]
+
+
+async def test_all_endpoints_failing_raises(payment, payment_requirements):
+    a = FlakyFacilitator("https://a.test")
+    b = FlakyFacilitator("https://b.test")
+    a.error = b.error = httpx.ConnectError
+    facilitator = make_client([a, b])
+
+    with pytest.raises(httpx.ConnectError):
+        await facilitator.verify(payment, payment_requirements)
+    assert a.requests == b.requests == ["/verify"]
+
+
+async def test_slow_verify_is_hedged(payment, payment_requirements):
+    a = FlakyFacilitator("https://a.test")
+    b = FlakyFacilitator("https://b.test")
+    a.delay = 5
+    facilitator = make_client([a, b], hedge_after=0.01)
+
+    response = await asyncio.wait_for(
+        facilitator.verify(payment, payment_requirements), timeout=1
+    )
+    assert response.is_valid
+    assert b.requests == ["/verify"]
+    # The slow request was cancelled and not counted against the endpoint
+    assert facilitator._endpoints.endpoints[0].consecutive_failures == 0
+
+
+async def test_health_checks_restore_ejected_endpoints(payment, payment_requirements):
+    a = FlakyFacilitator("https://a.test")
+    b = FlakyFacilitator("https://b.test")
+    a.error = httpx.ConnectError
+    facilitator = make_client(
+        [a, b], failure_threshold=1, health_check_interval=0.01, verify_cache_size=0
+    )
+    endpoint = facilitator._endpoints.endpoints[0]
+
+    async with facilitator:
+        await facilitator.verify(payment, payment_requirements)
+        assert not endpoint.is_available()
+
+        a.error = None
+        for _ in range(100):
+            if endpoint.is_available():
+                break
+            await asyncio.sleep(0.01)
+        assert endpoint.is_available()
+        assert "/supported" in a.requests
+
+    assert facilitator._health_check_task is None
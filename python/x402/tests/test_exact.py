@@ -3,14 +3,19 @@ import time
 import base64
 from eth_account import Account
 from hexbytes import HexBytes
+from eth_account.messages import _hash_eip191_message, encode_typed_data
 from x402.exact import (
     create_nonce,
+    domain_separator,
     prepare_payment_header,
     sign_payment_header,
+    transfer_with_authorization_hash,
+    transfer_with_authorization_typed_data,
     encode_payment,
     decode_payment,
+    verify_payment_locally,
 )
-from x402.types import PaymentRequirements
+from x402.types import PaymentPayload, PaymentRequirements
 
 
 @pytest.fixture
@@ -104,6 +109,78 @@ def test_sign_payment_header(account, payment_requirements):
     assert int(auth["validBefore"]) > int(time.time())
 
 
+def test_transfer_with_authorization_hash_matches_typed_data(payment_requirements):
+    authorizations = [
+        {
+            "from": "0x857b06519E91e3A54538791bDbb0E22373e36b66",
+            "to": payment_requirements.pay_to,
+            "value": "10000",
+            "validAfter": "0",
+            "validBefore": "1750000000",
+            "nonce": b"\x01" * 32,
+        },
+        {
+            "from": "0xffffffffffffffffffffffffffffffffffffffff",
+            "to": "0x209693bc6afc0c5328ba36faf03c514ef312287c",
+            "value": 2**256 - 1,
+            "validAfter": 1,
+            "validBefore": 2,
+            "nonce": create_nonce(),
+        },
+    ]
+    mainnet = payment_requirements.model_copy(
+        update={
+            "network": "base",
+            "asset": "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913",
+        }
+    )
+
+    for requirements in (payment_requirements, mainnet):
+        for authorization in authorizations:
+            typed_data = transfer_with_authorization_typed_data(
+                requirements, authorization
+            )
+            expected = _hash_eip191_message(
+                encode_typed_data(
+                    domain_data=typed_data["domain"],
+                    message_types=typed_data["types"],
+                    message_data=typed_data["message"],
+                )
+            )
+            assert transfer_with_authorization_hash(requirements, authorization) == (
+                expected
+            )
+
+    assert domain_separator.cache_info().currsize >= 2
+
+    with pytest.raises(ValueError):
+        transfer_with_authorization_hash(
+            payment_requirements, {**authorizations[0], "nonce": b"\x01"}
+        )
+    with pytest.raises(ValueError):
+        transfer_with_authorization_hash(
+            payment_requirements, {**authorizations[0], "to": "0x1234"}
+        )
+
+
+def test_sign_payment_header_matches_sign_typed_data(account, payment_requirements):
+    unsigned_header = prepare_payment_header(account.address, 1, payment_requirements)
+    auth = unsigned_header["payload"]["authorization"]
+    typed_data = transfer_with_authorization_typed_data(payment_requirements, auth)
+    expected = account.sign_typed_data(
+        domain_data=typed_data["domain"],
+        message_types=typed_data["types"],
+        message_data=typed_data["message"],
+    )
+
+    auth["nonce"] = auth["nonce"].hex()
+    decoded = decode_payment(
+        sign_payment_header(account, payment_requirements, unsigned_header)
+    )
+    signature = expected.signature.hex().removeprefix("0x")
+    assert decoded["payload"]["signature"] == f"0x{signature}"
+
+
 def test_sign_payment_header_no_account(payment_requirements):
     unsigned_header = prepare_payment_header(
         "0x0000000000000000000000000000000000000000", 1, payment_requirements
@@ -196,3 +273,102 @@ def test_decode_payment():
     assert decoded["array"] == complex_data["array"]
     assert decoded["object"] == complex_data["object"]
     assert decoded["hex"] == "1234"  # Implementation returns hex without 0x prefix
+
+
+def signed_payment(account, payment_requirements, **authorization) -> PaymentPayload:
+    unsigned_header = prepare_payment_header(account.address, 1, payment_requirements)
+    auth = unsigned_header["payload"]["authorization"]
+    auth["nonce"] = auth["nonce"].hex()
+    auth.update(authorization)
+    return PaymentPayload(
+        **decode_payment(
+            sign_payment_header(account, payment_requirements, unsigned_header)
+        )
+    )
+
+
+def test_verify_payment_locally_accepts_valid_payment(account, payment_requirements):
+    payment = signed_payment(account, payment_requirements)
+    assert verify_payment_locally(payment, payment_requirements) is None
+
+
+def test_verify_payment_locally_rejects_forged_signature(account, payment_requirements):
+    payment = signed_payment(account, payment_requirements)
+    payment.payload.authorization.from_ = Account.create().address
+
+    assert (
+        verify_payment_locally(payment, payment_requirements)
+        == "invalid_exact_evm_payload_signature"
+    )
+
+
+def test_verify_payment_locally_rejects_other_domain(account, payment_requirements):
+    payment = signed_payment(account, payment_requirements)
+    other_asset = payment_requirements.model_copy(
+        update={"asset": "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913"}
+    )
+
+    assert (
+        verify_payment_locally(payment, other_asset)
+        == "invalid_exact_evm_payload_signature"
+    )
+
+
+def test_verify_payment_locally_checks_requirements(account, payment_requirements):
+    now = int(time.time())
+
+    cases = [
+        (
+            {"to": "0x1111111111111111111111111111111111111111"},
+            "invalid_exact_evm_payload_recipient_mismatch",
+        ),
+        ({"value": "9999"}, "invalid_exact_evm_payload_authorization_value"),
+        (
+            {"validBefore": str(now + 2)},
+            "invalid_exact_evm_payload_authorization_valid_before",
+        ),
+        (
+            {"validAfter": str(now + 600)},
+            "invalid_exact_evm_payload_authorization_valid_after",
+        ),
+    ]
+    for authorization, reason in cases:
+        payment = signed_payment(account, payment_requirements, **authorization)
+        assert verify_payment_locally(payment, payment_requirements, now) == reason
+
+    payment = signed_payment(account, payment_requirements)
+    other_network = payment_requirements.model_copy(update={"network": "base"})
+    assert verify_payment_locally(payment, other_network) == "invalid_network"
+
+
+def test_verify_payment_locally_skips_unverifiable_signatures(
+    account, payment_requirements
+):
+    # Smart wallet signatures cannot be recovered locally
+    payment = signed_payment(account, payment_requirements)
+    payment.payload.signature = "0x" + "ab" * 200
+    assert verify_payment_locally(payment, payment_requirements) is None
+
+    # Without the EIP-712 domain the signature is left to the facilitator
+    payment = signed_payment(account, payment_requirements)
+    payment.payload.authorization.from_ = Account.create().address
+    no_domain = payment_requirements.model_copy(update={"extra": None})
+    assert verify_payment_locally(payment, no_domain) is None
+
+
+def test_verify_payment_locally_raises_configuration_errors(
+    account, payment_requirements
+):
+    payment = signed_payment(account, payment_requirements)
+
+    # Broken requirements are the server's fault, not the payer's
+    bad_asset = payment_requirements.model_copy(update={"asset": "0x1234"})
+    with pytest.raises(Exception, match="0x1234"):
+        verify_payment_locally(payment, bad_asset)
+
+    # A malformed payload is still reported as invalid
+    payment.payload.authorization.from_ = "0x1234"
+    assert verify_payment_locally(payment, payment_requirements) == "invalid_payload"
+    payment = signed_payment(account, payment_requirements)
+    payment.payload.authorization.nonce = "0x1234"
+    assert verify_payment_locally(payment, payment_requirements) == "invalid_payload"
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from x402.facilitator import FacilitatorClient
+from x402.fastapi.middleware import facilitator_lifespan
+from x402.types import PaymentPayload, PaymentRequirements
+
+
+@pytest.fixture
+def payment_requirements():
+    return PaymentRequirements(
+        scheme="exact",
+        network="base-sepolia",
+        asset="0x036CbD53842c5426634e7929541eC2318f3dCF7e",
+        pay_to="0x0000000000000000000000000000000000000000",
+        max_amount_required="10000",
+        resource="https://example.com",
+        description="test",
+        max_timeout_seconds=1000,
+        mime_type="text/plain",
+    )
+
+
+@pytest.fixture
+def payment():
+    return PaymentPayload(
+        x402_version=1,
+        scheme="exact",
+        network="base-sepolia",
+        payload={
+            "signature": "0x" + "00" * 65,
+            "authorization": {
+                "from": "0x1111111111111111111111111111111111111111",
+                "to": "0x0000000000000000000000000000000000000000",
+                "value": "10000",
+                "validAfter": "0",
+                "validBefore": "9999999999",
+                "nonce": "0x" + "11" * 32,
+            },
+        },
+    )
+
+
+def facilitator_handler(requests):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path.endswith("/verify"):
+            return httpx.Response(
+                200,
+                json={
+                    "isValid": True,
+                    "payer": "0x1111111111111111111111111111111111111111",
+                },
+            )
+        if request.url.path.endswith("/settle"):
+            return httpx.Response(
+                200,
+                json={
+                    "success": True,
+                    "transaction": "0xabc",
+                    "network": "base-sepolia",
+                },
+            )
+        return httpx.Response(404)
+
+    return handler
+
+
+@pytest.fixture
+def pooled_client_factory(monkeypatch):
+    """Route the facilitator's own pooled client through a mock transport."""
+    requests = []
+    created = []
+    real_async_client = httpx.AsyncClient
+
+    def factory(**kwargs):
+        client = real_async_client(
+            transport=httpx.MockTransport(facilitator_handler(requests)), **kwargs
+        )
+        created.append(client)
+        return client
+
+    monkeypatch.setattr("x402.facilitator.httpx.AsyncClient", factory)
+    return requests, created
+
+
+async def test_verify_and_settle_reuse_pooled_client(
+    pooled_client_factory, payment, payment_requirements
+):
+    requests, created = pooled_client_factory
+    facilitator = FacilitatorClient({"url": "https://facilitator.test/"})
+
+    verify_response = await facilitator.verify(payment, payment_requirements)
+    settle_response = await facilitator.settle(payment, payment_requirements)
+
+    assert verify_response.is_valid
+    assert settle_response.success
+    assert len(created) == 1
+    assert [r.url.path for r in requests] == ["/verify", "/settle"]
+
+    body = json.loads(requests[0].content)
+    assert body["paymentPayload"]["payload"]["authorization"]["value"] == "10000"
+    assert body["paymentRequirements"]["payTo"] == payment_requirements.pay_to
+
+    await facilitator.aclose()
+    assert created[0].is_closed
+
+
+async def test_context_manager_closes_pool(
+    pooled_client_factory, payment, payment_requirements
+):
+    _, created = pooled_client_factory
+
+    async with FacilitatorClient({"url": "https://facilitator.test"}) as facilitator:
+        await facilitator.verify(payment, payment_requirements)
+
+    assert created[0].is_closed
+
+    # The pool is recreated transparently if the client is used again
+    await facilitator.settle(payment, payment_requirements)
+    assert len(created) == 2
+    await facilitator.aclose()
+
+
+def test_pool_configuration():
+    facilitator = FacilitatorClient(
+        {
+            "url": "https://facilitator.test",
+            "timeout": 2.5,
+            "max_connections": 10,
+            "max_keepalive_connections": 4,
+            "keepalive_expiry": 30.0,
+        }
+    )
+
+    assert facilitator._timeout == httpx.Timeout(2.5)
+    assert facilitator._limits == httpx.Limits(
+        max_connections=10, max_keepalive_connections=4, keepalive_expiry=30.0
+    )
+
+
+async def test_caller_owned_client_is_not_closed(payment, payment_requirements):
+    requests = []
+    http_client = httpx.AsyncClient(
+        transport=httpx.MockTransport(facilitator_handler(requests))
+    )
+    facilitator = FacilitatorClient({"url": "https://facilitator.test"}, http_client)
+
+    await facilitator.verify(payment, payment_requirements)
+    await facilitator.aclose()
+
+    assert not http_client.is_closed
+    assert len(requests) == 1
+    await http_client.aclose()
+
+
+def test_facilitator_lifespan_closes_clients(pooled_client_factory):
+    facilitator = FacilitatorClient({"url": "https://facilitator.test"})
+    app = FastAPI(lifespan=facilitator_lifespan(facilitator))
+
+    @app.get("/list")
+    async def list_resources():
+        facilitator._get_http_client()
+        return {}
+
+    _, created = pooled_client_factory
+    with TestClient(app) as client:
+        client.get("/list")
+        assert not created[0].is_closed
+
+    assert created[0].is_closed
+
+
+async def test_verify_rejects_locally_invalid_payment(payment, payment_requirements):
+    requests = []
+    http_client = httpx.AsyncClient(
+        transport=httpx.MockTransport(facilitator_handler(requests))
+    )
+    facilitator = FacilitatorClient({"url": "https://facilitator.test"}, http_client)
+
+    wrong_recipient = payment_requirements.model_copy(
+        update={"pay_to": "0x2222222222222222222222222222222222222222"}
+    )
+    verify_response = await facilitator.verify(payment, wrong_recipient)
+
+    assert not verify_response.is_valid
+    assert (
+        verify_response.invalid_reason == "invalid_exact_evm_payload_recipient_mismatch"
+    )
+    assert verify_response.payer == payment.payload.authorization.from_
+    assert requests == []
+
+    await http_client.aclose()
+
+
+def test_sync_client_shares_one_pool_across_threads(
+    pooled_client_factory, payment, payment_requirements, monkeypatch
+):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from x402.facilitator import SyncFacilitatorClient, _background_loop
+
+    requests, created = pooled_client_factory
+    facilitator = SyncFacilitatorClient(
+        {"url": "https://facilitator.test", "verify_cache_size": 0}
+    )
+
+    with ThreadPoolExecutor(8) as pool:
+        responses = list(
+            pool.map(
+                lambda _: facilitator.verify(payment, payment_requirements), range(32)
+            )
+        )
+    assert all(response.is_valid for response in responses)
+    assert facilitator.settle(payment, payment_requirements).success
+    assert len(created) == 1
+
+    # Moving to another loop opens a new pool, and closes the previous one on
+    # the loop it belongs to
+    loop = _background_loop.get()
+    monkeypatch.setattr(_background_loop, "_loop", None)
+    assert facilitator.settle(payment, payment_requirements).success
+    assert len(created) == 2
+    for _ in range(100):
+        if created[0].is_closed:
+            break
+        time.sleep(0.01)
+    assert created[0].is_closed
+    loop.call_soon_threadsafe(loop.stop)
+
+    # A forked child starts its own loop and pool, and leaves the parent's alone:
+    # the thread running the parent's loop was not copied into the child
+    parent_loop = _background_loop.get()
+    with monkeypatch.context() as m:
+        m.setattr("x402.facilitator.os.getpid", lambda: -1)
+        assert facilitator.settle(payment, payment_requirements).success
+        assert _background_loop.get() is not parent_loop
+        assert len(created) == 3
+        time.sleep(0.05)
+        assert not created[1].is_closed
+
+        facilitator.close()
+        assert created[2].is_closed
+        child_loop = _background_loop.get()
+
+    asyncio.run_coroutine_threadsafe(created[1].aclose(), parent_loop).result()
+    for stopped in (parent_loop, child_loop):
+        stopped.call_soon_threadsafe(stopped.stop)
+
+
+def test_sync_client_waits_from_gevent_thread_pool(monkeypatch):
+    import sys
+    import types
+
+    from x402.facilitator import _BackgroundLoop
+
+    started, applied = [], []
+
+    def start_new_thread(function, args):
+        started.append(function)
+        threading.Thread(target=function, args=args, daemon=True).start()
+
+    class ThreadPool:
+        def apply(self, function):
+            applied.append(function)
+            return function()
+
+    hub = types.SimpleNamespace(threadpool=ThreadPool())
+    monkey = types.SimpleNamespace(
+        is_module_patched=lambda name: name == "threading",
+        get_original=lambda module, name: start_new_thread,
+    )
+    gevent = types.ModuleType("gevent")
+    gevent.monkey = monkey
+    gevent.get_hub = lambda: hub
+    monkeypatch.setitem(sys.modules, "gevent", gevent)
+    monkeypatch.setitem(sys.modules, "gevent.monkey", monkey)
+
+    async def answer():
+        return 42
+
+    background_loop = _BackgroundLoop()
+    assert background_loop.run(answer()) == 42
+    # The loop runs in a native thread, and is waited for from gevent's pool
+    assert len(started) == 1
+    assert len(applied) == 1
+
+    loop = background_loop.get()
+    loop.call_soon_threadsafe(loop.stop)
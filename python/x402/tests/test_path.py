@@ -0,0 +1,144 @@
+import fnmatch
+import re
+
+import pytest
+
+from x402.path import PathMatcher, path_is_match
+
+
+def naive_match(pattern: str, request_path: str) -> bool:
+    if pattern.startswith("regex:"):
+        return bool(re.match(pattern[6:], request_path))
+    if "*" in pattern or "?" in pattern:
+        return fnmatch.fnmatch(request_path, pattern)
+    return pattern == request_path
+
+
+PATTERNS = [
+    "/exact",
+    "/api/*",
+    "/api/v?/items",
+    "/files/*/raw/*.txt",
+    "/[ab]x/*",
+    "regex:^/users/\\d+$",
+    "regex:/orders/(\\w+)/(\\w+)",
+    "regex:^/api/|/admin/",
+    "*",
+]
+
+PATHS = [
+    "/exact",
+    "/exact/",
+    "/api/users",
+    "/api/v1/items",
+    "/files/a/raw/b.txt",
+    "/files/a/raw/b.json",
+    "/ax/1",
+    "/[ab]x/1",
+    "/users/42",
+    "/users/42/posts",
+    "/orders/a/b",
+    "/admin/panel",
+    "/nothing",
+    "",
+]
+
+
+@pytest.mark.parametrize("last_wins", [False, True])
+def test_matcher_agrees_with_naive_matching(last_wins):
+    for first in range(len(PATTERNS)):
+        matcher = PathMatcher(last_wins=last_wins)
+        for index, pattern in enumerate(PATTERNS[first:]):
+            matcher.add(pattern, index)
+
+        for path in PATHS:
+            matches = [
+                index
+                for index, pattern in enumerate(PATTERNS[first:])
+                if naive_match(pattern, path)
+            ]
+            expected = (matches[-1] if last_wins else matches[0]) if matches else None
+            assert matcher.match(path) == expected, (PATTERNS[first:], path)
+
+
+def test_first_added_pattern_wins_across_kinds():
+    matcher = PathMatcher()
+    matcher.add("regex:^/api/.*$", "regex")
+    matcher.add("/api/*", "prefix")
+    matcher.add(["/api/users", "/other"], "exact")
+
+    assert matcher.match("/api/users") == "regex"
+    assert matcher.match("/other") == "exact"
+
+    matcher = PathMatcher()
+    matcher.add("/api/users", "exact")
+    matcher.add("/api/*", "prefix")
+    matcher.add("/*", "root")
+    assert matcher.match("/api/users") == "exact"
+    assert matcher.match("/api/other") == "prefix"
+    assert matcher.match("/else") == "root"
+
+
+def test_last_added_pattern_wins():
+    matcher = PathMatcher(last_wins=True)
+    matcher.add("*", "catch-all")
+    matcher.add("/premium/*", "premium")
+    matcher.add(["/premium/a", "/premium/b"], "exact")
+
+    assert matcher.match("/premium/a") == "exact"
+    assert matcher.match("/premium/c") == "premium"
+    assert matcher.match("/free") == "catch-all"
+
+    matcher.add("/premium/*", "latest")
+    assert matcher.match("/premium/a") == "latest"
+
+
+def test_unmergeable_regexes_are_matched_separately():
+    matcher = PathMatcher()
+    matcher.add("regex:^/(?P<part>a)/(?P=part)$", "named")
+    matcher.add("regex:^/(b)/\\1$", "backref")
+    matcher.add("regex:(?i)^/CASE$", "flags")
+    matcher.add("/x/*/y", "glob")
+
+    assert matcher.match("/a/a") == "named"
+    assert matcher.match("/b/b") == "backref"
+    assert matcher.match("/case") == "flags"
+    assert matcher.match("/x/1/y") == "glob"
+    assert matcher.match("/a/b") is None
+    # The glob is still merged, the regexes are matched on their own
+    assert matcher._root.children["/"].children["x"].children["/"].combined
+    assert len(matcher._root.separate) == 1
+    assert len(matcher._root.children["/"].separate) == 2
+
+
+def test_matcher_caches_recent_paths():
+    matcher = PathMatcher(max_cached_paths=2)
+    matcher.add("/api/*", True)
+
+    for path in ("/api/a", "/api/b", "/none", "/api/a"):
+        matcher.match(path)
+    assert list(matcher._cache) == ["/none", "/api/a"]
+
+    matcher.add("/none", False)
+    assert matcher.match("/none") is False
+
+
+def test_invalid_regex_is_rejected_when_added():
+    with pytest.raises(re.error):
+        PathMatcher().add("regex:^/(unclosed$", True)
+
+
+def test_many_patterns():
+    matcher = PathMatcher()
+    for index in range(3000):
+        matcher.add(
+            [f"/exact/{index}", f"/prefix/{index}/*", f"/glob/{index}/*/x"], index
+        )
+    matcher.add(f"regex:^/re/{3000}/\\d+$", 3000)
+
+    assert matcher.match("/exact/2999") == 2999
+    assert matcher.match("/prefix/12/anything") == 12
+    assert matcher.match("/glob/1500/a/x") == 1500
+    assert matcher.match("/re/3000/7") == 3000
+    assert matcher.match("/glob/1500/a/y") is None
+    assert path_is_match(["/a", "/b/*"], "/b/c")
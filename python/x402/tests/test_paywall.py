@@ -260,3 +260,90 @@ class TestGetPaywallHtml:
         assert '"amount": 2.0' in result
         assert '"appName": "My App"' in result
         assert '"appLogo": "https://example.com/logo.png"' in result
+
+
+class TestPaywallTemplate:
+    """Test lazy loading of the paywall template."""
+
+    def test_template_is_not_loaded_on_import(self):
+        import subprocess
+        import sys
+
+        code = (
+            "import sys, x402.fastapi.middleware, x402.flask.middleware\n"
+            "from x402.paywall import load_paywall_template\n"
+            "assert 'x402.template' not in sys.modules\n"
+            "assert load_paywall_template.cache_info().currsize == 0\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+    def test_template_is_loaded_once(self):
+        from x402.paywall import load_paywall_template
+        from x402.template import PAYWALL_TEMPLATE
+
+        template = load_paywall_template()
+        assert template.startswith("<!DOCTYPE html>")
+        assert "</head>" in template
+        assert load_paywall_template() is template
+        assert PAYWALL_TEMPLATE is template
+
+
+class TestPaywallAssets:
+    """Test the paywall shell and its cacheable assets."""
+
+    def test_shell_links_versioned_assets(self):
+        from x402.paywall import load_paywall_bundle
+
+        bundle = load_paywall_bundle()
+        html = get_paywall_html("</script><b>", [], asset_path="/app/x402/paywall/")
+
+        assert len(html) < 2000
+        assert '<div id="root"></div>' in html
+        assert f'href="/app/x402/paywall/{bundle.stylesheet.name}"' in html
+        assert f'src="/app/x402/paywall/{bundle.script.name}"' in html
+        assert "\\u003c/script>\\u003cb>" in html
+        assert "</script><b>" not in html
+
+    def test_asset_response_is_compressed_and_cacheable(self):
+        import gzip
+
+        from x402.paywall import (
+            PAYWALL_ASSET_PATH,
+            load_paywall_bundle,
+            paywall_asset_response,
+        )
+
+        script = load_paywall_bundle().script
+        path = PAYWALL_ASSET_PATH + script.name
+
+        response = paywall_asset_response("GET", path, "gzip, deflate")
+        headers = dict(response.headers)
+        assert response.status == "200 OK"
+        assert headers["Content-Encoding"] == "gzip"
+        assert headers["Cache-Control"] == "public, max-age=31536000, immutable"
+        assert headers["Vary"] == "Accept-Encoding"
+        assert gzip.decompress(response.content) == script.variant("identity")
+        # Each encoding is compressed once
+        assert script.variant("gzip") is response.content
+
+        response = paywall_asset_response("GET", path, "gzip;q=0")
+        assert "Content-Encoding" not in dict(response.headers)
+        assert dict(response.headers)["ETag"] == f'"{script.version}"'
+
+        response = paywall_asset_response(
+            "GET", path, "gzip", f'W/"other", {headers["ETag"]}'
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+
+    def test_asset_response_ignores_other_requests(self):
+        from x402.paywall import (
+            PAYWALL_ASSET_PATH,
+            load_paywall_bundle,
+            paywall_asset_response,
+        )
+
+        name = load_paywall_bundle().script.name
+        assert paywall_asset_response("GET", "/weather") is None
+        assert paywall_asset_response("GET", PAYWALL_ASSET_PATH + "old.js") is None
+        assert paywall_asset_response("POST", PAYWALL_ASSET_PATH + name) is None
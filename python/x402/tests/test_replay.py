@@ -0,0 +1,162 @@
+import time
+
+import httpx
+import pytest
+from eth_account import Account
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from x402.clients.base import x402Client
+from x402.facilitator import FacilitatorClient
+from x402.fastapi.middleware import require_payment
+from x402.replay import (
+    MemoryNonceStore,
+    NonceStore,
+    ReplayGuard,
+    SQLiteNonceStore,
+    nonce_key,
+)
+from x402.types import x402PaymentRequiredResponse
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryNonceStore(bucket_seconds=1.0)
+    return SQLiteNonceStore(str(tmp_path / "nonces.db"))
+
+
+def test_nonce_key_ignores_signature(make_requirements, make_payment):
+    requirements = make_requirements()
+
+    assert nonce_key(make_payment(), requirements) == nonce_key(
+        make_payment(signature="ff"), requirements
+    )
+    assert nonce_key(make_payment(), requirements) != nonce_key(
+        make_payment(nonce="0x" + "22" * 32), requirements
+    )
+    assert nonce_key(make_payment(), requirements).startswith("base-sepolia:0x036cbd")
+
+
+def test_store_claims_once_until_expiry(store):
+    now = time.time()
+
+    assert store.add("a", now + 60)
+    assert not store.add("a", now + 60)
+    assert "a" in store
+    assert store.add("b", now + 60)
+
+    store.discard("a")
+    assert "a" not in store
+    assert store.add("a", now + 60)
+
+    # Expired claims can be taken again
+    assert store.add("old", now - 1)
+    assert store.add("old", now - 1)
+
+
+def test_incomplete_store_cannot_be_created():
+    class AddOnlyStore(NonceStore):
+        def add(self, key, expires_at):
+            return True
+
+    with pytest.raises(TypeError):
+        AddOnlyStore()
+
+
+def test_memory_store_drops_expired_buckets(monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(time, "time", lambda: now)
+    store = MemoryNonceStore(bucket_seconds=10.0)
+
+    for index in range(100):
+        assert store.add(f"early{index}", now + 5)
+    assert store.add("late", now + 60)
+    assert len(store._buckets) == 2
+
+    now += 20
+    assert "early0" not in store
+    assert "late" in store
+    assert len(store) == 1
+    assert len(store._buckets) == 1
+
+
+def test_sqlite_store_is_shared(tmp_path):
+    path = str(tmp_path / "nonces.db")
+    first, second = SQLiteNonceStore(path), SQLiteNonceStore(path)
+
+    assert first.add("a", time.time() + 60)
+    assert not second.add("a", time.time() + 60)
+    second.discard("a")
+    assert first.add("a", time.time() + 60)
+
+
+def test_guard_uses_valid_before(store, make_requirements, make_payment):
+    guard = ReplayGuard(store)
+    requirements = make_requirements()
+
+    assert guard.claim(make_payment(), requirements)
+    assert not guard.claim(make_payment(signature="ff"), requirements)
+    guard.release(make_payment(), requirements)
+    assert guard.claim(make_payment(), requirements)
+
+    # An authorization that is no longer valid is not remembered
+    expired = make_payment(nonce="0x" + "33" * 32, valid_before=str(int(time.time())))
+    assert guard.claim(expired, requirements)
+    assert guard.claim(expired, requirements)
+
+
+def test_require_payment_rejects_replays_locally():
+    requests = []
+    settle_success = {"value": False}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        if request.url.path == "/settle":
+            if settle_success["value"]:
+                return httpx.Response(
+                    200, json={"success": True, "transaction": "0xabc"}
+                )
+            return httpx.Response(
+                200, json={"success": False, "errorReason": "unexpected_settle_error"}
+            )
+        return httpx.Response(200, json={"isValid": True, "payer": "0x1"})
+
+    app = FastAPI()
+
+    @app.get("/protected")
+    async def protected():
+        return {"message": "success"}
+
+    app.middleware("http")(
+        require_payment(
+            price="$0.01",
+            pay_to_address="0x1111111111111111111111111111111111111111",
+            path="/protected",
+            facilitator=FacilitatorClient(
+                {"url": "https://facilitator.test", "verify_cache_size": 0},
+                httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            ),
+            replay_guard=ReplayGuard(),
+        )
+    )
+
+    client = TestClient(app)
+    accepts = x402PaymentRequiredResponse(**client.get("/protected").json()).accepts
+    header = x402Client(Account.create()).create_payment_header(accepts[0])
+
+    # A failed settlement releases the authorization for a retry
+    response = client.get("/protected", headers={"X-PAYMENT": header})
+    assert response.status_code == 402
+    assert response.json()["error"] == "Settle failed: unexpected_settle_error"
+
+    settle_success["value"] = True
+    response = client.get("/protected", headers={"X-PAYMENT": header})
+    assert response.status_code == 200
+    assert requests == ["/verify", "/settle", "/verify", "/settle"]
+
+    # Replays are rejected without a facilitator call
+    response = client.get("/protected", headers={"X-PAYMENT": header})
+    assert response.status_code == 402
+    assert response.json()["error"] == "Payment already used"
+    assert len(requests) == 4
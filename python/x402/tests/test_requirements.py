@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from x402.requirements import PaymentRequirementsTemplate
+from x402.types import HTTPInputSchema
+
+
+def make_template(**overrides):
+    fields = dict(
+        price="$0.01",
+        pay_to_address="0x1111111111111111111111111111111111111111",
+        description="Weather report",
+        mime_type="application/json",
+    )
+    fields.update(overrides)
+    return PaymentRequirementsTemplate(**fields)
+
+
+def test_template_builds_requirements():
+    template = make_template(
+        input_schema=HTTPInputSchema(query_params={"city": "string"}),
+        output_schema={"type": "object"},
+    )
+    [requirements] = template.for_request("get", "https://api.test/weather")
+
+    assert requirements.scheme == "exact"
+    assert requirements.network == "base-sepolia"
+    assert requirements.max_amount_required == "10000"
+    assert requirements.resource == "https://api.test/weather"
+    assert requirements.extra == {"name": "USDC", "version": "2"}
+    assert requirements.output_schema["input"]["type"] == "http"
+    assert requirements.output_schema["input"]["method"] == "GET"
+    assert requirements.output_schema["input"]["discoverable"] is True
+    assert requirements.output_schema["input"]["query_params"] == {"city": "string"}
+    assert requirements.output_schema["output"] == {"type": "object"}
+
+
+def test_template_memoizes_per_method_and_resource():
+    template = make_template(max_resources=2)
+
+    first = template.for_request("GET", "https://api.test/a")
+    assert template.for_request("GET", "https://api.test/a") is first
+    assert template.for_request("GET", "https://api.test/b")[0].resource.endswith("/b")
+
+    post = template.for_request("POST", "https://api.test/a")
+    assert post[0].output_schema["input"]["method"] == "POST"
+    assert post is not first
+
+    # The least recently used resource was evicted
+    assert template.for_request("GET", "https://api.test/a") is not first
+
+
+def test_template_entries_do_not_share_mutable_fields():
+    template = make_template(output_schema={"type": "object"})
+
+    [first] = template.for_request("GET", "https://api.test/a")
+    first.extra["version"] = "1"
+    first.output_schema["output"]["type"] = "string"
+
+    for method, resource in (
+        ("GET", "https://api.test/b"),
+        ("POST", "https://api.test/a"),
+    ):
+        [requirements] = template.for_request(method, resource)
+        assert requirements.extra == {"name": "USDC", "version": "2"}
+        assert requirements.output_schema["output"] == {"type": "object"}
+
+
+def test_template_fixed_resource():
+    template = make_template(resource="https://api.test/fixed")
+
+    first = template.for_request("GET", "https://api.test/a")
+    assert first[0].resource == "https://api.test/fixed"
+    assert template.for_request("GET", "https://api.test/b") is first
+
+
+def test_template_rejects_invalid_config():
+    with pytest.raises(ValueError, match="Unsupported network"):
+        make_template(network="ethereum")
+
+    with pytest.raises(ValueError, match="Invalid price"):
+        make_template(price="$abc")
+
+
+def test_payment_required_body_is_cached():
+    template = make_template()
+
+    body = template.payment_required_body("GET", "https://api.test/a", "No payment")
+    assert (
+        template.payment_required_body("GET", "https://api.test/a", "No payment")
+        is body
+    )
+    assert body.content_length == str(len(body.content))
+    assert body.etag.startswith('"')
+
+    data = json.loads(body.content)
+    assert data["x402Version"] == 1
+    assert data["error"] == "No payment"
+    assert data["accepts"][0]["resource"] == "https://api.test/a"
+    assert data["accepts"][0]["maxAmountRequired"] == "10000"
+
+    other = template.payment_required_body("GET", "https://api.test/a", "Invalid")
+    assert other.etag != body.etag
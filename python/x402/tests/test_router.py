@@ -0,0 +1,119 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from flask import Flask
+
+from x402.facilitator import FacilitatorClient
+from x402.fastapi.middleware import payment_middleware
+from x402.flask.middleware import PaymentMiddleware
+from x402.router import PaymentRouter
+
+
+def make_router(*paths):
+    router = PaymentRouter()
+    routes = [
+        router.add(
+            price=f"${index + 1}.00",
+            pay_to_address="0x1111111111111111111111111111111111111111",
+            path=path,
+        )
+        for index, path in enumerate(paths)
+    ]
+    return router, routes
+
+
+def test_router_matches_exact_glob_and_regex():
+    router, (exact, glob, regex) = make_router(
+        "/weather", ["/api/*", "/v?/items"], "regex:^/users/\\d+$"
+    )
+
+    assert router.match("/weather") is exact
+    assert router.match("/api/anything") is glob
+    assert router.match("/v1/items") is glob
+    assert router.match("/users/42") is regex
+    assert router.match("/users/abc") is None
+    assert router.match("/weather/today") is None
+
+
+def test_router_last_registered_route_wins():
+    router, (catch_all, exact) = make_router("/premium/*", "/premium/report")
+    assert router.match("/premium/report") is exact
+    assert router.match("/premium/other") is catch_all
+
+    router, (exact, catch_all) = make_router("/premium/report", "/premium/*")
+    assert router.match("/premium/report") is catch_all
+
+
+def test_router_first_registered_route_wins_when_asked():
+    router = PaymentRouter(last_wins=False)
+    exact = router.add(price="$1.00", pay_to_address="0x1", path="/premium/report")
+    router.add(price="$2.00", pay_to_address="0x2", path="/premium/*")
+    assert router.match("/premium/report") is exact
+
+
+def test_frameworks_agree_on_route_precedence():
+    routes = [
+        dict(price="$1.00", pay_to_address="0x1", path="/*"),
+        dict(price="$2.00", pay_to_address="0x2", path="/premium/*"),
+        dict(price="$3.00", pay_to_address="0x3", path="/premium/report"),
+    ]
+
+    router = PaymentRouter()
+    for route in routes:
+        router.add(**route)
+    fastapi_app = FastAPI()
+    fastapi_app.middleware("http")(payment_middleware(router))
+
+    flask_app = Flask(__name__)
+    middleware = PaymentMiddleware(flask_app)
+    for route in routes:
+        middleware.add(**route)
+
+    fastapi_client = TestClient(fastapi_app)
+    flask_client = flask_app.test_client()
+    expected = {"/other": "0x1", "/premium/other": "0x2", "/premium/report": "0x3"}
+    for path, pay_to in expected.items():
+        assert fastapi_client.get(path).json()["accepts"][0]["payTo"] == pay_to
+        assert flask_client.get(path).json["accepts"][0]["payTo"] == pay_to
+
+
+def test_router_memoizes_lookups():
+    router = PaymentRouter(max_cached_paths=2)
+    route = router.add(price="$1.00", pay_to_address="0x1", path="/api/*")
+
+    for path in ("/api/a", "/api/b", "/other", "/api/a"):
+        router.match(path)
+    assert list(router._matcher._cache) == ["/other", "/api/a"]
+
+    # Adding a route invalidates memoized lookups
+    later = router.add(price="$1.00", pay_to_address="0x1", path="/other")
+    assert router.match("/other") is later
+    assert router.match("/api/a") is route
+
+
+def test_router_shares_facilitator_clients_between_routes():
+    def create_headers():
+        return {"verify": {}, "settle": {}}
+
+    def add(path, **kwargs):
+        return router.add(price="$1.00", pay_to_address="0x1", path=path, **kwargs)
+
+    router = PaymentRouter()
+    config = {"url": "https://facilitator.test", "create_headers": create_headers}
+    pooled = {"urls": ["https://a.test", "https://b.test"]}
+
+    assert add("/a").facilitator is add("/b").facilitator
+    shared = add("/c", facilitator_config=dict(config)).facilitator
+    assert add("/d", facilitator_config=dict(config)).facilitator is shared
+    assert add("/e", facilitator_config=dict(pooled)).facilitator is (
+        add("/f", facilitator_config=dict(pooled)).facilitator
+    )
+
+    # Any difference in configuration gets a client of its own
+    assert add("/g").facilitator is not shared
+    assert (
+        add("/h", facilitator_config={**config, "timeout": 1.0}).facilitator
+        is not shared
+    )
+
+    facilitator = FacilitatorClient(config)
+    assert add("/i", facilitator=facilitator).facilitator is facilitator
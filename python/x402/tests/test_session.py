@@ -0,0 +1,209 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from eth_account import Account
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from flask import Flask
+
+from x402.clients.base import x402Client
+from x402.fastapi.middleware import PaymentMiddleware, require_payment
+from x402.flask.middleware import PaymentMiddleware as FlaskPaymentMiddleware
+from x402.router import PaymentRouter
+from x402.session import SESSION_HEADER, PaymentSessions
+from x402.settlement import DeferredSettlement
+from x402.testing import LocalFacilitator
+from x402.types import x402PaymentRequiredResponse
+
+PAY_TO = "0x1111111111111111111111111111111111111111"
+
+
+def test_session_draws_down_calls(make_requirements):
+    sessions = PaymentSessions("secret", calls=3)
+    requirements = make_requirements()
+
+    token = sessions.issue(requirements)
+    # Sessions cover routes with the same payment terms
+    other_resource = make_requirements(resource="https://example.com/b")
+    assert sessions.redeem(token, requirements).calls == 3
+    assert sessions.redeem(token, other_resource) is not None
+    assert sessions.redeem(token, requirements) is None
+
+    assert sessions.redeem(sessions.issue(requirements), requirements) is not None
+
+
+def test_session_rejects_foreign_tokens(make_requirements):
+    sessions = PaymentSessions("secret", calls=None)
+    requirements = make_requirements()
+    token = sessions.issue(requirements)
+
+    payload, signature = token.split(".")
+    assert sessions.redeem(f"{payload}.{signature[::-1]}", requirements) is None
+    assert sessions.redeem(f"{payload[::-1]}.{signature}", requirements) is None
+    assert sessions.redeem("not a token ✓", requirements) is None
+    assert PaymentSessions("other secret").redeem(token, requirements) is None
+    assert sessions.redeem(token, make_requirements(max_amount_required="1")) is None
+
+    # Unlimited sessions are only bounded by their lifetime
+    for _ in range(10):
+        assert sessions.redeem(token, requirements) is not None
+
+
+def test_session_expires(monkeypatch, make_requirements):
+    now = 1_000_000.0
+    monkeypatch.setattr(time, "time", lambda: now)
+    sessions = PaymentSessions("secret", calls=10, ttl=60, max_sessions=2)
+    requirements = make_requirements()
+
+    token = sessions.issue(requirements)
+    now += 30
+    assert sessions.redeem(token, requirements) is not None
+    sessions.issue(requirements)
+    sessions.issue(requirements)
+    # The oldest session was evicted to stay within max_sessions
+    assert len(sessions) == 2
+    assert sessions.redeem(token, requirements) is None
+
+    token = sessions.issue(requirements)
+    now += 61
+    assert sessions.redeem(token, requirements) is None
+    # Expired sessions are dropped as new ones are issued
+    sessions.issue(requirements)
+    assert len(sessions) == 1
+
+
+def test_session_validates_arguments():
+    with pytest.raises(ValueError):
+        PaymentSessions("")
+    with pytest.raises(ValueError):
+        PaymentSessions("secret", calls=0)
+
+
+def pay(client: TestClient, path: str) -> str:
+    accepts = x402PaymentRequiredResponse(**client.get(path).json()).accepts
+    return x402Client(Account.create()).create_payment_header(accepts[0])
+
+
+@pytest.mark.parametrize("deferred", [False, True])
+async def test_fastapi_session_needs_paid_payment(deferred):
+    local = LocalFacilitator()
+    facilitator = local.client()
+    settlement = DeferredSettlement(facilitator, ":memory:") if deferred else None
+    app = FastAPI()
+
+    @app.get("/data")
+    async def data():
+        return {}
+
+    app.middleware("http")(
+        require_payment(
+            path="/data",
+            price="$0.01",
+            pay_to_address=PAY_TO,
+            facilitator=facilitator,
+            deferred_settlement=settlement,
+            sessions=PaymentSessions("secret", calls=100),
+        )
+    )
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app), base_url="http://testserver"
+    ) as client:
+        response = await client.get("/data")
+        accepts = x402PaymentRequiredResponse(**response.json()).accepts
+        header = x402Client(Account.create()).create_payment_header(accepts[0])
+        responses = await asyncio.gather(
+            *(client.get("/data", headers={"X-PAYMENT": header}) for _ in range(5))
+        )
+
+    if settlement is not None:
+        await settlement.aclose()
+
+    # Requests whose payment was not used get no session
+    assert [SESSION_HEADER in r.headers for r in responses].count(True) == 1
+    assert [r.status_code for r in responses].count(200) == 1
+
+
+@pytest.mark.parametrize("asgi", [False, True])
+def test_fastapi_session_skips_facilitator(asgi):
+    local = LocalFacilitator()
+    sessions = PaymentSessions("secret", calls=3)
+    app = FastAPI()
+
+    @app.get("/data")
+    async def data(request: Request):
+        session = getattr(request.state, "payment_session", None)
+        return {"session": session.sid if session else None}
+
+    options = dict(
+        path="/data",
+        price="$0.01",
+        pay_to_address=PAY_TO,
+        facilitator=local.client(),
+        sessions=sessions,
+    )
+    if asgi:
+        router = PaymentRouter()
+        router.add(**options)
+        app.add_middleware(PaymentMiddleware, router=router)
+    else:
+        app.middleware("http")(require_payment(**options))
+
+    client = TestClient(app)
+    response = client.get("/data", headers={"X-PAYMENT": pay(client, "/data")})
+    assert response.status_code == 200
+    assert response.json() == {"session": None}
+    token = response.headers[SESSION_HEADER]
+    assert local.requests == ["/verify", "/settle"]
+
+    for _ in range(2):
+        response = client.get("/data", headers={SESSION_HEADER: token})
+        assert response.status_code == 200
+        assert response.json()["session"] is not None
+    assert local.requests == ["/verify", "/settle"]
+
+    response = client.get("/data", headers={SESSION_HEADER: token})
+    assert response.status_code == 402
+    assert response.json()["error"] == "Payment session expired or invalid"
+
+    # An exhausted session falls back to the payment sent along with it
+    response = client.get(
+        "/data", headers={SESSION_HEADER: token, "X-PAYMENT": pay(client, "/data")}
+    )
+    assert response.status_code == 200
+    assert response.headers[SESSION_HEADER] != token
+
+
+def test_flask_session_skips_facilitator():
+    app = Flask(__name__)
+
+    @app.route("/data")
+    def data():
+        return {"message": "data"}
+
+    local = LocalFacilitator()
+    middleware = FlaskPaymentMiddleware(app)
+    middleware.add(
+        path="/data",
+        price="$0.01",
+        pay_to_address=PAY_TO,
+        facilitator=local.client(),
+        sessions=PaymentSessions("secret", calls=2),
+    )
+
+    with app.test_client() as client:
+        accepts = x402PaymentRequiredResponse(**client.get("/data").json).accepts
+        header = x402Client(Account.create()).create_payment_header(accepts[0])
+
+        response = client.get("/data", headers={"X-PAYMENT": header})
+        assert response.status_code == 200
+        token = response.headers[SESSION_HEADER]
+
+        response = client.get("/data", headers={SESSION_HEADER: token})
+        assert response.status_code == 200
+        response = client.get("/data", headers={SESSION_HEADER: token})
+        assert response.status_code == 402
+
+    assert local.requests == ["/verify", "/settle"]
@@ -0,0 +1,385 @@
+import asyncio
+import sqlite3
+import time
+
+import httpx
+import pytest
+from eth_account import Account
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from x402.replay import nonce_key
+from x402.clients.base import x402Client
+from x402.exact import decode_payment
+from x402.facilitator import FacilitatorClient
+from x402.fastapi.middleware import require_payment
+from x402.settlement import (
+    FAILED,
+    PENDING,
+    SETTLED,
+    SETTLING,
+    UNCONFIRMED,
+    DeferredSettlement,
+    SettlementJournal,
+)
+from x402.testing import LocalFacilitator
+from x402.types import (
+    PaymentPayload,
+    PaymentRequirements,
+    SettleResponse,
+    x402PaymentRequiredResponse,
+)
+
+
+@pytest.fixture
+def payment_requirements():
+    return PaymentRequirements(
+        scheme="exact",
+        network="base-sepolia",
+        asset="0x036CbD53842c5426634e7929541eC2318f3dCF7e",
+        pay_to="0x0000000000000000000000000000000000000000",
+        max_amount_required="10000",
+        resource="https://example.com",
+        description="test",
+        max_timeout_seconds=1000,
+        mime_type="text/plain",
+        extra={"name": "USDC", "version": "2"},
+    )
+
+
+@pytest.fixture
+def payment(payment_requirements):
+    header = x402Client(Account.create()).create_payment_header(payment_requirements)
+    return PaymentPayload(**decode_payment(header))
+
+
+class FakeFacilitator:
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+
+    async def settle(self, payment, payment_requirements):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_journal_lifecycle(tmp_path, payment, payment_requirements):
+    path = str(tmp_path / "settlements.db")
+    journal = SettlementJournal(path)
+    key = nonce_key(payment, payment_requirements)
+
+    assert journal.add(payment, payment_requirements)
+    assert not journal.add(payment, payment_requirements)
+    assert journal.contains(payment, payment_requirements)
+    assert journal.status(key) == PENDING
+
+    record = journal.claim()
+    assert record.key == key
+    assert record.payment == payment
+    assert record.payment_requirements == payment_requirements
+    assert not record.maybe_submitted
+    assert journal.status(key) == SETTLING
+    assert journal.claim() is None
+
+    # A crash leaves the settlement in flight; it is recovered once its lease expires
+    journal.close()
+    journal = SettlementJournal(path)
+    assert journal.recover() == 0
+    assert journal.recover(now=time.time() + journal.lease_seconds) == 1
+    assert journal.status(key) == PENDING
+
+    # The crashed process may have submitted it before dying
+    assert journal.claim().maybe_submitted
+    journal.mark_retry(key, "timeout", next_attempt_at=0)
+    assert journal.claim().attempts == 1
+
+    journal.mark_settled(key, SettleResponse(success=True, transaction="0xabc"))
+    assert journal.status(key) == SETTLED
+    assert journal.pending_count() == 0
+    journal.close()
+
+
+def test_journal_leases_are_shared_between_processes(
+    tmp_path, payment, payment_requirements
+):
+    path = str(tmp_path / "settlements.db")
+    first = SettlementJournal(path, lease_seconds=60)
+    second = SettlementJournal(path, lease_seconds=60)
+    key = nonce_key(payment, payment_requirements)
+
+    first.add(payment, payment_requirements)
+    assert first.claim() is not None
+
+    # Another process starting up leaves the live lease alone
+    assert second.recover() == 0
+    assert second.claim() is None
+    assert second.status(key) == SETTLING
+
+    # Once the lease expires the payment is claimed again, and the previous
+    # claimant can no longer record an outcome for it
+    assert second.claim(now=time.time() + 61).key == key
+    first.mark_failed(key, "timeout")
+    assert second.status(key) == SETTLING
+
+    second.mark_settled(key, SettleResponse(success=True, transaction="0xabc"))
+    assert first.status(key) == SETTLED
+    first.close()
+    second.close()
+
+
+def test_journal_adds_lease_columns_to_old_databases(tmp_path):
+    path = str(tmp_path / "settlements.db")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE settlements (key TEXT PRIMARY KEY, payment TEXT NOT NULL,"
+        " payment_requirements TEXT NOT NULL, status TEXT NOT NULL,"
+        " attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL,"
+        " last_error TEXT, settle_response TEXT, created_at REAL NOT NULL,"
+        " updated_at REAL NOT NULL)"
+    )
+    db.execute(
+        "INSERT INTO settlements VALUES ('k', '{}', '{}', ?, 0, 0, NULL, NULL, 0, 0)",
+        (SETTLING,),
+    )
+    db.commit()
+    db.close()
+
+    journal = SettlementJournal(path)
+    # Rows settling without a lease come from an older version and are recovered
+    assert journal.recover() == 1
+    assert journal.status("k") == PENDING
+    journal.close()
+
+
+async def test_deferred_settlement_retries_until_settled(payment, payment_requirements):
+    facilitator = FakeFacilitator(
+        [
+            ConnectionError("facilitator down"),
+            SettleResponse(success=False, error_reason="unexpected_settle_error"),
+            SettleResponse(success=True, transaction="0xabc"),
+        ]
+    )
+    settlement = DeferredSettlement(
+        facilitator, ":memory:", workers=2, retry_backoff=0.01, poll_interval=0.01
+    )
+    key = nonce_key(payment, payment_requirements)
+
+    async with settlement:
+        assert await settlement.enqueue(payment, payment_requirements)
+        assert not await settlement.enqueue(payment, payment_requirements)
+
+        for _ in range(200):
+            if settlement.journal.status(key) == SETTLED:
+                break
+            await asyncio.sleep(0.01)
+
+    assert settlement.journal.status(key) == SETTLED
+    assert facilitator.calls == 3
+
+
+@pytest.mark.parametrize(
+    "first_attempt, status",
+    [
+        (ConnectionError("connection reset"), UNCONFIRMED),
+        (SettleResponse(success=False, error_reason="unexpected_settle_error"), FAILED),
+    ],
+)
+async def test_deferred_settlement_already_used_after_unknown_outcome(
+    payment, payment_requirements, first_attempt, status
+):
+    facilitator = FakeFacilitator(
+        [
+            first_attempt,
+            SettleResponse(success=False, error_reason="invalid_transaction_state"),
+        ]
+    )
+    settlement = DeferredSettlement(
+        facilitator, ":memory:", max_attempts=2, retry_backoff=0.01, poll_interval=0.01
+    )
+    key = nonce_key(payment, payment_requirements)
+
+    async with settlement:
+        await settlement.enqueue(payment, payment_requirements)
+        for _ in range(200):
+            if settlement.journal.status(key) == status:
+                break
+            await asyncio.sleep(0.01)
+
+    assert settlement.journal.status(key) == status
+    assert facilitator.calls == 2
+
+
+async def test_deferred_settlement_survives_journal_errors(
+    payment, payment_requirements, monkeypatch, caplog
+):
+    facilitator = FakeFacilitator([SettleResponse(success=True, transaction="0xabc")])
+    settlement = DeferredSettlement(
+        facilitator, ":memory:", workers=1, poll_interval=0.01
+    )
+    key = nonce_key(payment, payment_requirements)
+
+    claim = settlement.journal.claim
+    errors = [sqlite3.OperationalError("database is locked")]
+
+    def flaky_claim():
+        if errors:
+            raise errors.pop()
+        return claim()
+
+    monkeypatch.setattr(settlement.journal, "claim", flaky_claim)
+
+    async with settlement:
+        await settlement.enqueue(payment, payment_requirements)
+        for _ in range(200):
+            if settlement.journal.status(key) == SETTLED:
+                break
+            await asyncio.sleep(0.01)
+
+    assert settlement.journal.status(key) == SETTLED
+    assert "database is locked" in caplog.text
+
+
+async def test_deferred_settlement_gives_up_after_max_attempts(
+    payment, payment_requirements
+):
+    facilitator = FakeFacilitator([ConnectionError("down")] * 2)
+    settlement = DeferredSettlement(
+        facilitator, ":memory:", max_attempts=2, retry_backoff=0.01, poll_interval=0.01
+    )
+    key = nonce_key(payment, payment_requirements)
+
+    async with settlement:
+        await settlement.enqueue(payment, payment_requirements)
+        for _ in range(200):
+            if settlement.journal.status(key) == FAILED:
+                break
+            await asyncio.sleep(0.01)
+
+    assert settlement.journal.status(key) == FAILED
+    assert facilitator.calls == 2
+
+
+def test_require_payment_defers_settlement():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        if request.url.path == "/settle":
+            return httpx.Response(200, json={"success": True, "transaction": "0xabc"})
+        return httpx.Response(200, json={"isValid": True, "payer": "0x1"})
+
+    facilitator = FacilitatorClient(
+        {"url": "https://facilitator.test"},
+        httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    settlement = DeferredSettlement(facilitator, ":memory:")
+
+    app = FastAPI()
+
+    @app.get("/protected")
+    async def protected():
+        return {"message": "success"}
+
+    app.middleware("http")(
+        require_payment(
+            price="$0.01",
+            pay_to_address="0x1111111111111111111111111111111111111111",
+            path="/protected",
+            facilitator=facilitator,
+            deferred_settlement=settlement,
+        )
+    )
+
+    with TestClient(app) as client:
+        accepts = x402PaymentRequiredResponse(**client.get("/protected").json()).accepts
+        header = x402Client(Account.create()).create_payment_header(accepts[0])
+
+        response = client.get("/protected", headers={"X-PAYMENT": header})
+        assert response.status_code == 200
+        assert "X-PAYMENT-RESPONSE" not in response.headers
+        payment = PaymentPayload(**decode_payment(header))
+        assert settlement.journal.contains(payment, accepts[0])
+
+        # The same payment is not accepted a second time
+        response = client.get("/protected", headers={"X-PAYMENT": header})
+        assert response.status_code == 402
+        assert response.json()["error"] == "Payment already used"
+
+    assert requests.count("/verify") == 1
+
+
+def deferred_app(settlement, facilitator):
+    app = FastAPI()
+
+    @app.get("/protected")
+    async def protected():
+        return {"message": "success"}
+
+    app.middleware("http")(
+        require_payment(
+            price="$0.01",
+            pay_to_address="0x1111111111111111111111111111111111111111",
+            path="/protected",
+            facilitator=facilitator,
+            deferred_settlement=settlement,
+        )
+    )
+    return app
+
+
+async def test_deferred_settlement_serves_concurrent_duplicates_once():
+    local = LocalFacilitator()
+    facilitator = local.client()
+    settlement = DeferredSettlement(facilitator, ":memory:", poll_interval=0.01)
+    app = deferred_app(settlement, facilitator)
+
+    async with (
+        settlement,
+        httpx.AsyncClient(
+            transport=httpx.ASGITransport(app), base_url="http://testserver"
+        ) as client,
+    ):
+        response = await client.get("/protected")
+        accepts = x402PaymentRequiredResponse(**response.json()).accepts
+        header = x402Client(Account.create()).create_payment_header(accepts[0])
+
+        responses = await asyncio.gather(
+            *(client.get("/protected", headers={"X-PAYMENT": header}) for _ in range(5))
+        )
+
+    assert sorted(r.status_code for r in responses) == [200, 402, 402, 402, 402]
+    assert local.requests.count("/settle") <= 1
+
+
+def test_journal_keys_payments_by_authorization(payment, payment_requirements):
+    journal = SettlementJournal(":memory:")
+    other_resource = payment_requirements.model_copy(
+        update={"resource": "https://example.com?x=2"}
+    )
+
+    assert journal.add(payment, payment_requirements)
+    assert journal.contains(payment, other_resource)
+    assert not journal.add(payment, other_resource)
+    journal.close()
+
+
+async def test_concurrent_starts_run_one_worker_pool():
+    settlement = DeferredSettlement(
+        FakeFacilitator([]), ":memory:", workers=4, poll_interval=0.01
+    )
+
+    def workers():
+        return [
+            task
+            for task in asyncio.all_tasks()
+            if task.get_coro().__qualname__ == "DeferredSettlement._worker"
+        ]
+
+    await asyncio.gather(*(settlement.start() for _ in range(5)))
+    assert len(workers()) == 4
+
+    await settlement.aclose()
+    assert workers() == []
@@ -0,0 +1,156 @@
+import asyncio
+
+import httpx
+import pytest
+from eth_account import Account
+from fastapi import FastAPI
+
+from x402.clients.base import x402Client
+from x402.facilitator import FacilitatorClient
+from x402.fastapi.middleware import require_payment
+from x402.singleflight import SingleFlight
+from x402.testing import LocalFacilitator
+from x402.types import x402PaymentRequiredResponse
+
+
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return calls
+
+    waiters = [asyncio.create_task(flight.do("key", work)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == [1] * 5
+    assert calls == 1
+    assert len(flight) == 0
+
+    # Once finished the key runs again
+    assert await flight.do("key", work) == 2
+
+
+async def test_different_keys_run_independently():
+    flight = SingleFlight()
+
+    async def work(value):
+        await asyncio.sleep(0)
+        return value
+
+    results = await asyncio.gather(
+        flight.do("a", lambda: work("a")), flight.do("b", lambda: work("b"))
+    )
+    assert results == ["a", "b"]
+
+
+async def test_exceptions_are_shared():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        raise ValueError("boom")
+
+    waiters = [asyncio.create_task(flight.do("key", work)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+async def test_cancelled_waiter_does_not_cancel_shared_work():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flight.do("key", work))
+    second = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    release.set()
+
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert await second == "done"
+
+
+async def test_facilitator_settles_concurrent_duplicates_once(
+    make_requirements, make_payment
+):
+    calls = []
+    release = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        await release.wait()
+        return httpx.Response(200, json={"success": True, "transaction": "0xabc"})
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    facilitator = FacilitatorClient({"url": "https://facilitator.test"}, http_client)
+
+    requirements, payment = make_requirements(), make_payment()
+
+    settles = [
+        asyncio.create_task(facilitator.settle(payment, requirements))
+        for _ in range(10)
+    ]
+    await asyncio.sleep(0.01)
+    release.set()
+
+    responses = await asyncio.gather(*settles)
+    # Only the call that sent the settlement is paid for
+    assert responses[0].success
+    assert all(
+        not r.success and r.error_reason == "payment_already_used"
+        for r in responses[1:]
+    )
+    assert calls == ["/settle"]
+
+    # Once settled, the payment can be sent again and the facilitator decides
+    assert (await facilitator.settle(payment, requirements)).success
+    assert calls == ["/settle", "/settle"]
+
+    await http_client.aclose()
+
+
+async def test_concurrent_requests_with_one_payment_are_served_once():
+    local = LocalFacilitator()
+    app = FastAPI()
+
+    @app.get("/paid")
+    async def paid():
+        return {"ok": True}
+
+    app.middleware("http")(
+        require_payment(
+            price="$0.01",
+            pay_to_address="0x1111111111111111111111111111111111111111",
+            network="base-sepolia",
+            facilitator=local.client(),
+        )
+    )
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app), base_url="http://testserver"
+    ) as client:
+        response = await client.get("/paid")
+        accepts = x402PaymentRequiredResponse(**response.json()).accepts
+        header = x402Client(Account.create()).create_payment_header(accepts[0])
+
+        responses = await asyncio.gather(
+            *(client.get("/paid", headers={"X-PAYMENT": header}) for _ in range(5))
+        )
+
+    assert sorted(r.status_code for r in responses) == [200, 402, 402, 402, 402]
+    assert len(local.settled) == 1
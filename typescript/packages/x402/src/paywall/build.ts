@@ -13,7 +13,7 @@ const OUTPUT_TS = path.join("src/paywall/gen", "template.ts");
 
 // Path to Python package static directory (relative to this TypeScript package)
 const PYTHON_DIR = path.join("..", "..", "..", "python", "x402", "src", "x402");
-const OUTPUT_PY = path.join(PYTHON_DIR, "template.py");
+const OUTPUT_PY = path.join(PYTHON_DIR, "static", "paywall.html");
 
 const options: esbuild.BuildOptions = {
   entryPoints: ["src/paywall/index.tsx", "src/paywall/styles.css"],
@@ -91,13 +91,12 @@ async function build() {
 export const PAYWALL_TEMPLATE = ${JSON.stringify(html)};
 `;
 
-      const pyContent = `PAYWALL_TEMPLATE = ${JSON.stringify(html)}`;
-
       // Write the template.ts file
       fs.writeFileSync(OUTPUT_TS, tsContent);
       console.log(`Generated template.ts with bundled HTML (${html.length} bytes)`);
-      fs.writeFileSync(OUTPUT_PY, pyContent);
-      console.log(`Generated template.py with bundled HTML (${html.length} bytes)`);
+      // The Python package reads the template lazily from its static directory
+      fs.writeFileSync(OUTPUT_PY, html);
+      console.log(`Copied paywall.html to the Python package (${html.length} bytes)`);
     } else {
       throw new Error(`Bundled HTML file not found at ${OUTPUT_HTML}`);
     }